@@ -0,0 +1,93 @@
+from django.db.models.functions import Now
+
+from .constants import POSTS_LIMIT
+from . import querysets
+from .keyset import before, decode_cursor, encode_cursor
+from .models import Comment, Post
+
+# Разделитель курсоров потоков постов и комментариев
+CURSOR_SEPARATOR = '.'
+
+
+# Функция для курсора ленты активности: позиции обоих потоков
+def encode_activity_cursor(post_key, comment_key):
+    return CURSOR_SEPARATOR.join(
+        encode_cursor(*key) if key else '' for key in (post_key, comment_key)
+    )
+
+
+# Функция для разбора курсора ленты активности; поток без позиции
+# читается с начала
+def decode_activity_cursor(cursor):
+    parts = (cursor or '').split(CURSOR_SEPARATOR)
+    if len(parts) != 2:
+        return None, None
+    return decode_cursor(parts[0]), decode_cursor(parts[1])
+
+
+# Функция для страницы активности пользователя: посты и комментарии
+# читаются по индексам автора не больше чем на страницу каждый
+# и сливаются по времени; возвращает записи (вид, объект)
+# и курсор следующей страницы
+def activity_page(profile, viewer, cursor=None, limit=POSTS_LIMIT):
+    post_after, comment_after = decode_activity_cursor(cursor)
+    is_owner = profile == viewer
+    posts = profile.posts.all()
+    comments = Comment.objects.filter(author=profile)
+    if not is_owner:
+        posts = querysets.get_published_posts(posts)
+        comments = comments.filter(
+            post__is_published=True,
+            post__pub_date__lte=Now(),
+            post__category__is_visible=True,
+        )
+    if post_after:
+        posts = posts.filter(before(post_after, 'pub_date', 'pk'))
+    if comment_after:
+        comments = comments.filter(before(comment_after, 'created_at', 'pk'))
+    post_keys = list(
+        posts.order_by('-pub_date', '-pk')
+        .values_list('pub_date', 'pk')[:limit + 1]
+    )
+    comments = list(comments.order_by('-created_at', '-pk')[:limit + 1])
+    merged = sorted(
+        [('post', pub_date, pk) for pub_date, pk in post_keys]
+        + [('comment', c.created_at, c.pk) for c in comments],
+        key=lambda item: (item[1], item[2]),
+        reverse=True
+    )
+    page = merged[:limit]
+    for kind, date, pk in page:
+        if kind == 'post':
+            post_after = date, pk
+        else:
+            comment_after = date, pk
+    next_cursor = None
+    if len(merged) > limit:
+        next_cursor = encode_activity_cursor(post_after, comment_after)
+    comments = {comment.pk: comment for comment in comments}
+    # Одним запросом читаются и посты страницы, и посты, к которым
+    # оставлены комментарии страницы
+    post_ids = {
+        pk if kind == 'post' else comments[pk].post_id
+        for kind, date, pk in page
+    }
+    posts = (
+        Post.objects.select_related('category', 'author', 'location')
+        if is_owner else querysets.get_published_posts()
+    )
+    posts = {
+        post.pk: post
+        for post in querysets.count_comment(posts.filter(pk__in=post_ids))
+    } if post_ids else {}
+    items = []
+    for kind, date, pk in page:
+        if kind == 'post':
+            item = posts.get(pk)
+        else:
+            item = comments[pk]
+            item.post = posts.get(item.post_id)
+        # Пост мог быть удалён или скрыт между запросами
+        if item is not None and (kind == 'post' or item.post is not None):
+            items.append((kind, item))
+    return items, next_cursor
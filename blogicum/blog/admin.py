@@ -1,16 +1,141 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 
-from .models import Category, Location, Post, Comment
+from .exports import streaming_export
+from .models import Category, Location, Notification, Post, Comment, Tag
+from .querysets import bulk_delete, bulk_set_published
 
+# До такого размера таблицы точный COUNT(*) дешевле оценки
+EXACT_COUNT_LIMIT = 10_000
 
-class PostAdmin(admin.ModelAdmin):
+
+# Функция для приблизительного числа строк таблицы без COUNT(*)
+def estimated_count(queryset):
+    model = queryset.model
+    connection = connections[queryset.db]
+    table = connection.ops.quote_name(model._meta.db_table)
+    pk = connection.ops.quote_name(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [model._meta.db_table]
+            )
+        else:
+            # Для SQLite максимальный rowid не меньше числа строк
+            # и находится по индексу первичного ключа
+            cursor.execute(f'SELECT MAX({pk}) FROM {table}')
+        row = cursor.fetchone()
+    return int(row[0] or 0) if row else 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, оценивающий размер нефильтрованного списка."""
+
+    @cached_property
+    def count(self):
+        if self.object_list.query.where:
+            return super().count
+        estimate = estimated_count(self.object_list)
+        if estimate < EXACT_COUNT_LIMIT:
+            return super().count
+        return estimate
+
+
+@admin.action(description='Опубликовать выбранные')
+def publish(modeladmin, request, queryset):
+    updated = bulk_set_published(queryset, True)
+    modeladmin.message_user(request, f'Опубликовано записей: {updated}.')
+
+
+@admin.action(description='Снять с публикации выбранные')
+def unpublish(modeladmin, request, queryset):
+    updated = bulk_set_published(queryset, False)
+    modeladmin.message_user(
+        request, f'Снято с публикации записей: {updated}.'
+    )
+
+
+@admin.action(
+    description='Удалить выбранные пакетно', permissions=('delete',)
+)
+def delete_in_chunks(modeladmin, request, queryset):
+    deleted = bulk_delete(queryset)
+    modeladmin.message_user(request, f'Удалено записей: {deleted}.')
+
+
+@admin.action(description='Выгрузить выбранные в CSV')
+def export_csv(modeladmin, request, queryset):
+    return streaming_export(queryset, 'csv')
+
+
+@admin.action(description='Выгрузить выбранные в JSON Lines')
+def export_jsonl(modeladmin, request, queryset):
+    return streaming_export(queryset, 'jsonl')
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class PostAdmin(LargeTableAdmin):
     list_display = ('title', 'pub_date', 'author', 'category', 'is_published')
     list_filter = ('category', 'is_published')
+    list_select_related = ('author', 'category')
     search_fields = ('title', 'text')
     list_editable = ('is_published',)
+    date_hierarchy = 'pub_date'
+    autocomplete_fields = ('author', 'category', 'location')
+    actions = (
+        publish, unpublish, delete_in_chunks, export_csv, export_jsonl
+    )
+
+
+class CommentAdmin(LargeTableAdmin):
+    list_display = ('text', 'post', 'author', 'created_at', 'reply_count')
+    list_select_related = ('post', 'author')
+    search_fields = ('text',)
+    raw_id_fields = ('post', 'parent')
+    autocomplete_fields = ('author',)
+    actions = (delete_in_chunks, export_csv, export_jsonl)
+
+
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ('title', 'slug', 'parent', 'is_published', 'is_visible')
+    list_select_related = ('parent',)
+    search_fields = ('title', 'slug')
+    autocomplete_fields = ('parent',)
+    actions = (publish, unpublish, delete_in_chunks)
+
+
+class LocationAdmin(LargeTableAdmin):
+    list_display = ('name', 'latitude', 'longitude', 'is_published')
+    search_fields = ('name',)
+    actions = (publish, unpublish, delete_in_chunks)
+
+
+class NotificationAdmin(LargeTableAdmin):
+    list_display = (
+        'recipient', 'actor', 'reason', 'created_at', 'is_read',
+        'digested_at'
+    )
+    list_filter = ('reason', 'is_read')
+    list_select_related = ('recipient', 'actor')
+    raw_id_fields = ('recipient', 'actor', 'post', 'comment')
+
+
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug')
+    search_fields = ('name',)
+    prepopulated_fields = {'slug': ('name',)}
 
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Category)
-admin.site.register(Location)
-admin.site.register(Comment)
+admin.site.register(Category, CategoryAdmin)
+admin.site.register(Location, LocationAdmin)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(Tag, TagAdmin)
+admin.site.register(Notification, NotificationAdmin)
@@ -1,7 +1,14 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class BlogConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "blog"
     verbose_name = 'Блог'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
+        from .instrumentation import install_slow_query_log
+
+        connection_created.connect(install_slow_query_log)
@@ -0,0 +1,148 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import (
+    HASH_SESSION_KEY, SESSION_KEY, get_user_model
+)
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import (
+    check_password, get_hasher, make_password
+)
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections, connection
+from django.utils.crypto import constant_time_compare
+
+from . import cache
+from .constants import USER_CACHE_TIMEOUT
+from .hashers import needs_rehash
+
+_executor = None
+
+
+# Функция для получения общего пула потоков перехеширования
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_REHASH_WORKERS,
+            thread_name_prefix='rehash'
+        )
+    return _executor
+
+
+# Ключ сессии с солью нового хеша, пока фоновое перехеширование
+# не принято сессией
+REHASH_SALT_SESSION_KEY = '_rehash_salt'
+
+
+# Функция для замены хеша пароля, если его никто не поменял раньше;
+# возвращает новый хеш или None
+def rehash_password(user_pk, raw_password, old_encoded, salt=None):
+    encoded = make_password(raw_password, salt)
+    updated = get_user_model().objects.filter(
+        pk=user_pk, password=old_encoded
+    ).update(password=encoded)
+    if not updated:
+        return None
+    cache.delete('users', user_pk)
+    return encoded
+
+
+def _rehash_in_thread(*args):
+    close_old_connections()
+    try:
+        rehash_password(*args)
+    finally:
+        connection.close()
+
+
+# Функция для перехеширования после входа. Без пула
+# (PASSWORD_REHASH_WORKERS = 0) хеш меняется сразу, и сессия входа
+# получает новый хеш в том же запросе. Фоновая задача сессию не трогает:
+# соль нового хеша остаётся в сессии, и следующий запрос принимает новый
+# хеш в accept_rehash
+def schedule_rehash(user, raw_password, session):
+    args = (user.pk, raw_password, user.password)
+    if not settings.PASSWORD_REHASH_WORKERS:
+        encoded = rehash_password(*args)
+        if encoded is not None:
+            user.password = encoded
+            if session.get(HASH_SESSION_KEY):
+                session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        return
+    salt = get_hasher('default').salt()
+    session[REHASH_SALT_SESSION_KEY] = salt
+    get_executor().submit(_rehash_in_thread, *args, salt)
+
+
+# Функция для обновления хеша в сессии после фонового перехеширования.
+# Новый хеш принимается, только если в нём соль, выданная этой сессии:
+# пароль, сменённый иначе, завершает сессию как обычно
+def accept_rehash(session):
+    salt = session.get(REHASH_SALT_SESSION_KEY)
+    if salt is None:
+        return
+    UserModel = get_user_model()
+    try:
+        user_pk = UserModel._meta.pk.to_python(session[SESSION_KEY])
+    except (KeyError, ValidationError):
+        del session[REHASH_SALT_SESSION_KEY]
+        return
+    encoded = (
+        UserModel._default_manager.filter(pk=user_pk)
+        .values_list('password', flat=True).first()
+    )
+    if encoded is None:
+        del session[REHASH_SALT_SESSION_KEY]
+        return
+    user = UserModel(pk=user_pk, password=encoded)
+    if constant_time_compare(
+        session.get(HASH_SESSION_KEY, ''), user.get_session_auth_hash()
+    ):
+        # Фоновая задача ещё не закончила
+        return
+    if salt in encoded.split('$'):
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    del session[REHASH_SALT_SESSION_KEY]
+
+
+class RehashInBackgroundBackend(ModelBackend):
+    """Вход по паролю, при котором устаревший хеш обновляется
+    не в потоке запроса, а в фоновом пуле.
+
+    При общем кэше (SHARED_CACHE) пользователь сессии берётся из кэша;
+    запись сбрасывается сигналом при сохранении или удалении
+    пользователя.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Хеширование выравнивает время ответа для несуществующих имён
+            UserModel().set_password(password)
+            return None
+        if not check_password(password, user.password):
+            return None
+        if not self.user_can_authenticate(user):
+            return None
+        if needs_rehash(user.password):
+            # Перехеширование запускается после входа, когда известна сессия
+            user.rehash_password = password
+        return user
+
+    def get_user(self, user_id):
+        if not settings.SHARED_CACHE:
+            return super().get_user(user_id)
+        user = cache.get('users', user_id)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set('users', user_id, user, USER_CACHE_TIMEOUT)
+            return user
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,148 @@
+import time
+
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Category, User
+from .querysets import count_comment, get_published_posts
+
+SCENARIOS = (
+    'index',
+    'detail',
+    'category',
+    'profile_owner',
+    'profile_stranger',
+    'create_post',
+    'add_comment',
+)
+# Допустимое относительное ухудшение задержки по сравнению с эталоном
+LATENCY_TOLERANCE = 0.25
+
+
+# Функция для вычисления перцентиля по отсортированной выборке
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = round(pct / 100 * (len(ordered) - 1))
+    return ordered[index]
+
+
+# Функция для выбора объектов, на которых измеряются страницы
+def find_targets():
+    post = (
+        count_comment(get_published_posts())
+        .order_by('-comment_count', '-pub_date')
+        .first()
+    )
+    author = (
+        User.objects.annotate(post_count=Count('posts'))
+        .order_by('-post_count')
+        .first()
+    )
+    stranger = User.objects.exclude(pk=author.pk).first()
+    category = (
+        Category.objects.filter(is_visible=True)
+        .annotate(post_count=Count('posts'))
+        .order_by('-post_count')
+        .first()
+    )
+    return {
+        'post': post,
+        'author': author,
+        'stranger': stranger,
+        'category': category,
+    }
+
+
+# Функция для построения запросов всех сценариев
+def build_requests(targets):
+    owner = Client()
+    owner.force_login(targets['author'])
+    stranger = Client()
+    stranger.force_login(targets['stranger'])
+    profile_url = reverse('blog:profile', args=[targets['author'].username])
+    post_data = {
+        'title': 'Бенчмарк',
+        'text': 'Текст публикации для бенчмарка.',
+        'pub_date': timezone.now().strftime('%Y-%m-%d %H:%M'),
+        'category': targets['category'].pk,
+    }
+    return {
+        'index': (Client(), 'get', reverse('blog:index'), None),
+        'detail': (
+            stranger, 'get',
+            reverse('blog:post_detail', args=[targets['post'].pk]), None
+        ),
+        'category': (
+            Client(), 'get',
+            reverse('blog:category_posts', args=[targets['category'].slug]),
+            None
+        ),
+        'profile_owner': (owner, 'get', profile_url, None),
+        'profile_stranger': (stranger, 'get', profile_url, None),
+        'create_post': (
+            owner, 'post', reverse('blog:create_post'), post_data
+        ),
+        'add_comment': (
+            stranger, 'post',
+            reverse('blog:add_comment', args=[targets['post'].pk]),
+            {'text': 'Комментарий из бенчмарка.'}
+        ),
+    }
+
+
+# Функция для замера задержки, числа запросов и объёма ответа
+def measure(client, method, url, data, iterations, warmup):
+    send = getattr(client, method)
+    for _ in range(warmup):
+        send(url, data)
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        send(url, data)
+        timings.append((time.perf_counter() - start) * 1000)
+    # Запросы считаются отдельным прогоном, чтобы их захват
+    # не искажал замеры времени
+    with CaptureQueriesContext(connection) as queries:
+        response = send(url, data)
+    return {
+        'status': response.status_code,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'queries': len(queries),
+        'bytes': len(response.content),
+    }
+
+
+# Функция для прогона выбранных сценариев на текущей базе
+def run_scenarios(scenarios=SCENARIOS, iterations=20, warmup=2):
+    requests = build_requests(find_targets())
+    return {
+        name: measure(*requests[name], iterations, warmup)
+        for name in scenarios
+    }
+
+
+# Функция для сравнения отчёта с эталоном, возвращает список регрессий
+def compare(report, baseline, tolerance=LATENCY_TOLERANCE):
+    regressions = []
+    for profile, scenarios in report.items():
+        for name, result in scenarios.items():
+            expected = baseline.get(profile, {}).get(name)
+            if expected is None:
+                continue
+            if result['queries'] > expected['queries']:
+                regressions.append(
+                    f'{profile}/{name}: запросов {result["queries"]} '
+                    f'вместо {expected["queries"]}'
+                )
+            limit = expected['p95_ms'] * (1 + tolerance)
+            if result['p95_ms'] > limit:
+                regressions.append(
+                    f'{profile}/{name}: p95 {result["p95_ms"]} мс '
+                    f'при допустимых {limit:.3f} мс'
+                )
+    return regressions
@@ -0,0 +1,78 @@
+from django.core.cache import cache
+
+from .metrics import registry
+
+_MISSING = object()
+
+
+# Функция для получения ключа версии пространства имён
+def _version_key(namespace):
+    return f'blog:{namespace}:version'
+
+
+# Функция для получения текущей версии пространства имён
+def get_version(namespace):
+    return cache.get(_version_key(namespace), 1)
+
+
+# Функция для получения версий нескольких пространств имён одним
+# обращением к кэшу
+def get_versions(*namespaces):
+    keys = [_version_key(namespace) for namespace in namespaces]
+    found = cache.get_many(keys)
+    return tuple(found.get(key, 1) for key in keys)
+
+
+# Функции для пространств имён карточек одного поста и одного автора
+def post_cards(post_id):
+    return f'cards:post:{post_id}'
+
+
+def author_cards(author_id):
+    return f'cards:author:{author_id}'
+
+
+# Функция для построения ключа кэша внутри пространства имён
+def make_key(namespace, key):
+    return f'blog:{namespace}:v{get_version(namespace)}:{key}'
+
+
+# Функция для чтения из кэша с учётом попаданий и промахов
+def get(namespace, key, default=None):
+    value = cache.get(make_key(namespace, key), _MISSING)
+    hit = value is not _MISSING
+    registry.inc(
+        'blog_cache_requests_total',
+        namespace=namespace,
+        result='hit' if hit else 'miss'
+    )
+    return value if hit else default
+
+
+# Функция для записи в кэш
+def set(namespace, key, value, timeout=None):
+    cache.set(make_key(namespace, key), value, timeout)
+
+
+# Функция для удаления ключа из кэша
+def delete(namespace, key):
+    cache.delete(make_key(namespace, key))
+
+
+# Функция для чтения из кэша с вычислением значения при промахе
+def get_or_set(namespace, key, factory, timeout=None):
+    value = get(namespace, key, _MISSING)
+    if value is _MISSING:
+        value = factory()
+        set(namespace, key, value, timeout)
+    return value
+
+
+# Функция для сброса пространств имён сменой их версии; старые ключи
+# перестают читаться и вытесняются по истечении срока
+def invalidate(*namespaces):
+    for namespace in namespaces:
+        try:
+            cache.incr(_version_key(namespace))
+        except ValueError:
+            cache.set(_version_key(namespace), 2, None)
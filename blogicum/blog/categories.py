@@ -0,0 +1,82 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Exists, F, Max, OuterRef, Value, When
+
+from .models import Category
+
+# Поля, которые ведёт дерево категорий, а не форма
+TREE_FIELDS = ('lft', 'rgt', 'depth', 'is_visible')
+
+
+# Функция для размещения новой категории во вложенном множестве:
+# последним ребёнком родителя или новым корнем
+def place(category):
+    parent = None
+    if category.parent_id is not None:
+        parent = (
+            Category.objects.filter(pk=category.parent_id)
+            .values('rgt', 'depth', 'is_visible')
+            .first()
+        )
+    if parent is None:
+        edge = Category.objects.aggregate(edge=Max('rgt'))['edge'] or 0
+        category.lft, category.rgt = edge + 1, edge + 2
+        category.depth = 0
+        category.is_visible = category.is_published
+        return
+    edge = parent['rgt']
+    Category.objects.filter(rgt__gte=edge).update(rgt=F('rgt') + 2)
+    Category.objects.filter(lft__gt=edge).update(lft=F('lft') + 2)
+    category.lft, category.rgt = edge, edge + 1
+    category.depth = parent['depth'] + 1
+    category.is_visible = category.is_published and parent['is_visible']
+
+
+# Функция для пересчёта видимости категорий одним запросом: категория
+# видна, если опубликована она и все её предки
+def refresh_visibility(category=None):
+    hidden_ancestors = Category.objects.filter(
+        lft__lt=OuterRef('lft'),
+        rgt__gt=OuterRef('rgt'),
+        is_published=False,
+    )
+    categories = (
+        Category.objects.all() if category is None
+        else category.get_descendants()
+    )
+    return categories.update(
+        is_visible=Case(
+            When(
+                ~Exists(hidden_ancestors),
+                is_published=True,
+                then=Value(True)
+            ),
+            default=Value(False)
+        )
+    )
+
+
+# Функция для пересборки дерева категорий по ссылкам на родителей;
+# нужна после переноса и удаления категорий и после загрузки данных
+@transaction.atomic
+def rebuild():
+    categories = list(Category.objects.order_by('pk'))
+    children = defaultdict(list)
+    for category in categories:
+        children[category.parent_id].append(category)
+    edge = 0
+
+    def walk(nodes, depth, visible):
+        nonlocal edge
+        for node in nodes:
+            edge += 1
+            node.lft = edge
+            node.depth = depth
+            node.is_visible = visible and node.is_published
+            walk(children[node.pk], depth + 1, node.is_visible)
+            edge += 1
+            node.rgt = edge
+
+    walk(children[None], 0, True)
+    Category.objects.bulk_update(categories, TREE_FIELDS)
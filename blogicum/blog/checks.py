@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Кэши, которые видит только текущий процесс
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+CACHED_SESSION_ENGINES = (
+    'django.contrib.sessions.backends.cache',
+    'django.contrib.sessions.backends.cached_db',
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    errors = []
+    backend = settings.CACHES['default']['BACKEND']
+    if settings.SHARED_CACHE and backend in LOCAL_CACHE_BACKENDS:
+        errors.append(Error(
+            'SHARED_CACHE включён, но кэш по умолчанию не общий для'
+            ' процессов.',
+            hint='Укажите в CACHES Memcached или Redis.',
+            id='blog.E001',
+        ))
+    if (
+        settings.SESSION_ENGINE in CACHED_SESSION_ENGINES
+        and not settings.SHARED_CACHE
+    ):
+        errors.append(Error(
+            'Сессии в кэше требуют общего для процессов кэша.',
+            hint='Включите SHARED_CACHE или храните сессии в базе.',
+            id='blog.E002',
+        ))
+    return errors
@@ -1,4 +1,84 @@
 POSTS_LIMIT = 10
 MAX_NAME_LENGTH = 256
+MAX_TAG_LENGTH = 64
 FIRST_NAME = 30
 LAST_NAME = 30
+# Порция строк для пакетных изменений из админки
+BULK_CHUNK_SIZE = 1000
+# Время жизни закэшированного числа постов в ленте, секунды
+COUNT_CACHE_TIMEOUT = 60
+# Время жизни закэшированных карточек постов, секунды
+CARD_CACHE_TIMEOUT = 600
+# Порция строк, читаемых из базы при потоковой выгрузке
+EXPORT_CHUNK_SIZE = 2000
+# Время жизни закэшированных списков категорий и мест, секунды
+CHOICES_CACHE_TIMEOUT = 3600
+# Наибольшее число вариантов в ответе автодополнения
+AUTOCOMPLETE_LIMIT = 20
+# Время жизни закэшированных пользователей для request.user, секунды
+USER_CACHE_TIMEOUT = 300
+# Авторы с большим числом подписчиков не рассылают посты по лентам,
+# их посты подмешиваются при чтении
+TIMELINE_FANOUT_LIMIT = 1000
+# Сколько последних постов автора попадает в ленту при подписке
+TIMELINE_BACKFILL = 50
+# Число строк-шардов счётчика реакций на один объект
+REACTION_SHARDS = 8
+# Виды реакций: значение и подпись на кнопке
+REACTION_KINDS = (
+    ('like', '👍'),
+    ('heart', '❤️'),
+    ('fire', '🔥'),
+)
+# Сколько самых популярных тегов показывает облако
+TAG_CLOUD_SIZE = 30
+# Число размеров шрифта в облаке тегов
+TAG_CLOUD_LEVELS = 5
+# Время жизни закэшированного облака тегов, секунды
+TAG_CLOUD_TIMEOUT = 3600
+# Радиус поиска постов рядом по умолчанию и наибольший, километры
+NEARBY_RADIUS_KM = 10
+NEARBY_MAX_RADIUS_KM = 200
+# Сколько ближайших мест учитывается при поиске постов рядом
+NEARBY_LOCATIONS_LIMIT = 500
+# Ширина сегмента пути комментария: id в base36 с ведущими нулями
+COMMENT_PATH_STEP = 7
+# Наибольшая вложенность ответов; глубже ответы встают рядом с родителем
+COMMENT_MAX_DEPTH = 30
+# Сколько веток комментариев показывается на странице поста
+COMMENTS_PER_PAGE = 50
+# Сколько первых ответов каждой ветки видно на странице поста
+COMMENT_PREVIEW_REPLIES = 3
+# Причины уведомлений: комментарий к посту и ответ на комментарий
+NOTIFICATION_REASONS = (
+    ('comment', 'прокомментировал вашу публикацию'),
+    ('reply', 'ответил на ваш комментарий'),
+)
+# Сколько уведомлений показывается на одной странице
+NOTIFICATIONS_LIMIT = 20
+# Частота дайджеста; без настроек пользователь получает ежедневный
+DIGEST_FREQUENCIES = (
+    ('daily', 'Раз в день'),
+    ('weekly', 'Раз в неделю'),
+    ('never', 'Не присылать'),
+)
+DEFAULT_DIGEST_FREQUENCY = 'daily'
+# Сколько последних комментариев цитирует дайджест
+DIGEST_RECENT_COMMENTS = 5
+# Сколько получателей дайджеста обрабатывается за одну порцию
+DIGEST_BATCH_SIZE = 200
+# Вес событий в рейтинге популярности
+SCORE_WEIGHTS = {
+    'view': 1,
+    'comment': 5,
+    'reaction': 3,
+}
+# За это время вклад события в рейтинг уменьшается вдвое, часы
+SCORE_HALF_LIFE_HOURS = 24
+# Просмотры копятся в памяти процесса и пишутся в базу одним пакетом
+# не чаще, чем раз в столько секунд
+VIEW_FLUSH_INTERVAL = 60
+# Сколько набирающих популярность постов показывается в категории
+TRENDING_LIMIT = 5
+# Время жизни закэшированных списков популярного, секунды
+TRENDING_CACHE_TIMEOUT = 300
@@ -0,0 +1,13 @@
+from django.conf import settings
+
+from .constants import CARD_CACHE_TIMEOUT
+
+
+# Карточки постов кэшируются только в общем кэше: сброс версии в кэше
+# процесса не виден другим процессам
+def cache_versions(request):
+    return {
+        'card_cache_timeout': (
+            CARD_CACHE_TIMEOUT if settings.SHARED_CACHE else None
+        ),
+    }
@@ -0,0 +1,265 @@
+import itertools
+import random
+import sqlite3
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import categories, geo, threads
+from .models import Category, Comment, Location, Post, User
+
+# Размеры наборов данных: пользователи, категории, места, посты, комментарии
+PROFILES = {
+    'tiny': dict(
+        users=20, categories=5, locations=10, posts=200, comments=1_000
+    ),
+    'small': dict(
+        users=200, categories=10, locations=100,
+        posts=5_000, comments=20_000
+    ),
+    'medium': dict(
+        users=2_000, categories=20, locations=1_000,
+        posts=100_000, comments=500_000
+    ),
+    'large': dict(
+        users=20_000, categories=50, locations=10_000,
+        posts=1_000_000, comments=5_000_000
+    ),
+}
+BATCH_SIZE = 5_000
+# Пароль всех сгенерированных пользователей, нужен нагрузочным тестам
+DEFAULT_PASSWORD = 'generated-password'
+# Показатель распределения Ципфа для «горячих» авторов и постов
+ZIPF_EXPONENT = 1.1
+FUTURE_POSTS_SHARE = 0.05
+UNPUBLISHED_POSTS_SHARE = 0.03
+UNPUBLISHED_CATEGORIES_SHARE = 0.1
+UNPUBLISHED_LOCATIONS_SHARE = 0.1
+POSTS_WITHOUT_LOCATION_SHARE = 0.2
+HISTORY_DAYS = 365
+SCHEDULE_DAYS = 30
+WORDS = (
+    'день', 'утро', 'город', 'море', 'горы', 'кофе', 'книга', 'поезд',
+    'дождь', 'солнце', 'друзья', 'работа', 'отпуск', 'кот', 'музыка',
+    'прогулка', 'вечер', 'снег', 'лес', 'река', 'ужин', 'путешествие',
+)
+
+
+# Функция для получения следующего свободного первичного ключа
+def _next_id(model):
+    last = model.objects.order_by('-pk').values_list('pk', flat=True).first()
+    return (last or 0) + 1
+
+
+# Функция для построения кумулятивных весов распределения Ципфа
+def _zipf_weights(size):
+    return list(itertools.accumulate(
+        1 / (rank ** ZIPF_EXPONENT) for rank in range(1, size + 1)
+    ))
+
+
+# Функция для генерации случайного текста из словаря
+def _words(rng, count):
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+
+# Контекст, в котором created_at сохраняется как задан, а не текущим
+# временем: auto_now_add выдал бы всем строкам набора одну дату. Меняет
+# поле модели для всего процесса, поэтому только для команды генерации
+@contextmanager
+def _explicit_created_at(*models):
+    fields = [model._meta.get_field('created_at') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+# Функция для пакетной вставки объектов из генератора
+def _bulk_insert(model, objects, batch_size):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch, batch_size=batch_size)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch, batch_size=batch_size)
+
+
+def _users(rng, first_id, count):
+    password = make_password(DEFAULT_PASSWORD)
+    for pk in range(first_id, first_id + count):
+        yield User(
+            pk=pk,
+            username=f'gen{pk}',
+            email=f'gen{pk}@example.com',
+            first_name=rng.choice(WORDS).title(),
+            last_name=rng.choice(WORDS).title(),
+            password=password,
+        )
+
+
+def _categories(rng, first_id, count):
+    for pk in range(first_id, first_id + count):
+        yield Category(
+            pk=pk,
+            title=_words(rng, 2).title(),
+            description=_words(rng, 12),
+            slug=f'gen-{pk}',
+            is_published=rng.random() >= UNPUBLISHED_CATEGORIES_SHARE,
+        )
+
+
+def _locations(rng, first_id, count):
+    for pk in range(first_id, first_id + count):
+        # Координаты берутся из отдельного генератора, чтобы не менять
+        # остальные данные набора с тем же seed
+        point = random.Random(pk)
+        yield Location(
+            pk=pk,
+            name=_words(rng, 2).title(),
+            is_published=rng.random() >= UNPUBLISHED_LOCATIONS_SHARE,
+            latitude=point.uniform(-60, 70),
+            longitude=point.uniform(-180, 180),
+        )
+
+
+# Посты пишутся к дате публикации, отложенные — сейчас; даты создания
+# копятся в post_dates для комментариев
+def _posts(rng, first_id, count, author_ids, category_ids, location_ids,
+           now, post_dates):
+    author_weights = _zipf_weights(len(author_ids))
+    for pk in range(first_id, first_id + count):
+        if rng.random() < FUTURE_POSTS_SHARE:
+            pub_date = now + timedelta(
+                seconds=rng.randint(1, SCHEDULE_DAYS * 24 * 3600)
+            )
+        else:
+            pub_date = now - timedelta(
+                seconds=rng.randint(0, HISTORY_DAYS * 24 * 3600)
+            )
+        location_id = None
+        if rng.random() >= POSTS_WITHOUT_LOCATION_SHARE:
+            location_id = rng.choice(location_ids)
+        created_at = min(pub_date, now)
+        post_dates.append(created_at.timestamp())
+        yield Post(
+            pk=pk,
+            created_at=created_at,
+            title=_words(rng, 4).capitalize(),
+            text=_words(rng, 60),
+            pub_date=pub_date,
+            is_published=rng.random() >= UNPUBLISHED_POSTS_SHARE,
+            author_id=rng.choices(author_ids, cum_weights=author_weights)[0],
+            category_id=rng.choice(category_ids),
+            location_id=location_id,
+        )
+
+
+# Комментарии генерируются корнями веток, путь задаётся сразу:
+# bulk_create не вызывает threads.attach. Дата комментария — случайная
+# между созданием поста и текущим моментом
+def _comments(rng, first_id, count, author_ids, post_ids, first_post, now,
+              post_dates):
+    author_weights = _zipf_weights(len(author_ids))
+    post_weights = _zipf_weights(len(post_ids))
+    now = now.timestamp()
+    for pk in range(first_id, first_id + count):
+        post_id = rng.choices(post_ids, cum_weights=post_weights)[0]
+        posted = post_dates[post_id - first_post]
+        yield Comment(
+            pk=pk,
+            path=threads.encode(pk),
+            text=_words(rng, 15),
+            post_id=post_id,
+            author_id=rng.choices(author_ids, cum_weights=author_weights)[0],
+            created_at=datetime.fromtimestamp(
+                rng.uniform(posted, now), tz=timezone.utc
+            ),
+        )
+
+
+# Функция для генерации синтетического набора данных по профилю
+def generate(profile='small', seed=0, batch_size=BATCH_SIZE, scale=1.0):
+    rng = random.Random(seed)
+    sizes = {
+        name: max(1, int(size * scale))
+        for name, size in PROFILES[profile].items()
+    }
+    now = timezone.now()
+    post_dates = array('d')
+    with transaction.atomic(), _explicit_created_at(Post, Comment):
+        first_user = _next_id(User)
+        _bulk_insert(
+            User, _users(rng, first_user, sizes['users']), batch_size
+        )
+        first_category = _next_id(Category)
+        _bulk_insert(
+            Category,
+            _categories(rng, first_category, sizes['categories']),
+            batch_size
+        )
+        categories.rebuild()
+        first_location = _next_id(Location)
+        _bulk_insert(
+            Location,
+            _locations(rng, first_location, sizes['locations']),
+            batch_size
+        )
+        geo.rebuild_index()
+        author_ids = list(range(first_user, first_user + sizes['users']))
+        # Порядок id перемешан, чтобы «горячие» авторы и посты
+        # не совпадали с самыми старыми записями
+        rng.shuffle(author_ids)
+        first_post = _next_id(Post)
+        _bulk_insert(
+            Post,
+            _posts(
+                rng, first_post, sizes['posts'], author_ids,
+                list(range(first_category,
+                           first_category + sizes['categories'])),
+                list(range(first_location,
+                           first_location + sizes['locations'])),
+                now, post_dates,
+            ),
+            batch_size
+        )
+        post_ids = list(range(first_post, first_post + sizes['posts']))
+        rng.shuffle(post_ids)
+        _bulk_insert(
+            Comment,
+            _comments(
+                rng, _next_id(Comment), sizes['comments'],
+                author_ids, post_ids, first_post, now, post_dates
+            ),
+            batch_size
+        )
+    return sizes
+
+
+# Функция для сохранения снимка базы SQLite в файл
+def snapshot(path):
+    connection.ensure_connection()
+    target = sqlite3.connect(str(path))
+    try:
+        connection.connection.backup(target)
+    finally:
+        target.close()
+
+
+# Функция для восстановления базы SQLite из снимка
+def restore(path):
+    connection.ensure_connection()
+    source = sqlite3.connect(str(path))
+    try:
+        source.backup(connection.connection)
+    finally:
+        source.close()
@@ -0,0 +1,83 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from .constants import EXPORT_CHUNK_SIZE
+from .models import Comment, Post
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+# Колонки выгрузки: имя колонки -> поле для values(); внешние ключи
+# разворачиваются соединением в том же запросе
+EXPORT_FIELDS = {
+    Post: {
+        'id': 'id',
+        'title': 'title',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'is_published': 'is_published',
+        'created_at': 'created_at',
+        'author': 'author__username',
+        'category': 'category__slug',
+        'location': 'location__name',
+    },
+    Comment: {
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'created_at': 'created_at',
+        'text': 'text',
+    },
+}
+
+
+class Echo:
+    """Псевдофайл, возвращающий записанную строку вместо буферизации."""
+
+    def write(self, value):
+        return value
+
+
+# Функция для построчного чтения набора в виде словарей колонок
+def export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    fields = EXPORT_FIELDS[queryset.model]
+    rows = queryset.order_by('pk').values_list(*fields.values())
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield dict(zip(fields, row))
+
+
+# Функция для построчной выгрузки в CSV с заголовком
+def csv_lines(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    writer = csv.DictWriter(Echo(), fieldnames=EXPORT_FIELDS[queryset.model])
+    yield writer.writeheader()
+    for row in export_rows(queryset, chunk_size):
+        yield writer.writerow(row)
+
+
+# Функция для построчной выгрузки в JSON Lines
+def jsonl_lines(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    for row in export_rows(queryset, chunk_size):
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+# Функция для получения генератора строк выгрузки в нужном формате
+def export_lines(queryset, export_format, chunk_size=EXPORT_CHUNK_SIZE):
+    if export_format == 'csv':
+        return csv_lines(queryset, chunk_size)
+    return jsonl_lines(queryset, chunk_size)
+
+
+# Функция для потокового ответа с выгрузкой набора
+def streaming_export(queryset, export_format):
+    response = StreamingHttpResponse(
+        export_lines(queryset, export_format),
+        content_type=FORMATS[export_format]
+    )
+    filename = f'{queryset.model._meta.model_name}.{export_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -1,17 +1,140 @@
 from django import forms
+from django.conf import settings
 from django.contrib.auth.forms import UserChangeForm, UserCreationForm
-from blog.constants import FIRST_NAME, LAST_NAME
+from django.forms.models import ModelChoiceIterator, ModelChoiceIteratorValue
+from django.urls import reverse_lazy
+from blog.constants import (
+    CHOICES_CACHE_TIMEOUT, FIRST_NAME, LAST_NAME, NEARBY_MAX_RADIUS_KM,
+    NEARBY_RADIUS_KM
+)
 
-from .models import Post, Comment, User
+from . import cache
+from .models import Post, Comment, NotificationSettings, User
+from .profiling import MODES
+from .tags import set_post_tags
+
+
+# Функция для имени пространства кэша со списком выбора модели
+def choices_namespace(model):
+    return f'{model._meta.model_name}_choices'
+
+
+class CachedModelChoiceIterator(ModelChoiceIterator):
+    """Варианты выбора, взятые из кэша вместо запроса к базе.
+
+    Только при общем кэше (SHARED_CACHE): в кэше процесса сброс списка
+    после изменения в другом процессе не виден, и список читается
+    из базы.
+    """
+
+    def cached_choices(self):
+        return cache.get_or_set(
+            choices_namespace(self.queryset.model),
+            'choices',
+            lambda: [
+                (obj.pk, self.field.label_from_instance(obj))
+                for obj in self.queryset.iterator()
+            ],
+            CHOICES_CACHE_TIMEOUT
+        )
+
+    def __iter__(self):
+        if not settings.SHARED_CACHE:
+            yield from super().__iter__()
+            return
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for pk, label in self.cached_choices():
+            yield ModelChoiceIteratorValue(pk, None), label
+
+    def __len__(self):
+        if not settings.SHARED_CACHE:
+            return super().__len__()
+        return (
+            len(self.cached_choices())
+            + (self.field.empty_label is not None)
+        )
+
+
+class CachedModelChoiceField(forms.ModelChoiceField):
+    """Поле выбора объекта со списком вариантов из кэша."""
+
+    iterator = CachedModelChoiceIterator
+
+
+class CategoryChoiceField(CachedModelChoiceField):
+    """Поле выбора категории с отступами по вложенности."""
+
+    def label_from_instance(self, obj):
+        return '— ' * obj.depth + str(obj)
+
+
+class AutocompleteSelect(forms.Select):
+    """Список выбора, отдающий в разметку только выбранный вариант;
+    остальные подгружаются скриптом с эндпоинта автодополнения.
+    """
+
+    def __init__(self, url, attrs=None):
+        super().__init__(attrs)
+        self.url = url
+
+    class Media:
+        js = ('js/autocomplete.js',)
+
+    def get_context(self, name, value, attrs):
+        attrs = {**(attrs or {}), 'data-autocomplete-url': str(self.url)}
+        return super().get_context(name, value, attrs)
+
+    def optgroups(self, name, value, attrs=None):
+        iterator = self.choices
+        selected = [item for item in value if item]
+        choices = [('', iterator.field.empty_label or '')]
+        choices += [
+            (obj.pk, iterator.field.label_from_instance(obj))
+            for obj in iterator.queryset.filter(pk__in=selected)
+        ]
+        self.choices = choices
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = iterator
 
 
 class PostForm(forms.ModelForm):
+    tags = forms.CharField(
+        required=False,
+        label='Теги',
+        help_text='Через запятую, например: путешествия, горы.'
+    )
+
     class Meta:
         model = Post
-        exclude = ('author', 'is_published')
+        exclude = ('author', 'is_published', 'tags')
         widgets = {
             'pub_date': forms.DateInput(attrs={'type': 'date'})
         }
+        field_classes = {
+            'category': CategoryChoiceField,
+            'location': CachedModelChoiceField,
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if settings.LOCATION_AUTOCOMPLETE:
+            self.fields['location'].widget = AutocompleteSelect(
+                reverse_lazy('blog:location_autocomplete')
+            )
+            self.fields['location'].widget.choices = (
+                self.fields['location'].choices
+            )
+        if self.instance.pk:
+            self.initial['tags'] = ', '.join(
+                self.instance.tags.values_list('name', flat=True)
+            )
+
+    def _save_m2m(self):
+        super()._save_m2m()
+        set_post_tags(self.instance, self.cleaned_data.get('tags'))
 
 
 class UserCreationForm(UserCreationForm):
@@ -46,3 +169,46 @@ class CommentForm(forms.ModelForm):
 
 class CommentDeleteForm(forms.Form):
     pass
+
+
+class NotificationSettingsForm(forms.ModelForm):
+
+    class Meta:
+        model = NotificationSettings
+        fields = ('digest',)
+
+
+class NearbyForm(forms.Form):
+    lat = forms.FloatField(min_value=-90, max_value=90, label='Широта')
+    lon = forms.FloatField(min_value=-180, max_value=180, label='Долгота')
+    radius = forms.FloatField(
+        min_value=0.1,
+        max_value=NEARBY_MAX_RADIUS_KM,
+        initial=NEARBY_RADIUS_KM,
+        required=False,
+        label='Радиус, км'
+    )
+
+    def clean_radius(self):
+        return self.cleaned_data['radius'] or NEARBY_RADIUS_KM
+
+
+class ProfilingForm(forms.Form):
+    sample_rate = forms.FloatField(
+        min_value=0,
+        max_value=1,
+        label='Доля профилируемых запросов',
+        help_text='0 — выключено, 1 — каждый запрос.'
+    )
+    path = forms.CharField(
+        required=False,
+        label='Адрес страницы',
+        help_text='Для разовой подписанной ссылки на профиль страницы.'
+    )
+    modes = forms.MultipleChoiceField(
+        choices=[(mode, mode) for mode in MODES],
+        initial=['cprofile'],
+        required=False,
+        widget=forms.CheckboxSelectMultiple,
+        label='Профилировщики'
+    )
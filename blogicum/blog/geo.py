@@ -0,0 +1,158 @@
+import math
+
+from django.db import connection
+
+from . import querysets
+from .constants import NEARBY_LOCATIONS_LIMIT
+from .models import Location
+
+# Виртуальная таблица R*Tree с точками мест; создаётся миграцией
+# и есть только в SQLite
+RTREE_TABLE = 'blog_location_rtree'
+EARTH_RADIUS_KM = 6371.0
+
+
+# Функция для проверки, что поиск идёт по индексу R*Tree
+def rtree_available():
+    return connection.vendor == 'sqlite'
+
+
+# Функция для записи места в индекс; места без координат из него убираются
+def index_location(location):
+    if not rtree_available():
+        return
+    with connection.cursor() as cursor:
+        if not location.has_coordinates:
+            cursor.execute(
+                f'DELETE FROM {RTREE_TABLE} WHERE id = %s', [location.pk]
+            )
+            return
+        lat, lon = location.latitude, location.longitude
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {RTREE_TABLE} '
+            '(id, min_lat, max_lat, min_lon, max_lon) '
+            'VALUES (%s, %s, %s, %s, %s)',
+            [location.pk, lat, lat, lon, lon]
+        )
+
+
+# Функция для удаления места из индекса
+def unindex_location(pk):
+    if not rtree_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {RTREE_TABLE} WHERE id = %s', [pk])
+
+
+# Функция для удаления порции мест из индекса одним запросом
+def unindex_locations(pks):
+    if not rtree_available() or not pks:
+        return
+    placeholders = ', '.join(['%s'] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {RTREE_TABLE} WHERE id IN ({placeholders})',
+            list(pks)
+        )
+
+
+# Функция для заполнения индекса заново по таблице мест
+def rebuild_index():
+    if not rtree_available():
+        return 0
+    rows = list(
+        Location.objects.filter(latitude__isnull=False)
+        .values_list('pk', 'latitude', 'longitude')
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {RTREE_TABLE}')
+        cursor.executemany(
+            f'INSERT INTO {RTREE_TABLE} '
+            '(id, min_lat, max_lat, min_lon, max_lon) '
+            'VALUES (%s, %s, %s, %s, %s)',
+            [(pk, lat, lat, lon, lon) for pk, lat, lon in rows]
+        )
+    return len(rows)
+
+
+# Функция для расстояния по большому кругу, километры
+def haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+# Функция для прямоугольников (широта, широта, долгота, долгота),
+# покрывающих круг; у линии перемены дат их два
+def bounding_boxes(lat, lon, radius_km):
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = lat - delta_lat, lat + delta_lat
+    if min_lat <= -90 or max_lat >= 90:
+        # Круг накрывает полюс: подходит любая долгота
+        return [(max(min_lat, -90), min(max_lat, 90), -180, 180)]
+    # Крайние по долготе точки круга лежат не на широте центра, а ближе
+    # к полюсу: отклонение по долготе — asin(sin(r/R) / cos(широты))
+    ratio = (
+        math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(lat))
+    )
+    if ratio >= 1:
+        return [(min_lat, max_lat, -180, 180)]
+    delta_lon = math.degrees(math.asin(ratio))
+    min_lon, max_lon = lon - delta_lon, lon + delta_lon
+    if min_lon < -180:
+        return [
+            (min_lat, max_lat, min_lon + 360, 180),
+            (min_lat, max_lat, -180, max_lon),
+        ]
+    if max_lon > 180:
+        return [
+            (min_lat, max_lat, min_lon, 180),
+            (min_lat, max_lat, -180, max_lon - 360),
+        ]
+    return [(min_lat, max_lat, min_lon, max_lon)]
+
+
+# Функция для мест в прямоугольнике: (id, широта, долгота)
+def _box_candidates(box):
+    min_lat, max_lat, min_lon, max_lon = box
+    if not rtree_available():
+        return Location.objects.filter(
+            latitude__range=(min_lat, max_lat),
+            longitude__range=(min_lon, max_lon),
+        ).values_list('pk', 'latitude', 'longitude')
+    with connection.cursor() as cursor:
+        # R*Tree хранит координаты в float32 с округлением наружу,
+        # поэтому прямоугольник ничего не теряет
+        cursor.execute(
+            f'SELECT id, min_lat, min_lon FROM {RTREE_TABLE} '
+            'WHERE max_lat >= %s AND min_lat <= %s '
+            'AND max_lon >= %s AND min_lon <= %s',
+            [min_lat, max_lat, min_lon, max_lon]
+        )
+        return cursor.fetchall()
+
+
+# Функция для ближайших мест в радиусе: словарь id -> расстояние, км;
+# прямоугольник выбирается по индексу, круг уточняется в Python
+def nearby_locations(lat, lon, radius_km, limit=NEARBY_LOCATIONS_LIMIT):
+    distances = []
+    for box in bounding_boxes(lat, lon, radius_km):
+        for pk, point_lat, point_lon in _box_candidates(box):
+            distance = haversine(lat, lon, point_lat, point_lon)
+            if distance <= radius_km:
+                distances.append((distance, pk))
+    distances.sort()
+    return {pk: distance for distance, pk in distances[:limit]}
+
+
+# Функция для опубликованных постов из мест рядом с точкой
+def nearby_posts(lat, lon, radius_km):
+    distances = nearby_locations(lat, lon, radius_km)
+    posts = querysets.get_published_posts().filter(
+        location_id__in=list(distances),
+        location__is_published=True,
+    )
+    return posts, distances
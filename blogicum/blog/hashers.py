@@ -0,0 +1,180 @@
+import base64
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher, BasePasswordHasher, PBKDF2PasswordHasher,
+    get_hasher, identify_hasher, mask_hash
+)
+from django.utils.crypto import constant_time_compare
+from django.utils.translation import gettext_noop
+
+# Наименьшее число итераций PBKDF2, которое выдаёт калибровка
+MIN_PBKDF2_ITERATIONS = 100_000
+MAX_ARGON2_TIME_COST = 16
+# Границы калибровки scrypt: степени двойки от 2**14 до 2**20
+MIN_SCRYPT_WORK_FACTOR = 2 ** 14
+MAX_SCRYPT_WORK_FACTOR = 2 ** 20
+BENCHMARK_PASSWORD = 'calibration-password'
+
+
+class CalibratedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 с числом итераций из настройки PASSWORD_PBKDF2_ITERATIONS."""
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+class CalibratedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2 со стоимостью из настройки PASSWORD_ARGON2_TIME_COST."""
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+
+class ScryptPasswordHasher(BasePasswordHasher):
+    """Scrypt на hashlib.scrypt в формате хешей Django 4.0, где этот
+    алгоритм встроен: после обновления Django хеши останутся верными.
+    """
+
+    algorithm = 'scrypt'
+    block_size = 8
+    parallelism = 1
+    work_factor = MIN_SCRYPT_WORK_FACTOR
+
+    def encode(self, password, salt, n=None, r=None, p=None):
+        assert password is not None
+        assert salt and '$' not in salt
+        n = n or self.work_factor
+        r = r or self.block_size
+        p = p or self.parallelism
+        hash = hashlib.scrypt(
+            password.encode(), salt=salt.encode(), n=n, r=r, p=p,
+            # Памяти нужно 128 * n * r байт; запас на служебные буферы
+            maxmem=256 * n * r * p, dklen=64
+        )
+        hash = base64.b64encode(hash).decode('ascii').strip()
+        return '%s$%d$%s$%d$%d$%s' % (self.algorithm, n, salt, r, p, hash)
+
+    def decode(self, encoded):
+        algorithm, work_factor, salt, block_size, parallelism, hash = (
+            encoded.split('$', 6)
+        )
+        assert algorithm == self.algorithm
+        return {
+            'algorithm': algorithm,
+            'work_factor': int(work_factor),
+            'salt': salt,
+            'block_size': int(block_size),
+            'parallelism': int(parallelism),
+            'hash': hash,
+        }
+
+    def verify(self, password, encoded):
+        decoded = self.decode(encoded)
+        encoded_2 = self.encode(
+            password, decoded['salt'], decoded['work_factor'],
+            decoded['block_size'], decoded['parallelism']
+        )
+        return constant_time_compare(encoded, encoded_2)
+
+    def safe_summary(self, encoded):
+        decoded = self.decode(encoded)
+        return {
+            gettext_noop('algorithm'): decoded['algorithm'],
+            gettext_noop('work factor'): decoded['work_factor'],
+            gettext_noop('block size'): decoded['block_size'],
+            gettext_noop('parallelism'): decoded['parallelism'],
+            gettext_noop('salt'): mask_hash(decoded['salt']),
+            gettext_noop('hash'): mask_hash(decoded['hash']),
+        }
+
+    def must_update(self, encoded):
+        decoded = self.decode(encoded)
+        return (
+            decoded['work_factor'] != self.work_factor
+            or decoded['block_size'] != self.block_size
+            or decoded['parallelism'] != self.parallelism
+        )
+
+    def harden_runtime(self, password, encoded):
+        # Стоимость scrypt не добирается частями, как итерации PBKDF2
+        pass
+
+
+class CalibratedScryptPasswordHasher(ScryptPasswordHasher):
+    """Scrypt с параметром N из настройки PASSWORD_SCRYPT_WORK_FACTOR."""
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT_WORK_FACTOR
+
+
+# Функция для проверки, нужно ли перехешировать пароль по текущей политике
+def needs_rehash(encoded):
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+    preferred = get_hasher('default')
+    return (
+        hasher.algorithm != preferred.algorithm
+        or preferred.must_update(encoded)
+    )
+
+
+# Функция для замера времени хеширования с заданной стоимостью, мс
+def benchmark(algorithm, cost, rounds=3):
+    if algorithm == 'argon2':
+        hasher = Argon2PasswordHasher()
+        hasher.time_cost = cost
+    elif algorithm == 'scrypt':
+        hasher = ScryptPasswordHasher()
+        hasher.work_factor = cost
+    else:
+        hasher = PBKDF2PasswordHasher()
+        hasher.iterations = cost
+    salt = hasher.salt()
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        hasher.encode(BENCHMARK_PASSWORD, salt)
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+# Функция для подбора стоимости хеширования под бюджет времени на этом
+# хосте; возвращает стоимость и список замеров (стоимость, мс)
+def calibrate(algorithm, target_ms, rounds=3):
+    if algorithm == 'argon2':
+        measurements = []
+        for cost in range(1, MAX_ARGON2_TIME_COST + 1):
+            elapsed = benchmark(algorithm, cost, rounds)
+            if elapsed > target_ms and measurements:
+                break
+            measurements.append((cost, elapsed))
+        return measurements[-1][0], measurements
+    if algorithm == 'scrypt':
+        # N — степень двойки; время растёт вдвое на каждую ступень
+        measurements = []
+        cost = MIN_SCRYPT_WORK_FACTOR
+        while cost <= MAX_SCRYPT_WORK_FACTOR:
+            elapsed = benchmark(algorithm, cost, rounds)
+            if elapsed > target_ms and measurements:
+                break
+            measurements.append((cost, elapsed))
+            cost *= 2
+        return measurements[-1][0], measurements
+    probe = MIN_PBKDF2_ITERATIONS // 10
+    elapsed = benchmark(algorithm, probe, rounds)
+    # Время PBKDF2 линейно по числу итераций
+    cost = max(
+        MIN_PBKDF2_ITERATIONS,
+        round(probe * target_ms / elapsed, -3)
+    )
+    return int(cost), [(probe, elapsed), (
+        int(cost), benchmark(algorithm, int(cost), rounds)
+    )]
@@ -0,0 +1,217 @@
+import json
+import logging
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connection
+from django.template.base import Node, Template
+
+_current_stats = ContextVar('request_stats', default=None)
+_current_request = ContextVar('request', default=None)
+
+slow_query_logger = logging.getLogger('blog.slow_queries')
+nplusone_logger = logging.getLogger('blog.nplusone')
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+
+
+class RequestStats:
+    """Время SQL и шаблонов, накопленное за один запрос."""
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.sql_time += time.perf_counter() - start
+
+
+# Функция для получения имени маршрута обработанного запроса
+def get_url_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else None
+
+
+# Функция для привязки запроса к текущему контексту выполнения
+def bind_request(request):
+    return _current_request.set(request)
+
+
+# Функция для отвязки запроса от контекста
+def unbind_request(token):
+    _current_request.reset(token)
+
+
+# Функция для получения имени маршрута запроса, в котором выполняется код
+def current_url_name():
+    request = _current_request.get()
+    return get_url_name(request) if request is not None else None
+
+
+# Функция для приведения SQL к форме без литералов и длины списков IN
+def fingerprint(sql):
+    sql = _LITERALS.sub('?', sql)
+    sql = _LISTS.sub('(...)', sql)
+    return ' '.join(sql.split())
+
+
+# Функция для привязки статистики к текущему запросу
+def activate(stats):
+    return _current_stats.set(stats)
+
+
+# Функция для отвязки статистики после завершения запроса
+def deactivate(token):
+    _current_stats.reset(token)
+
+
+# Функция для получения статистики текущего запроса
+def current_stats():
+    return _current_stats.get()
+
+
+def _timed_render(render):
+    def wrapper(self, context):
+        stats = _current_stats.get()
+        if stats is None:
+            return render(self, context)
+        # Учитывается только внешний шаблон, вложенные include входят в
+        # его время; SQL, выполненный при отрисовке, из времени вычитается
+        stats.template_depth += 1
+        start = time.perf_counter()
+        sql_before = stats.sql_time
+        try:
+            return render(self, context)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:
+                stats.template_time += (
+                    time.perf_counter() - start
+                    - (stats.sql_time - sql_before)
+                )
+
+    wrapper.timed = True
+    return wrapper
+
+
+# Функция для однократной установки замера времени отрисовки шаблонов
+def install_template_timer():
+    if not getattr(Template.render, 'timed', False):
+        Template.render = _timed_render(Template.render)
+
+
+class SlowQueryLogger:
+    """Пишет в лог SQL дольше SLOW_QUERY_THRESHOLD_MS вместе с планом."""
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if not many and elapsed_ms >= settings.SLOW_QUERY_THRESHOLD_MS:
+            self.record(context['connection'], sql, params, elapsed_ms)
+        return result
+
+    def record(self, connection, sql, params, elapsed_ms):
+        slow_query_logger.warning(json.dumps({
+            'sql': sql,
+            'fingerprint': fingerprint(sql),
+            'params': [str(param) for param in params or ()],
+            'duration_ms': round(elapsed_ms, 3),
+            'url_name': current_url_name(),
+            'plan': explain(connection, sql, params),
+        }, ensure_ascii=False))
+
+
+# Функция для получения плана запроса в обход обёрток выполнения
+def explain(connection, sql, params):
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    prefix = (
+        'EXPLAIN QUERY PLAN' if connection.vendor == 'sqlite' else 'EXPLAIN'
+    )
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(f'{prefix} {sql}', params)
+        return [' | '.join(map(str, row)) for row in cursor.fetchall()]
+    except Exception as error:
+        return [f'EXPLAIN недоступен: {error}']
+    finally:
+        cursor.close()
+
+
+slow_query_log = SlowQueryLogger()
+
+
+# Функция для подключения журнала медленных запросов к соединению
+def install_slow_query_log(sender, connection, **kwargs):
+    if slow_query_log not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_log)
+
+
+class NPlusOneError(Exception):
+    """Однотипные запросы из шаблона превысили NPLUSONE_THRESHOLD."""
+
+
+# Функция для поиска строки шаблона, при отрисовке которой выполняется код
+def template_location():
+    frame = sys._getframe(1)
+    while frame is not None:
+        node = frame.f_locals.get('self')
+        # type() вместо isinstance(): ленивые объекты вроде request.user
+        # подменяют __class__ и выполнили бы запрос при проверке
+        if issubclass(type(node), Node) and getattr(node, 'token', None):
+            origin = node.origin
+            name = getattr(origin, 'template_name', None) or origin.name
+            return f'{name}:{node.token.lineno}'
+        frame = frame.f_back
+    return None
+
+
+class NPlusOneDetector:
+    """Находит однотипные запросы, выполненные при отрисовке шаблонов."""
+
+    def __init__(self, threshold=None):
+        self.threshold = threshold or settings.NPLUSONE_THRESHOLD
+        self.queries = defaultdict(list)
+
+    def __call__(self, execute, sql, params, many, context):
+        location = template_location()
+        if location is not None:
+            self.queries[fingerprint(sql)].append(location)
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self.wrapper = connection.execute_wrapper(self)
+        self.wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.wrapper.__exit__(*exc_info)
+
+    def problems(self):
+        for sql, locations in self.queries.items():
+            if len(locations) >= self.threshold:
+                location = Counter(locations).most_common(1)[0][0]
+                yield (
+                    f'{len(locations)} однотипных запросов из шаблона '
+                    f'{location}: {sql}'
+                )
+
+    def report(self, url_name=None):
+        problems = list(self.problems())
+        for problem in problems:
+            nplusone_logger.warning('N+1 в %s: %s', url_name, problem)
+        if problems and settings.NPLUSONE_RAISE:
+            raise NPlusOneError('\n'.join(problems))
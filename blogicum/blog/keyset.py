@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta, timezone
+
+from django.db.models import Q
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+# Функция для курсора страницы по дате и id последнего поста
+def encode_cursor(pub_date, pk):
+    return f'{(pub_date - EPOCH) // timedelta(microseconds=1)}-{pk}'
+
+
+# Функция для разбора курсора; некорректный курсор — первая страница
+def decode_cursor(cursor):
+    try:
+        microseconds, pk = map(int, (cursor or '').split('-'))
+    except ValueError:
+        return None
+    return EPOCH + timedelta(microseconds=microseconds), pk
+
+
+# Функция для условия «строго раньше курсора» в порядке (дата, id) по убыванию
+def before(cursor, date_field, pk_field):
+    pub_date, pk = cursor
+    return Q(**{f'{date_field}__lt': pub_date}) | Q(
+        **{date_field: pub_date, f'{pk_field}__lt': pk}
+    )
+
+
+# Функция для разбиения ключей (дата, id), выбранных с запасом в одну
+# строку, на страницу и курсор следующей страницы
+def split_page(keys, limit):
+    keys = sorted(keys, reverse=True)
+    page = keys[:limit]
+    next_cursor = encode_cursor(*page[-1]) if len(keys) > limit else None
+    return page, next_cursor
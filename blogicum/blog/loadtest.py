@@ -0,0 +1,291 @@
+import bisect
+import io
+import logging
+import random
+import sys
+import time
+from collections import Counter, defaultdict, namedtuple
+from http.cookies import SimpleCookie
+from urllib.parse import unquote, urlencode
+
+from django.db import OperationalError, connection, connections
+from django.urls import reverse
+
+from .benchmarks import percentile
+from .datagen import DEFAULT_PASSWORD
+from .models import User
+from .querysets import get_published_posts
+
+# Доли действий виртуальных пользователей по умолчанию
+DEFAULT_MIX = {'feed': 60, 'detail': 30, 'comment': 5, 'login': 5}
+# Границы корзин гистограммы задержек, мс
+HISTOGRAM_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+# Порог медленного пишущего запроса
+SLOW_WRITE_MS = 50
+FEED_PAGES = 5
+TARGETS_LIMIT = 1000
+
+# write_times — время каждой попытки записи в запросе, мс; locked_ms —
+# время попыток, так и не дождавшихся блокировки SQLite
+Sample = namedtuple(
+    'Sample', 'action status latency_ms write_times locked locked_ms error'
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Функция для разбора строки вида feed=60,detail=30 в словарь долей
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        action, _, weight = part.partition('=')
+        if action not in DEFAULT_MIX:
+            raise ValueError(f'Неизвестное действие: {action}')
+        mix[action] = int(weight)
+    return mix
+
+
+# Функция для выбора постов и пользователей, к которым идут запросы
+def load_targets():
+    return {
+        'post_ids': list(
+            get_published_posts()
+            .values_list('pk', flat=True)[:TARGETS_LIMIT]
+        ),
+        'usernames': list(
+            User.objects.filter(username__startswith='gen')
+            .values_list('username', flat=True)[:TARGETS_LIMIT]
+        ),
+    }
+
+
+class WriteStatsCounter:
+    """Обёртка выполнения SQL, замеряющая каждую попытку записи.
+
+    SQLite ждёт блокировку базы внутри пишущего запроса (до busy
+    timeout), поэтому время попытки включает ожидание. Попытки, так и
+    не дождавшиеся блокировки, считаются отдельно.
+    """
+
+    def __init__(self):
+        self.write_times = []
+        self.locked = 0
+        self.locked_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith('SELECT'):
+            return execute(sql, params, many, context)
+        locked = False
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as error:
+            locked = 'locked' in str(error)
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.write_times.append(elapsed_ms)
+            if locked:
+                self.locked += 1
+                self.locked_ms += elapsed_ms
+
+
+class VirtualUser:
+    """Пользователь, обращающийся к WSGI-приложению напрямую."""
+
+    def __init__(self, application, host, targets, rng):
+        self.application = application
+        self.host = host
+        self.targets = targets
+        self.rng = rng
+        self.cookies = SimpleCookie()
+        self.logged_in = False
+
+    def request(self, method, path, data=None):
+        body = urlencode(data or {}).encode()
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': unquote(path.split('?')[0]),
+            'QUERY_STRING': path.partition('?')[2],
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': self.host,
+            'HTTP_COOKIE': '; '.join(
+                f'{name}={morsel.value}'
+                for name, morsel in self.cookies.items()
+            ),
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split()[0])
+            for name, value in headers:
+                if name.lower() == 'set-cookie':
+                    self.cookies.load(value)
+
+        result = self.application(environ, start_response)
+        try:
+            for _ in result:
+                pass
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status']
+
+    def csrf_data(self, **data):
+        token = self.cookies.get('csrftoken')
+        if token is not None:
+            data['csrfmiddlewaretoken'] = token.value
+        return data
+
+    def feed(self):
+        page = self.rng.randint(1, FEED_PAGES)
+        return self.request('GET', f'{reverse("blog:index")}?page={page}')
+
+    def detail(self):
+        post_id = self.rng.choice(self.targets['post_ids'])
+        return self.request(
+            'GET', reverse('blog:post_detail', args=[post_id])
+        )
+
+    def login(self):
+        self.request('GET', reverse('login'))
+        status = self.request('POST', reverse('login'), self.csrf_data(
+            username=self.rng.choice(self.targets['usernames']),
+            password=DEFAULT_PASSWORD,
+        ))
+        self.logged_in = status == 302
+        return status
+
+    def comment(self):
+        if not self.logged_in:
+            self.login()
+        post_id = self.rng.choice(self.targets['post_ids'])
+        self.request('GET', reverse('blog:post_detail', args=[post_id]))
+        return self.request(
+            'POST',
+            reverse('blog:add_comment', args=[post_id]),
+            self.csrf_data(text='Комментарий нагрузочного теста.')
+        )
+
+
+# Функция одного потока или процесса нагрузки, возвращает замеры
+def run_worker(worker_id, requests, mix, host, targets, seed):
+    from blogicum.wsgi import application
+
+    rng = random.Random(seed + worker_id)
+    user = VirtualUser(application, host, targets, rng)
+    actions = list(mix)
+    weights = [mix[action] for action in actions]
+    samples = []
+    counter = WriteStatsCounter()
+    logged = set()
+    try:
+        with connection.execute_wrapper(counter):
+            for _ in range(requests):
+                action = rng.choices(actions, weights)[0]
+                writes = len(counter.write_times)
+                locked, locked_ms = counter.locked, counter.locked_ms
+                error = None
+                start = time.perf_counter()
+                try:
+                    status = getattr(user, action)()
+                except Exception as exc:
+                    status = 599
+                    error = type(exc).__name__
+                    # Трассировка каждого типа ошибки пишется один раз
+                    # на поток, остальные только считаются в отчёте
+                    if error not in logged:
+                        logged.add(error)
+                        logger.exception('Ошибка действия %s', action)
+                samples.append(Sample(
+                    action,
+                    status,
+                    (time.perf_counter() - start) * 1000,
+                    tuple(counter.write_times[writes:]),
+                    counter.locked - locked,
+                    counter.locked_ms - locked_ms,
+                    error,
+                ))
+    finally:
+        connections.close_all()
+    return samples
+
+
+# Функция для закрытия унаследованных соединений в дочернем процессе
+def init_process():
+    connections.close_all()
+
+
+# Функция для сведения замеров в отчёт
+def summarize(samples, elapsed):
+    by_action = defaultdict(list)
+    for sample in samples:
+        by_action[sample.action].append(sample)
+    histogram = Counter()
+    for sample in samples:
+        index = bisect.bisect_left(HISTOGRAM_BUCKETS, sample.latency_ms)
+        label = (
+            f'<={HISTOGRAM_BUCKETS[index]}ms'
+            if index < len(HISTOGRAM_BUCKETS)
+            else f'>{HISTOGRAM_BUCKETS[-1]}ms'
+        )
+        histogram[label] += 1
+    actions = {}
+    for action, action_samples in sorted(by_action.items()):
+        latencies = [sample.latency_ms for sample in action_samples]
+        errors = sum(1 for sample in action_samples if sample.status >= 400)
+        actions[action] = {
+            'requests': len(action_samples),
+            'error_rate': round(errors / len(action_samples), 4),
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+        }
+    errors = sum(1 for sample in samples if sample.status >= 400)
+    write_times = [
+        elapsed for sample in samples for elapsed in sample.write_times
+    ]
+    return {
+        'requests': len(samples),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else 0,
+        'error_rate': round(errors / len(samples), 4) if samples else 0,
+        'writes': {
+            'count': len(write_times),
+            'total_ms': round(sum(write_times), 3),
+            **{
+                f'p{pct}_ms': (
+                    round(percentile(write_times, pct), 3)
+                    if write_times else 0
+                )
+                for pct in (50, 95, 99)
+            },
+        },
+        'slow_writes': sum(
+            1 for elapsed in write_times if elapsed > SLOW_WRITE_MS
+        ),
+        'locked_errors': sum(sample.locked for sample in samples),
+        'locked_wait_ms': round(
+            sum(sample.locked_ms for sample in samples), 3
+        ),
+        'exceptions': dict(Counter(
+            sample.error for sample in samples if sample.error
+        )),
+        'histogram': {
+            label: histogram[label]
+            for label in [f'<={bucket}ms' for bucket in HISTOGRAM_BUCKETS]
+            + [f'>{HISTOGRAM_BUCKETS[-1]}ms']
+        },
+        'actions': actions,
+    }
@@ -0,0 +1,141 @@
+import base64
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+# Функция для перевода письма в словарь для хранения в очереди
+def serialize(message):
+    attachments = []
+    for attachment in message.attachments:
+        filename, content, mimetype = attachment
+        if isinstance(content, str):
+            content = content.encode()
+        attachments.append(
+            [filename, base64.b64encode(content).decode(), mimetype]
+        )
+    return {
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': list(message.to),
+        'cc': list(message.cc),
+        'bcc': list(message.bcc),
+        'reply_to': list(message.reply_to),
+        'headers': message.extra_headers,
+        'alternatives': [
+            list(alternative)
+            for alternative in getattr(message, 'alternatives', ())
+        ],
+        'attachments': attachments,
+    }
+
+
+# Функция для восстановления письма из очереди
+def deserialize(payload):
+    message = EmailMultiAlternatives(
+        subject=payload['subject'],
+        body=payload['body'],
+        from_email=payload['from_email'],
+        to=payload['to'],
+        cc=payload['cc'],
+        bcc=payload['bcc'],
+        reply_to=payload['reply_to'],
+        headers=payload['headers'],
+        alternatives=[tuple(item) for item in payload['alternatives']],
+    )
+    for filename, content, mimetype in payload['attachments']:
+        message.attach(filename, base64.b64decode(content), mimetype)
+    return message
+
+
+class OutboxEmailBackend(BaseEmailBackend):
+    """Бэкенд, который не отправляет письма, а кладёт их в таблицу
+    очереди; отправляет их команда send_outbox.
+    """
+
+    def send_messages(self, email_messages):
+        messages = [
+            OutboxMessage(payload=serialize(message))
+            for message in email_messages
+            if message.recipients()
+        ]
+        OutboxMessage.objects.bulk_create(messages)
+        return len(messages)
+
+
+# Функция для задержки перед повторной попыткой
+def retry_delay(attempts):
+    return min(
+        settings.OUTBOX_RETRY_BASE * 2 ** (attempts - 1),
+        settings.OUTBOX_RETRY_MAX
+    )
+
+
+# Функция для захвата порции писем к отправке; захваченные письма
+# откладываются на время аренды, чтобы их не взял другой обработчик
+def claim_batch(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(
+                sent_at__isnull=True,
+                available_at__lte=now,
+                attempts__lt=settings.OUTBOX_MAX_ATTEMPTS,
+            )
+            .order_by('available_at')[:batch_size]
+        )
+        OutboxMessage.objects.filter(
+            pk__in=[message.pk for message in batch]
+        ).update(
+            available_at=now + timedelta(seconds=settings.OUTBOX_LEASE)
+        )
+    return batch
+
+
+# Функция для отправки порции писем через одно соединение;
+# возвращает число отправленных и неудачных
+def deliver_batch(batch_size):
+    batch = claim_batch(batch_size)
+    if not batch:
+        return 0, 0
+    sent, failed = [], []
+    connection = get_connection(settings.OUTBOX_DELIVERY_BACKEND)
+    try:
+        connection.open()
+        for outbox_message in batch:
+            try:
+                connection.send_messages([
+                    deserialize(outbox_message.payload)
+                ])
+            except Exception as error:
+                logger.warning(
+                    'Письмо %s не отправлено: %s', outbox_message.pk, error
+                )
+                outbox_message.last_error = repr(error)
+                failed.append(outbox_message)
+            else:
+                sent.append(outbox_message.pk)
+    finally:
+        connection.close()
+    now = timezone.now()
+    OutboxMessage.objects.filter(pk__in=sent).update(sent_at=now)
+    for outbox_message in failed:
+        outbox_message.attempts += 1
+        outbox_message.available_at = now + timedelta(
+            seconds=retry_delay(outbox_message.attempts)
+        )
+    OutboxMessage.objects.bulk_update(
+        failed, ('attempts', 'available_at', 'last_error')
+    )
+    return len(sent), len(failed)
@@ -0,0 +1,120 @@
+import json
+import platform
+from pathlib import Path
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    setup_test_environment, teardown_test_environment
+)
+
+from blog import benchmarks, datagen
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку, число SQL-запросов и объём ответа основных '
+        'страниц на сгенерированных наборах данных разного размера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profiles', default='tiny,small',
+            help='Профили набора данных через запятую.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--scenarios', default=','.join(benchmarks.SCENARIOS),
+            help='Сценарии через запятую.'
+        )
+        parser.add_argument(
+            '--output', default='benchmark_report.json',
+            help='Файл для отчёта в формате JSON.'
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Эталонный отчёт, с которым сравниваются результаты.'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=benchmarks.LATENCY_TOLERANCE,
+            help='Допустимое относительное ухудшение p95.'
+        )
+        parser.add_argument(
+            '--snapshot-dir',
+            help='Каталог со снимками наборов данных для повторных запусков.'
+        )
+
+    def prepare_dataset(self, profile, seed, snapshot_dir):
+        snapshot = None
+        if snapshot_dir:
+            snapshot = Path(snapshot_dir) / f'{profile}-{seed}.sqlite3'
+            if snapshot.exists():
+                datagen.restore(snapshot)
+                return
+        call_command('flush', interactive=False, verbosity=0)
+        datagen.generate(profile=profile, seed=seed)
+        if snapshot:
+            snapshot.parent.mkdir(parents=True, exist_ok=True)
+            datagen.snapshot(snapshot)
+
+    def handle(self, *args, **options):
+        if options['snapshot_dir'] and connection.vendor != 'sqlite':
+            raise CommandError('Снимки поддерживаются только для SQLite.')
+        profiles = options['profiles'].split(',')
+        unknown = set(profiles) - set(datagen.PROFILES)
+        if unknown:
+            raise CommandError(f'Неизвестные профили: {", ".join(unknown)}')
+        scenarios = options['scenarios'].split(',')
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        results = {}
+        try:
+            for profile in profiles:
+                self.prepare_dataset(
+                    profile, options['seed'], options['snapshot_dir']
+                )
+                results[profile] = benchmarks.run_scenarios(
+                    scenarios, options['iterations'], options['warmup']
+                )
+                for name, result in results[profile].items():
+                    self.stdout.write(
+                        f'{profile:>8} {name:<18} '
+                        f'p50={result["p50_ms"]:>9.2f}ms '
+                        f'p95={result["p95_ms"]:>9.2f}ms '
+                        f'queries={result["queries"]:<4} '
+                        f'bytes={result["bytes"]}'
+                    )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        report = {
+            'meta': {
+                'seed': options['seed'],
+                'iterations': options['iterations'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'profiles': results,
+        }
+        Path(options['output']).write_text(
+            json.dumps(report, ensure_ascii=False, indent=2),
+            encoding='utf-8'
+        )
+        if options['baseline']:
+            baseline = json.loads(
+                Path(options['baseline']).read_text(encoding='utf-8')
+            )
+            regressions = benchmarks.compare(
+                results, baseline['profiles'], options['tolerance']
+            )
+            if regressions:
+                raise CommandError(
+                    'Регрессии производительности:\n' + '\n'.join(regressions)
+                )
+            self.stdout.write('Регрессий относительно эталона нет.')
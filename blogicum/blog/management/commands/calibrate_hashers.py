@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from blog.hashers import calibrate
+
+SETTINGS = {
+    'pbkdf2_sha256': 'PASSWORD_PBKDF2_ITERATIONS',
+    'argon2': 'PASSWORD_ARGON2_TIME_COST',
+    'scrypt': 'PASSWORD_SCRYPT_WORK_FACTOR',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет хеширование паролей на этом хосте и подбирает стоимость '
+        'под бюджет времени одного входа.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target-ms', type=float, default=100,
+            help='Допустимое время хеширования одного пароля.'
+        )
+        parser.add_argument(
+            '--algorithm', choices=SETTINGS, action='append',
+            help='По умолчанию — все доступные алгоритмы.'
+        )
+        parser.add_argument('--rounds', type=int, default=3)
+
+    def handle(self, *args, **options):
+        for algorithm in options['algorithm'] or SETTINGS:
+            try:
+                cost, measurements = calibrate(
+                    algorithm, options['target_ms'], options['rounds']
+                )
+            except ValueError as error:
+                # Argon2 требует необязательный пакет argon2-cffi
+                self.stderr.write(f'{algorithm}: пропущен ({error}).')
+                continue
+            self.stdout.write(algorithm)
+            for measured_cost, elapsed in measurements:
+                self.stdout.write(
+                    f'  стоимость {measured_cost}: {elapsed:.1f} мс'
+                )
+            self.stdout.write(f'  {SETTINGS[algorithm]} = {cost}')
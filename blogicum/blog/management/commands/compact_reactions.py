@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from blog.reactions import compact_counters, rebuild_counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводит шарды счётчиков реакций в одну строку на объект; '
+        'запускается периодически.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Пересчитать счётчики заново по таблице реакций.'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            rebuild_counters()
+            self.stdout.write('Счётчики пересчитаны.')
+            return
+        self.stdout.write(f'Сжато счётчиков: {compact_counters()}.')
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from blog.constants import EXPORT_CHUNK_SIZE
+from blog.exports import FORMATS, export_lines
+from blog.models import Comment, Post
+
+MODELS = {'posts': Post, 'comments': Comment}
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковая выгрузка постов или комментариев в CSV или JSON Lines; '
+        'строки читаются из базы порциями, память не растёт с объёмом.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=MODELS)
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument(
+            '--output', help='Файл выгрузки; по умолчанию stdout.'
+        )
+        parser.add_argument(
+            '--published', action='store_true',
+            help='Только опубликованные записи.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPORT_CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        queryset = MODELS[options['model']].objects.all()
+        if options['published']:
+            if queryset.model is Post:
+                queryset = queryset.filter(is_published=True)
+            else:
+                queryset = queryset.filter(post__is_published=True)
+        lines = export_lines(
+            queryset, options['format'], options['chunk_size']
+        )
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8',
+                  newline='') as file:
+            count = -1 if options['format'] == 'csv' else 0
+            for line in lines:
+                file.write(line)
+                count += 1
+        self.stderr.write(f'Выгружено строк: {count}.')
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from blog import datagen
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует синтетический набор пользователей, категорий, мест, '
+        'постов и комментариев для нагрузочного тестирования.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profile', choices=sorted(datagen.PROFILES), default='small',
+            help='Размер набора данных.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора случайных чисел.'
+        )
+        parser.add_argument(
+            '--scale', type=float, default=1.0,
+            help='Множитель размеров выбранного профиля.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=datagen.BATCH_SIZE,
+            help='Размер пакета для bulk_create.'
+        )
+        parser.add_argument(
+            '--snapshot',
+            help='Сохранить снимок базы SQLite в указанный файл.'
+        )
+
+    def handle(self, *args, **options):
+        if options['snapshot'] and connection.vendor != 'sqlite':
+            raise CommandError('Снимки поддерживаются только для SQLite.')
+        sizes = datagen.generate(
+            profile=options['profile'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            scale=options['scale'],
+        )
+        for name, size in sizes.items():
+            self.stdout.write(f'{name}: {size}')
+        if options['snapshot']:
+            datagen.snapshot(options['snapshot'])
+            self.stdout.write(f'Снимок сохранён в {options["snapshot"]}')
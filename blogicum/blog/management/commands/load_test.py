@@ -0,0 +1,108 @@
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from blog import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает WSGI-приложение из пула потоков или процессов и '
+        'сообщает пропускную способность, задержки, долю ошибок, '
+        'медленные записи и ошибки блокировки SQLite. Запросы идут '
+        'в настроенную базу, комментарии записываются в неё; заполните '
+        'её через generate_data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Число запросов на одного виртуального пользователя.'
+        )
+        parser.add_argument(
+            '--pool', choices=('thread', 'process'), default='thread'
+        )
+        parser.add_argument(
+            '--mix',
+            default=','.join(
+                f'{action}={weight}'
+                for action, weight in loadtest.DEFAULT_MIX.items()
+            ),
+            help='Доли действий, например feed=60,detail=30,comment=5,login=5.'
+        )
+        parser.add_argument(
+            '--host', default=(settings.ALLOWED_HOSTS or ['localhost'])[0]
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Файл для отчёта в JSON.')
+
+    def handle(self, *args, **options):
+        try:
+            mix = loadtest.parse_mix(options['mix'])
+        except ValueError as error:
+            raise CommandError(error)
+        targets = loadtest.load_targets()
+        if not targets['post_ids'] or not targets['usernames']:
+            raise CommandError(
+                'Нет данных для нагрузки: запустите generate_data.'
+            )
+        worker = partial(
+            loadtest.run_worker,
+            requests=options['requests'],
+            mix=mix,
+            host=options['host'],
+            targets=targets,
+            seed=options['seed'],
+        )
+        if options['pool'] == 'process':
+            executor = ProcessPoolExecutor(
+                options['concurrency'], initializer=loadtest.init_process
+            )
+        else:
+            executor = ThreadPoolExecutor(options['concurrency'])
+        start = time.perf_counter()
+        with executor:
+            results = executor.map(worker, range(options['concurrency']))
+            samples = [sample for result in results for sample in result]
+        report = loadtest.summarize(samples, time.perf_counter() - start)
+
+        self.stdout.write(
+            f'Запросов: {report["requests"]} за {report["elapsed_s"]} с, '
+            f'{report["throughput_rps"]} запросов/с, '
+            f'ошибок {report["error_rate"]:.2%}'
+        )
+        writes = report['writes']
+        self.stdout.write(
+            f'Пишущих запросов: {writes["count"]}, '
+            f'всего {writes["total_ms"]:.2f} мс с ожиданием блокировки, '
+            f'p50={writes["p50_ms"]:.2f}ms p95={writes["p95_ms"]:.2f}ms '
+            f'p99={writes["p99_ms"]:.2f}ms, '
+            f'дольше {loadtest.SLOW_WRITE_MS} мс: {report["slow_writes"]}'
+        )
+        self.stdout.write(
+            f'Ошибок блокировки SQLite: {report["locked_errors"]}, '
+            f'ожидание в них {report["locked_wait_ms"]:.2f} мс'
+        )
+        for error, count in report['exceptions'].items():
+            self.stdout.write(f'Исключений {error}: {count}')
+        for action, stats in report['actions'].items():
+            self.stdout.write(
+                f'{action:<8} n={stats["requests"]:<6} '
+                f'p50={stats["p50_ms"]:>9.2f}ms '
+                f'p95={stats["p95_ms"]:>9.2f}ms '
+                f'p99={stats["p99_ms"]:>9.2f}ms '
+                f'ошибок={stats["error_rate"]:.2%}'
+            )
+        for label, count in report['histogram'].items():
+            self.stdout.write(f'{label:>9} {count}')
+        if options['output']:
+            Path(options['output']).write_text(
+                json.dumps(report, ensure_ascii=False, indent=2),
+                encoding='utf-8'
+            )
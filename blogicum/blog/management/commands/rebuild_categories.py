@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from blog.categories import rebuild
+from blog.models import Category
+from blog.signals import notify
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает границы дерева категорий и их видимость по ссылкам '
+        'на родителей; нужна после loaddata и массовой загрузки.'
+    )
+
+    def handle(self, *args, **options):
+        rebuild()
+        notify(Category)
+        self.stdout.write('Дерево категорий пересобрано.')
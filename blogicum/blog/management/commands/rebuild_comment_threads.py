@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blog.threads import rebuild_paths
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет заново пути, позиции и счётчики ответов комментариев; '
+        'нужна после loaddata и массовой загрузки комментариев.'
+    )
+
+    def handle(self, *args, **options):
+        updated = rebuild_paths()
+        self.stdout.write(f'Комментариев перестроено: {updated}.')
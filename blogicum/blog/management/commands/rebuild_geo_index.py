@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blog.geo import rebuild_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет заново индекс R*Tree координат мест; нужна после '
+        'loaddata и массовой загрузки мест.'
+    )
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index()
+        self.stdout.write(f'Мест в индексе: {indexed}.')
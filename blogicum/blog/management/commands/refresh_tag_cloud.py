@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blog.tags import refresh_tag_cloud
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает число опубликованных постов по тегам для облака '
+        'тегов; запускается периодически.'
+    )
+
+    def handle(self, *args, **options):
+        refresh_tag_cloud()
+        self.stdout.write('Облако тегов обновлено.')
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from blog.constants import DIGEST_BATCH_SIZE, DIGEST_FREQUENCIES
+from blog.notifications import send_digests
+
+
+class Command(BaseCommand):
+    help = (
+        'Собирает накопившиеся уведомления в дайджесты по получателям '
+        'и ставит письма в очередь; запускается раз в день и раз '
+        'в неделю с соответствующей частотой.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--frequency',
+            choices=[
+                value for value, label in DIGEST_FREQUENCIES
+                if value != 'never'
+            ],
+            default='daily'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=settings.DIGEST_WORKERS,
+            help='Потоки для сборки писем; 0 — в основном потоке.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DIGEST_BATCH_SIZE,
+            help='Получателей в одной порции писем.'
+        )
+
+    def handle(self, *args, **options):
+        recipients, sent = send_digests(
+            options['frequency'], options['workers'], options['batch_size']
+        )
+        self.stdout.write(
+            f'Получателей: {recipients}, писем в очереди: {sent}.'
+        )
@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from blog.mail import deliver_batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Отправляет письма из очереди порциями через одно соединение; '
+        'неудачные попытки повторяются с растущей задержкой.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.OUTBOX_BATCH_SIZE
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Работать постоянно, опрашивая очередь.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Пауза между опросами пустой очереди, секунды.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = deliver_batch(options['batch_size'])
+            if sent or failed:
+                self.stdout.write(
+                    f'Отправлено: {sent}, с ошибкой: {failed}.'
+                )
+                continue
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
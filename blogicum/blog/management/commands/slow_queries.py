@@ -0,0 +1,66 @@
+import json
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводка журнала медленных запросов: худшие запросы по суммарному '
+        'времени с маршрутами, из которых они вызваны, и планом выполнения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument(
+            '--log', default=str(settings.SLOW_QUERY_LOG_FILE),
+            help='Файл журнала; ротированные копии читаются тоже.'
+        )
+
+    def read_records(self, log):
+        log = Path(log)
+        paths = sorted(log.parent.glob(f'{log.name}.*'), reverse=True)
+        for path in paths + [log]:
+            if not path.exists():
+                continue
+            with open(path, encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+
+    def handle(self, *args, **options):
+        groups = defaultdict(lambda: {
+            'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+            'url_names': set(), 'plan': None, 'sql': None,
+        })
+        for record in self.read_records(options['log']):
+            group = groups[record['fingerprint']]
+            group['count'] += 1
+            group['total_ms'] += record['duration_ms']
+            if record['duration_ms'] >= group['max_ms']:
+                group['max_ms'] = record['duration_ms']
+                group['plan'] = record['plan']
+                group['sql'] = record['sql']
+            group['url_names'].add(record['url_name'] or '-')
+        worst = sorted(
+            groups.values(), key=lambda group: group['total_ms'], reverse=True
+        )[:options['top']]
+        if not worst:
+            self.stdout.write('Медленных запросов не найдено.')
+        for number, group in enumerate(worst, 1):
+            self.stdout.write(
+                f'#{number} всего {group["total_ms"]:.1f} мс, '
+                f'вызовов {group["count"]}, '
+                f'среднее {group["total_ms"] / group["count"]:.1f} мс, '
+                f'максимум {group["max_ms"]:.1f} мс'
+            )
+            self.stdout.write(
+                f'  маршруты: {", ".join(sorted(group["url_names"]))}'
+            )
+            self.stdout.write(f'  {group["sql"]}')
+            for step in group['plan'] or ():
+                self.stdout.write(f'    {step}')
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from blog.ranking import update_scores
+
+
+class Command(BaseCommand):
+    help = (
+        'Добавляет к рейтингам популярности накопившиеся просмотры, '
+        'комментарии и реакции; запускается периодически.'
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Обновлено рейтингов: {update_scores()}.')
@@ -0,0 +1,265 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import weakref
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROWS_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 1000)
+SIZE_BUCKETS = (
+    1024, 10 * 1024, 100 * 1024, 1024 ** 2, 5 * 1024 ** 2, 20 * 1024 ** 2
+)
+
+# Имя метрики: (тип, описание, границы корзин гистограммы)
+METRICS = {
+    'blog_requests_total': (
+        'counter', 'Обработанные запросы.', None
+    ),
+    'blog_request_duration_seconds': (
+        'histogram', 'Время обработки запроса.', DURATION_BUCKETS
+    ),
+    'blog_db_queries_total': (
+        'counter', 'Выполненные SQL-запросы.', None
+    ),
+    'blog_db_query_seconds_total': (
+        'counter', 'Суммарное время SQL-запросов.', None
+    ),
+    'blog_cache_requests_total': (
+        'counter', 'Обращения к кэшу по пространствам имён.', None
+    ),
+    'blog_published_posts_rows': (
+        'histogram', 'Строки, полученные из get_published_posts().',
+        ROWS_BUCKETS
+    ),
+    'blog_upload_size_bytes': (
+        'histogram', 'Размер загруженных файлов.', SIZE_BUCKETS
+    ),
+}
+
+
+class MmapValues:
+    """Файл значений одного потока, отображённый в память.
+
+    Запись: длина ключа (4 байта), ключ с выравниванием до 8 байт,
+    значение double. Первые 8 байт файла хранят занятый объём.
+    """
+
+    INITIAL_SIZE = 64 * 1024
+    HEADER = struct.Struct('q')
+    KEY_LENGTH = struct.Struct('i')
+    VALUE = struct.Struct('d')
+
+    def __init__(self, path):
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT)
+        self.size = os.fstat(self.fd).st_size
+        if self.size < self.INITIAL_SIZE:
+            os.ftruncate(self.fd, self.INITIAL_SIZE)
+            self.size = self.INITIAL_SIZE
+        self.map = mmap.mmap(self.fd, self.size)
+        self.offsets = {}
+        used = self.HEADER.unpack_from(self.map, 0)[0]
+        self.used = used or self.HEADER.size
+        for key, offset in _entries(self.map, self.used):
+            self.offsets[key] = offset
+
+    def close(self):
+        self.map.close()
+        os.close(self.fd)
+
+    def items(self):
+        for key, offset in self.offsets.items():
+            yield key, self.VALUE.unpack_from(self.map, offset)[0]
+
+    def write(self, key, value):
+        offset = self.offsets.get(key)
+        if offset is None:
+            offset = self._append(key)
+        self.VALUE.pack_into(self.map, offset, value)
+
+    def _append(self, key):
+        encoded = key.encode()
+        padded = _padded_length(len(encoded))
+        needed = self.used + self.KEY_LENGTH.size + padded + self.VALUE.size
+        if needed > self.size:
+            self._grow(needed)
+        self.KEY_LENGTH.pack_into(self.map, self.used, len(encoded))
+        start = self.used + self.KEY_LENGTH.size
+        self.map[start:start + len(encoded)] = encoded
+        offset = start + padded
+        self.used = offset + self.VALUE.size
+        self.HEADER.pack_into(self.map, 0, self.used)
+        self.offsets[key] = offset
+        return offset
+
+    def _grow(self, needed):
+        while self.size < needed:
+            self.size *= 2
+        os.ftruncate(self.fd, self.size)
+        self.map.close()
+        self.map = mmap.mmap(self.fd, self.size)
+
+
+def _padded_length(length):
+    # Значение должно начинаться с границы 8 байт
+    return length + (-(MmapValues.KEY_LENGTH.size + length) % 8)
+
+
+def _entries(buffer, used):
+    position = MmapValues.HEADER.size
+    while position < used:
+        length = MmapValues.KEY_LENGTH.unpack_from(buffer, position)[0]
+        start = position + MmapValues.KEY_LENGTH.size
+        key = bytes(buffer[start:start + length]).decode()
+        offset = start + _padded_length(length)
+        yield key, offset
+        position = offset + MmapValues.VALUE.size
+
+
+# Функция для чтения значений из файла другого процесса или потока
+def read_file(path):
+    with open(path, 'rb') as file:
+        buffer = file.read()
+    used = MmapValues.HEADER.unpack_from(buffer, 0)[0]
+    for key, offset in _entries(buffer, used):
+        yield key, MmapValues.VALUE.unpack_from(buffer, offset)[0]
+
+
+class Registry:
+    """Реестр метрик процесса без блокировок при записи.
+
+    Каждый поток пишет только в свой словарь (и свой файл в METRICS_DIR),
+    поэтому приращения не требуют блокировок; значения потоков
+    складываются при выгрузке. Словари завершившихся потоков
+    переносятся в общую сумму, а их файлы закрываются.
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        # Поток (слабая ссылка), его словарь значений и файл
+        self.threads = []
+        self.retired = defaultdict(float)
+
+    def _values(self):
+        values = getattr(self.local, 'values', None)
+        if values is None:
+            values = defaultdict(float)
+            store = None
+            directory = settings.METRICS_DIR
+            if directory:
+                Path(directory).mkdir(parents=True, exist_ok=True)
+                store = MmapValues(Path(directory) / (
+                    f'{os.getpid()}-{threading.get_ident()}.db'
+                ))
+                # Файл мог остаться от завершившегося потока
+                # с тем же идентификатором, его значения продолжаются
+                values.update(store.items())
+            self.local.values = values
+            self.local.store = store
+            with self.lock:
+                self._prune()
+                self.threads.append(
+                    (weakref.ref(threading.current_thread()), values, store)
+                )
+        return values
+
+    # Метод для переноса значений завершившихся потоков в общую сумму;
+    # вызывается под блокировкой при появлении нового потока
+    def _prune(self):
+        alive = []
+        for entry in self.threads:
+            thread, values, store = entry
+            thread = thread()
+            if thread is not None and thread.is_alive():
+                alive.append(entry)
+                continue
+            for key, value in values.items():
+                self.retired[key] += value
+            if store is not None:
+                store.close()
+        self.threads = alive
+
+    def inc(self, name, amount=1, **labels):
+        key = json.dumps([name, sorted(labels.items())], ensure_ascii=False)
+        values = self._values()
+        values[key] += amount
+        if self.local.store is not None:
+            self.local.store.write(key, values[key])
+
+    def observe(self, name, value, **labels):
+        for bound in METRICS[name][2]:
+            self.inc(
+                f'{name}_bucket', int(value <= bound), le=str(bound), **labels
+            )
+        self.inc(f'{name}_bucket', le='+Inf', **labels)
+        self.inc(f'{name}_sum', value, **labels)
+        self.inc(f'{name}_count', **labels)
+
+    def collect(self):
+        totals = defaultdict(float)
+        directory = settings.METRICS_DIR
+        if directory and Path(directory).is_dir():
+            for path in Path(directory).glob('*.db'):
+                for key, value in read_file(path):
+                    totals[key] += value
+        else:
+            with self.lock:
+                totals.update(self.retired)
+                thread_values = [values for _, values, _ in self.threads]
+            for values in thread_values:
+                for key, value in list(values.items()):
+                    totals[key] += value
+        return totals
+
+    def render(self):
+        samples = defaultdict(list)
+        for key, value in self.collect().items():
+            name, labels = json.loads(key)
+            family = name
+            for suffix in ('_bucket', '_sum', '_count'):
+                if name.endswith(suffix) and name[:-len(suffix)] in METRICS:
+                    family = name[:-len(suffix)]
+            samples[family].append((name, labels, value))
+        lines = []
+        for family in sorted(samples):
+            kind, description, _ = METRICS[family]
+            lines.append(f'# HELP {family} {description}')
+            lines.append(f'# TYPE {family} {kind}')
+            for name, labels, value in sorted(samples[family], key=_order):
+                label_text = ','.join(
+                    f'{label}="{_escape(label_value)}"'
+                    for label, label_value in labels
+                )
+                if label_text:
+                    name = f'{name}{{{label_text}}}'
+                lines.append(f'{name} {_format(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _order(sample):
+    name, labels, _ = sample
+    bound = dict(labels).get('le')
+    return (
+        name,
+        str([label for label in labels if label[0] != 'le']),
+        float(bound) if bound else 0,
+    )
+
+
+def _format(value):
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _escape(value):
+    return (
+        str(value).replace('\\', '\\\\').replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+registry = Registry()
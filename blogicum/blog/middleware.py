@@ -0,0 +1,167 @@
+import json
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from . import backends, instrumentation, profiling
+from .metrics import registry
+
+timing_logger = logging.getLogger('blog.timing')
+
+
+class RequestContextMiddleware:
+    """Делает текущий запрос доступным обёрткам выполнения SQL."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = instrumentation.bind_request(request)
+        try:
+            return self.get_response(request)
+        finally:
+            instrumentation.unbind_request(token)
+
+
+class PasswordRehashMiddleware:
+    """Переносит в сессию хеш пароля, обновлённый в фоне после входа.
+
+    Стоит до AuthenticationMiddleware, чтобы сессия получила новый хеш
+    раньше, чем request.user сверит его с паролем.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        backends.accept_rehash(request.session)
+        return self.get_response(request)
+
+
+# Функция для проверки, можно ли показать замеры в ответе: они
+# раскрывают устройство сайта, поэтому видны только сотрудникам
+def _shows_timing(request):
+    if settings.DEBUG:
+        return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_staff
+
+
+class RequestTimingMiddleware:
+    """Замеряет время SQL, шаблонов и всего запроса.
+
+    Результат пишется в лог `blog.timing` одной JSON-строкой, а
+    сотрудникам и при DEBUG отдаётся ещё в заголовке Server-Timing.
+    Замеряется только доля запросов, заданная REQUEST_TIMING_SAMPLE_RATE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrumentation.install_template_timer()
+
+    def __call__(self, request):
+        if random.random() >= settings.REQUEST_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+        stats = instrumentation.RequestStats()
+        token = instrumentation.activate(stats)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(stats):
+                response = self.get_response(request)
+        finally:
+            instrumentation.deactivate(token)
+        total_ms = (time.perf_counter() - start) * 1000
+        db_ms = stats.sql_time * 1000
+        template_ms = stats.template_time * 1000
+        app_ms = max(total_ms - db_ms - template_ms, 0)
+        if settings.REQUEST_TIMING_HEADER and _shows_timing(request):
+            response['Server-Timing'] = ', '.join((
+                f'db;dur={db_ms:.2f};desc="{stats.sql_count} queries"',
+                f'tpl;dur={template_ms:.2f}',
+                f'app;dur={app_ms:.2f}',
+                f'total;dur={total_ms:.2f}',
+            ))
+        timing_logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'url_name': instrumentation.get_url_name(request),
+            'status': response.status_code,
+            'total_ms': round(total_ms, 2),
+            'db_ms': round(db_ms, 2),
+            'db_queries': stats.sql_count,
+            'template_ms': round(template_ms, 2),
+        }))
+        return response
+
+
+class ProfilingMiddleware:
+    """Запускает представление под cProfile и/или tracemalloc.
+
+    Профилируются запросы с подписанным параметром PROFILING_QUERY_PARAM
+    и случайная доля запросов, которую сотрудники меняют на странице
+    admin/profiling/ без перезапуска процессов.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        modes, owner = profiling.requested_modes(request)
+        if not modes:
+            return self.get_response(request)
+        return profiling.profile_request(
+            self.get_response, request, modes, owner
+        )
+
+
+class MetricsMiddleware:
+    """Считает запросы, их длительность, SQL и размеры загрузок."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = instrumentation.RequestStats()
+        start = time.perf_counter()
+        with connection.execute_wrapper(stats):
+            response = self.get_response(request)
+        url_name = instrumentation.get_url_name(request) or 'unresolved'
+        registry.inc(
+            'blog_requests_total',
+            url_name=url_name,
+            method=request.method,
+            status=str(response.status_code),
+        )
+        registry.observe(
+            'blog_request_duration_seconds',
+            time.perf_counter() - start,
+            url_name=url_name,
+        )
+        registry.inc('blog_db_queries_total', stats.sql_count,
+                     url_name=url_name)
+        registry.inc('blog_db_query_seconds_total', stats.sql_time,
+                     url_name=url_name)
+        # Файлы учитываются, только если представление уже разобрало тело
+        for upload in getattr(request, '_files', {}).values():
+            registry.observe(
+                'blog_upload_size_bytes', upload.size, url_name=url_name
+            )
+        return response
+
+
+class NPlusOneMiddleware:
+    """Сообщает об N+1 запросах из шаблонов при NPLUSONE_ENABLED."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.NPLUSONE_ENABLED:
+            return self.get_response(request)
+        with instrumentation.NPlusOneDetector() as detector:
+            response = self.get_response(request)
+        detector.report(instrumentation.get_url_name(request))
+        return response
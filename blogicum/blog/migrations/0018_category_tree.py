@@ -0,0 +1,59 @@
+# Generated by Django 3.2.16 on 2026-10-19 10:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def number_categories(apps, schema_editor):
+    # До миграции все категории — корни дерева
+    Category = apps.get_model('blog', 'Category')
+    categories = list(Category.objects.order_by('pk'))
+    for position, category in enumerate(categories):
+        category.lft = 2 * position + 1
+        category.rgt = 2 * position + 2
+        category.is_visible = category.is_published
+    Category.objects.bulk_update(categories, ('lft', 'rgt', 'is_visible'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0017_tags'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='category',
+            options={'ordering': ('lft',), 'verbose_name': 'категория', 'verbose_name_plural': 'Категории'},
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='is_visible',
+            field=models.BooleanField(default=True, editable=False, help_text='Категория и все её предки опубликованы.', verbose_name='Видна'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='lft',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='children', to='blog.category', verbose_name='Родительская категория'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='rgt',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['lft', 'rgt'], name='category_tree_idx'),
+        ),
+        migrations.RunPython(number_categories, migrations.RunPython.noop),
+    ]
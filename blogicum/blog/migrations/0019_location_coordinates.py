@@ -0,0 +1,45 @@
+# Generated by Django 3.2.16 on 2026-10-19 10:56
+
+import django.core.validators
+from django.db import migrations, models
+
+
+def create_rtree(apps, schema_editor):
+    # Индекс R*Tree есть только в SQLite; в других базах поиск
+    # идёт по диапазонам координат
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS blog_location_rtree '
+        'USING rtree(id, min_lat, max_lat, min_lon, max_lon)'
+    )
+
+
+def drop_rtree(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS blog_location_rtree')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0018_category_tree'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(90)], verbose_name='Широта'),
+        ),
+        migrations.AddField(
+            model_name='location',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-180), django.core.validators.MaxValueValidator(180)], verbose_name='Долгота'),
+        ),
+        migrations.AddConstraint(
+            model_name='location',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('latitude__isnull', True), ('longitude__isnull', True)), models.Q(('latitude__isnull', False), ('longitude__isnull', False)), _connector='OR'), name='location_both_coordinates'),
+        ),
+        migrations.RunPython(create_rtree, drop_rtree),
+    ]
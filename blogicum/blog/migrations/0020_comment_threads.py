@@ -0,0 +1,60 @@
+# Generated by Django 3.2.16 on 2026-10-19 10:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def encode(pk, width=7):
+    segment = ''
+    while pk:
+        pk, digit = divmod(pk, 36)
+        segment = DIGITS[digit] + segment
+    return segment.rjust(width, '0')
+
+
+def fill_paths(apps, schema_editor):
+    # До миграции все комментарии — корни веток
+    Comment = apps.get_model('blog', 'Comment')
+    comments = []
+    for comment in Comment.objects.only('pk').iterator():
+        comment.path = encode(comment.pk)
+        comments.append(comment)
+    Comment.objects.bulk_update(comments, ('path',), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0019_location_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='blog.comment', verbose_name='Ответ на'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=210),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='position',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text='Порядковый номер ответа в ветке; у корня 0.'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Ответов в ветке'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path', 'position'], name='comment_thread_idx'),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 3.2.16 on 2026-10-19 11:08
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('blog', '0021_author_activity_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationSettings',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_settings', serialize=False, to='auth.user')),
+                ('digest', models.CharField(choices=[('daily', 'Раз в день'), ('weekly', 'Раз в неделю'), ('never', 'Не присылать')], default='daily', max_length=16, verbose_name='Дайджест на почту')),
+            ],
+            options={
+                'verbose_name': 'настройки уведомлений',
+                'verbose_name_plural': 'Настройки уведомлений',
+            },
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(choices=[('comment', 'прокомментировал вашу публикацию'), ('reply', 'ответил на ваш комментарий')], max_length=16, verbose_name='Причина')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('is_read', models.BooleanField(default=False, verbose_name='Прочитано')),
+                ('digested_at', models.DateTimeField(blank=True, null=True, verbose_name='Попало в дайджест')),
+                ('actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор комментария')),
+                ('comment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='blog.comment')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='blog.post')),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL, verbose_name='Получатель')),
+            ],
+            options={
+                'verbose_name': 'уведомление',
+                'verbose_name_plural': 'Уведомления',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', '-created_at', '-id'], name='notification_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('digested_at__isnull', True)), fields=['recipient', 'id'], name='notification_digest_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.16 on 2026-10-19 12:01
+
+from django.db import migrations, models
+
+# Ширина сегмента пути на момент миграции
+PATH_STEP = 7
+
+
+def number_replies(apps, schema_editor):
+    # Позиции, повторённые после удалений, нумеруются заново по порядку
+    # создания ответов в ветке; счётчик корня — последняя выданная
+    Comment = apps.get_model('blog', 'Comment')
+    roots, replies = {}, []
+    for comment in (
+        Comment.objects.only('pk', 'path', 'parent_id', 'reply_sequence')
+        .order_by('pk').iterator()
+    ):
+        if comment.parent_id is None:
+            roots[comment.pk] = comment
+            continue
+        root = roots.get(int(comment.path[:PATH_STEP] or '0', 36))
+        if root is None:
+            continue
+        root.reply_sequence += 1
+        comment.position = root.reply_sequence
+        replies.append(comment)
+    Comment.objects.bulk_update(replies, ('position',), batch_size=1000)
+    Comment.objects.bulk_update(
+        roots.values(), ('reply_sequence',), batch_size=1000
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0023_post_scores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='reply_sequence',
+            field=models.BigIntegerField(default=0, editable=False, help_text='Последняя выданная позиция ответа в ветке корня.'),
+        ),
+        migrations.RunPython(number_replies, migrations.RunPython.noop),
+    ]
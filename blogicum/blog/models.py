@@ -1,8 +1,17 @@
+from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.utils import timezone
 
-from .constants import MAX_NAME_LENGTH
+from .constants import (
+    COMMENT_MAX_DEPTH, COMMENT_PATH_STEP, DEFAULT_DIGEST_FREQUENCY,
+    DIGEST_FREQUENCIES, MAX_NAME_LENGTH, MAX_TAG_LENGTH, NOTIFICATION_REASONS,
+    REACTION_KINDS
+)
+from . import cache
+from .metrics import registry
 
 User = get_user_model()
 
@@ -27,14 +36,39 @@ class Location(CommonFields):
         max_length=MAX_NAME_LENGTH,
         verbose_name='Название места'
     )
+    latitude = models.FloatField(
+        null=True,
+        blank=True,
+        validators=(MinValueValidator(-90), MaxValueValidator(90)),
+        verbose_name='Широта'
+    )
+    longitude = models.FloatField(
+        null=True,
+        blank=True,
+        validators=(MinValueValidator(-180), MaxValueValidator(180)),
+        verbose_name='Долгота'
+    )
 
     class Meta:
         verbose_name = 'местоположение'
         verbose_name_plural = 'Местоположения'
+        constraints = (
+            models.CheckConstraint(
+                check=(
+                    models.Q(latitude__isnull=True, longitude__isnull=True)
+                    | models.Q(latitude__isnull=False, longitude__isnull=False)
+                ),
+                name='location_both_coordinates',
+            ),
+        )
 
     def __str__(self):
         return self.name
 
+    @property
+    def has_coordinates(self):
+        return self.latitude is not None and self.longitude is not None
+
 
 class Category(CommonFields):
     title = models.CharField(
@@ -50,14 +84,77 @@ class Category(CommonFields):
             'разрешены символы латиницы, цифры, дефис и подчёркивание.'
         )
     )
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='children',
+        verbose_name='Родительская категория'
+    )
+    # Границы вложенного множества: потомки категории — это категории
+    # с lft и rgt внутри её границ
+    lft = models.PositiveIntegerField(default=0, editable=False)
+    rgt = models.PositiveIntegerField(default=0, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    is_visible = models.BooleanField(
+        default=True,
+        editable=False,
+        verbose_name='Видна',
+        help_text='Категория и все её предки опубликованы.'
+    )
 
     class Meta:
         verbose_name = 'категория'
         verbose_name_plural = 'Категории'
+        ordering = ('lft',)
+        indexes = (
+            models.Index(fields=('lft', 'rgt'), name='category_tree_idx'),
+        )
 
     def __str__(self):
         return self.title
 
+    def clean(self):
+        if self.parent_id is None or self._state.adding:
+            return
+        if self.parent.lft >= self.lft and self.parent.rgt <= self.rgt:
+            raise ValidationError(
+                {'parent': 'Категорию нельзя вложить в саму себя '
+                           'или в её подкатегорию.'}
+            )
+
+    def get_descendants(self, include_self=True):
+        if include_self:
+            return Category.objects.filter(
+                lft__gte=self.lft, rgt__lte=self.rgt
+            )
+        return Category.objects.filter(lft__gt=self.lft, rgt__lt=self.rgt)
+
+
+class PostQuerySet(models.QuerySet):
+    """Набор постов, умеющий сообщать в метрики число полученных строк."""
+
+    track_rows = False
+
+    def with_row_tracking(self):
+        clone = self._chain()
+        clone.track_rows = True
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone.track_rows = self.track_rows
+        return clone
+
+    def _fetch_all(self):
+        fetched = self._result_cache is None
+        super()._fetch_all()
+        if fetched and self.track_rows:
+            registry.observe(
+                'blog_published_posts_rows', len(self._result_cache)
+            )
+
 
 class Post(CommonFields):
     title = models.CharField(
@@ -67,6 +164,7 @@ class Post(CommonFields):
     text = models.TextField(verbose_name='Текст')
     image = models.ImageField(upload_to='post_images/', blank=True)
     pub_date = models.DateTimeField(
+        db_index=True,
         verbose_name='Дата и время публикации',
         help_text=(
             'Если установить дату и время в будущем — '
@@ -93,14 +191,36 @@ class Post(CommonFields):
         related_name='posts',
         verbose_name='Категория',
     )
+    tags = models.ManyToManyField(
+        'Tag',
+        through='PostTag',
+        blank=True,
+        related_name='posts',
+        verbose_name='Теги'
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'публикация'
         verbose_name_plural = 'Публикации'
+        indexes = (
+            models.Index(
+                fields=('author', 'pub_date'), name='post_author_idx'
+            ),
+        )
 
     def get_absolute_url(self):
         return reverse('blog:post_detail', args=[str(self.id)])
 
+    @property
+    def card_version(self):
+        """Версия карточки: общая (категории, места), поста и автора."""
+        return '.'.join(map(str, cache.get_versions(
+            'cards', cache.post_cards(self.pk),
+            cache.author_cards(self.author_id)
+        )))
+
     def __str__(self):
         return self.title
 
@@ -114,8 +234,426 @@ class Comment(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='replies',
+        verbose_name='Ответ на'
+    )
+    # Материализованный путь: id предков и самого комментария;
+    # сортировка по нему раскладывает ветки в порядке обхода
+    path = models.CharField(
+        max_length=COMMENT_PATH_STEP * COMMENT_MAX_DEPTH,
+        blank=True,
+        editable=False
+    )
+    reply_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Ответов в ветке'
+    )
+    position = models.PositiveBigIntegerField(
+        default=0,
+        editable=False,
+        help_text='Порядковый номер ответа в ветке; у корня 0.'
+    )
+    # В отличие от reply_count не уменьшается при удалении ответов, так
+    # что позиции в ветке не повторяются
+    reply_sequence = models.BigIntegerField(
+        default=0,
+        editable=False,
+        help_text='Последняя выданная позиция ответа в ветке корня.'
+    )
 
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ('created_at',)
+        indexes = (
+            models.Index(
+                fields=('post', 'path', 'position'),
+                name='comment_thread_idx'
+            ),
+            models.Index(
+                fields=('author', 'created_at'), name='comment_author_idx'
+            ),
+        )
+
+    @property
+    def depth(self):
+        return max(len(self.path) // COMMENT_PATH_STEP - 1, 0)
+
+
+class OutboxMessage(models.Model):
+    """Письмо в очереди на отправку."""
+
+    payload = models.JSONField(verbose_name='Письмо')
+    created_at = models.DateTimeField(auto_now_add=True)
+    available_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Следующая попытка'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попытки'
+    )
+    sent_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Отправлено'
+    )
+    last_error = models.TextField(blank=True, verbose_name='Ошибка')
+
+    class Meta:
+        verbose_name = 'исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+        indexes = (
+            models.Index(
+                fields=('available_at',),
+                condition=models.Q(sent_at__isnull=True),
+                name='outbox_due_idx',
+            ),
+        )
+
+    def __str__(self):
+        return self.payload.get('subject', '')
+
+
+class Follow(models.Model):
+    follower = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='following',
+        verbose_name='Подписчик'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='followers',
+        verbose_name='Автор'
+    )
+    fan_out = models.BooleanField(
+        default=True,
+        verbose_name='Рассылка в ленты',
+        help_text=(
+            'Снимается у авторов с большим числом подписчиков: их посты '
+            'подмешиваются в ленту при чтении.'
+        )
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'подписка'
+        verbose_name_plural = 'Подписки'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('follower', 'author'), name='unique_follow'
+            ),
+            models.CheckConstraint(
+                check=~models.Q(follower=models.F('author')),
+                name='no_self_follow'
+            ),
+        )
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок читателя, разосланный при публикации."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    # Копия даты поста: лента листается по индексу без соединения
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'), name='unique_timeline_entry'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='timeline_keyset_idx'
+            ),
+        )
+
+
+class Reaction(models.Model):
+    """Реакция пользователя на пост или комментарий."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='reactions'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='reactions'
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='reactions'
+    )
+    kind = models.CharField(
+        max_length=16,
+        choices=REACTION_KINDS,
+        verbose_name='Реакция'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'реакция'
+        verbose_name_plural = 'Реакции'
+        constraints = (
+            models.CheckConstraint(
+                check=(
+                    models.Q(post__isnull=False, comment__isnull=True)
+                    | models.Q(post__isnull=True, comment__isnull=False)
+                ),
+                name='reaction_single_target'
+            ),
+            models.UniqueConstraint(
+                fields=('user', 'post', 'kind'),
+                condition=models.Q(post__isnull=False),
+                name='unique_post_reaction'
+            ),
+            models.UniqueConstraint(
+                fields=('user', 'comment', 'kind'),
+                condition=models.Q(comment__isnull=False),
+                name='unique_comment_reaction'
+            ),
+        )
+
+
+class ReactionCounter(models.Model):
+    """Часть счётчика реакций; сумма по шардам — число реакций.
+
+    Реакции увеличивают случайный шард, поэтому одновременные реакции
+    на популярный пост не ждут блокировки одной строки.
+    """
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='reaction_counters'
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='reaction_counters'
+    )
+    kind = models.CharField(max_length=16, choices=REACTION_KINDS)
+    shard = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('post', 'kind', 'shard'),
+                condition=models.Q(post__isnull=False),
+                name='unique_post_counter_shard'
+            ),
+            models.UniqueConstraint(
+                fields=('comment', 'kind', 'shard'),
+                condition=models.Q(comment__isnull=False),
+                name='unique_comment_counter_shard'
+            ),
+        )
+
+
+class Tag(models.Model):
+    name = models.CharField(
+        max_length=MAX_TAG_LENGTH,
+        unique=True,
+        verbose_name='Тег'
+    )
+    slug = models.SlugField(
+        max_length=MAX_TAG_LENGTH,
+        unique=True,
+        allow_unicode=True,
+        verbose_name='Идентификатор'
+    )
+
+    class Meta:
+        verbose_name = 'тег'
+        verbose_name_plural = 'Теги'
+        ordering = ('name',)
+
+    def __str__(self):
+        return self.name
+
+
+class PostTag(models.Model):
+    """Связь поста с тегом с копией даты поста для страниц тега."""
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('post', 'tag'), name='unique_post_tag'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('tag', '-pub_date', '-post'),
+                name='tag_keyset_idx'
+            ),
+        )
+
+
+class TagStat(models.Model):
+    """Число опубликованных постов тега для облака тегов;
+    пересчитывается командой refresh_tag_cloud.
+    """
+
+    tag = models.OneToOneField(
+        Tag,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stat'
+    )
+    post_count = models.PositiveIntegerField(default=0, db_index=True)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+
+class Notification(models.Model):
+    """Событие о новом комментарии для получателя: показывается
+    в уведомлениях и попадает в дайджест.
+    """
+
+    recipient = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        verbose_name='Получатель'
+    )
+    actor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор комментария'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='notifications'
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        related_name='notifications'
+    )
+    reason = models.CharField(
+        max_length=16,
+        choices=NOTIFICATION_REASONS,
+        verbose_name='Причина'
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+    is_read = models.BooleanField(default=False, verbose_name='Прочитано')
+    digested_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Попало в дайджест'
+    )
+
+    class Meta:
+        verbose_name = 'уведомление'
+        verbose_name_plural = 'Уведомления'
+        indexes = (
+            models.Index(
+                fields=('recipient', '-created_at', '-id'),
+                name='notification_keyset_idx'
+            ),
+            # Дайджест проходит ещё не разосланные события по получателям
+            models.Index(
+                fields=('recipient', 'id'),
+                condition=models.Q(digested_at__isnull=True),
+                name='notification_digest_idx'
+            ),
+        )
+
+
+class NotificationSettings(models.Model):
+    """Настройки уведомлений пользователя."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='notification_settings'
+    )
+    digest = models.CharField(
+        max_length=16,
+        choices=DIGEST_FREQUENCIES,
+        default=DEFAULT_DIGEST_FREQUENCY,
+        verbose_name='Дайджест на почту'
+    )
+
+    class Meta:
+        verbose_name = 'настройки уведомлений'
+        verbose_name_plural = 'Настройки уведомлений'
+
+
+class ScoreEvent(models.Model):
+    """Событие для рейтинга популярности поста; копится до пересчёта
+    командой update_scores.
+    """
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    weight = models.PositiveSmallIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+
+class PostScore(models.Model):
+    """Рейтинг популярности поста с затуханием по времени."""
+
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='ranking'
+    )
+    # Копия категории поста: список категории читается по индексу
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+'
+    )
+    # Логарифм суммы весов событий, приведённых к общей точке отсчёта:
+    # со временем растут вклады новых событий, а не убывают старые
+    score = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('-score',), name='post_score_idx'),
+            models.Index(
+                fields=('category', '-score'), name='category_score_idx'
+            ),
+        )
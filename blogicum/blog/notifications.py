@@ -0,0 +1,179 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Max
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .constants import (
+    DEFAULT_DIGEST_FREQUENCY, DIGEST_BATCH_SIZE, DIGEST_FREQUENCIES,
+    DIGEST_RECENT_COMMENTS, EXPORT_CHUNK_SIZE, NOTIFICATIONS_LIMIT
+)
+from .keyset import before, decode_cursor, encode_cursor
+from .models import Notification, NotificationSettings
+
+# Поля события, из которых собирается дайджест
+DIGEST_FIELDS = (
+    'recipient_id', 'recipient__username', 'recipient__email',
+    'actor__username', 'post_id', 'post__title', 'comment__text',
+)
+
+
+# Функция для записи событий о новом комментарии автору поста и автору
+# комментария, на который ответили; о своих комментариях не сообщается
+def record(comment):
+    recipients = {comment.post.author_id: 'comment'}
+    if comment.parent_id is not None:
+        recipients[comment.parent.author_id] = 'reply'
+    recipients.pop(comment.author_id, None)
+    Notification.objects.bulk_create([
+        Notification(
+            recipient_id=recipient_id,
+            actor_id=comment.author_id,
+            post_id=comment.post_id,
+            comment=comment,
+            reason=reason,
+            created_at=comment.created_at,
+        )
+        for recipient_id, reason in recipients.items()
+    ])
+
+
+# Функция для страницы уведомлений пользователя и курсора следующей
+def notification_page(user, cursor=None, limit=NOTIFICATIONS_LIMIT):
+    after = decode_cursor(cursor)
+    notifications = user.notifications.select_related(
+        'actor', 'post', 'comment'
+    )
+    if after:
+        notifications = notifications.filter(
+            before(after, 'created_at', 'pk')
+        )
+    page = list(notifications.order_by('-created_at', '-pk')[:limit + 1])
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(page[-1].created_at, page[-1].pk)
+    return page, next_cursor
+
+
+# Функция для настроек уведомлений; без сохранённых — настройки
+# по умолчанию
+def get_settings(user):
+    return (
+        NotificationSettings.objects.filter(user=user).first()
+        or NotificationSettings(user=user)
+    )
+
+
+# Функция для отметки всех уведомлений пользователя прочитанными
+def mark_read(user):
+    return user.notifications.filter(is_read=False).update(is_read=True)
+
+
+# Функция для ещё не разосланных событий получателей с этой частотой
+def pending(frequency):
+    events = Notification.objects.filter(digested_at__isnull=True)
+    if frequency != DEFAULT_DIGEST_FREQUENCY:
+        return events.filter(
+            recipient__notification_settings__digest=frequency
+        )
+    return events.exclude(
+        recipient__notification_settings__digest__in=[
+            value for value, label in DIGEST_FREQUENCIES
+            if value != frequency
+        ]
+    )
+
+
+# Функция для сводки событий одного получателя за один проход:
+# число комментариев по постам и несколько последних комментариев
+def summarize(rows):
+    summary = None
+    posts = {}
+    recent = deque(maxlen=DIGEST_RECENT_COMMENTS)
+    for (recipient_id, username, email, actor, post_id, title,
+         text) in rows:
+        if summary is None:
+            summary = {
+                'recipient_id': recipient_id,
+                'username': username,
+                'email': email,
+                'total': 0,
+            }
+        summary['total'] += 1
+        posts.setdefault(post_id, {'title': title, 'count': 0})
+        posts[post_id]['count'] += 1
+        recent.append({'actor': actor, 'title': title, 'text': text})
+    summary['posts'] = sorted(
+        posts.values(), key=lambda post: post['count'], reverse=True
+    )
+    summary['recent'] = list(reversed(recent))
+    return summary
+
+
+# Функция для письма с дайджестом; обращений к базе в ней нет,
+# поэтому она выполняется в пуле потоков
+def render_digest(summary):
+    return EmailMessage(
+        subject=f'Новых комментариев: {summary["total"]}',
+        body=render_to_string('emails/digest.txt', summary),
+        to=[summary['email']],
+    )
+
+
+# Функция для сводок по получателям: события читаются одним проходом
+# в порядке (получатель, id) и сразу сворачиваются
+def summaries(events):
+    rows = events.order_by('recipient_id', 'pk').values_list(
+        *DIGEST_FIELDS
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for _, group in groupby(rows, key=lambda row: row[0]):
+        yield summarize(group)
+
+
+# Функция для рассылки дайджестов: события сворачиваются в сводки
+# одним проходом, письма рендерятся в пуле потоков и ставятся в очередь
+# пачками по batch_size получателей; возвращает число получателей
+# и отправленных писем
+def send_digests(frequency, workers=None, batch_size=DIGEST_BATCH_SIZE):
+    now = timezone.now()
+    if frequency == DEFAULT_DIGEST_FREQUENCY:
+        # События тех, кто отказался от дайджеста, в него не попадут
+        pending('never').update(digested_at=now)
+    events = pending(frequency)
+    # События, пришедшие во время рассылки, ждут следующей
+    last_pk = events.aggregate(last=Max('pk'))['last']
+    if last_pk is None:
+        return 0, 0
+    events = events.filter(pk__lte=last_pk)
+    # Сводки читаются до первой записи: таблицу, по которой идёт
+    # курсор, во время чтения не меняем
+    items = list(summaries(events))
+    if workers is None:
+        workers = settings.DIGEST_WORKERS
+    executor = ThreadPoolExecutor(workers) if workers else None
+    render = executor.map if executor else map
+    sent = 0
+    try:
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            messages = list(render(
+                render_digest,
+                [summary for summary in batch if summary['email']]
+            ))
+            sent += get_connection().send_messages(messages) or 0
+            # Порция отмечается сразу: прерванная рассылка продолжится
+            # со следующих получателей
+            events.filter(
+                recipient_id__in=[
+                    summary['recipient_id'] for summary in batch
+                ]
+            ).update(digested_at=now)
+    finally:
+        if executor:
+            executor.shutdown()
+    return len(items), sent
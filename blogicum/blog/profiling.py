@@ -0,0 +1,156 @@
+import cProfile
+import os
+import random
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+
+from .instrumentation import get_url_name
+
+MODES = ('cprofile', 'tracemalloc')
+SIGNING_SALT = 'blog.profiling'
+SAMPLE_RATE_FILE = 'sample_rate'
+# Как долго процесс использует прочитанную долю без перечитывания файла
+SAMPLE_RATE_REFRESH = 5
+TOP_ALLOCATIONS = 25
+
+# tracemalloc глобален для процесса, поэтому одновременно
+# снимается не больше одного профиля памяти
+_tracemalloc_lock = threading.Lock()
+_sample_rate = {'value': None, 'expires': 0.0}
+
+
+# Функция для создания подписанного флага профилирования: он действует
+# только на странице path и только для выдавшего его сотрудника
+def sign_modes(modes, path, user_id):
+    return signing.dumps(
+        {'modes': list(modes), 'path': path, 'user': user_id},
+        salt=SIGNING_SALT, compress=True
+    )
+
+
+# Функция для проверки подписанного флага на странице path; возвращает
+# режимы и id сотрудника или None
+def unsign_modes(token, path):
+    try:
+        payload = signing.loads(
+            token, salt=SIGNING_SALT, max_age=settings.PROFILING_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return None
+    if not isinstance(payload, dict) or payload.get('path') != path:
+        return None
+    modes = [mode for mode in payload.get('modes', ()) if mode in MODES]
+    return (modes, payload.get('user')) if modes else None
+
+
+# Функция для пути файла с долей профилируемых запросов: файл в
+# PROFILING_DIR общий для всех процессов сайта, в отличие от кэша
+def _sample_rate_path():
+    return Path(settings.PROFILING_DIR) / SAMPLE_RATE_FILE
+
+
+# Функция для получения доли профилируемых запросов
+def get_sample_rate():
+    now = time.monotonic()
+    if _sample_rate['expires'] <= now:
+        try:
+            value = float(_sample_rate_path().read_text())
+        except (OSError, ValueError):
+            value = settings.PROFILING_SAMPLE_RATE
+        _sample_rate['value'] = value
+        _sample_rate['expires'] = now + SAMPLE_RATE_REFRESH
+    return _sample_rate['value']
+
+
+# Функция для изменения доли профилируемых запросов во всех процессах;
+# файл заменяется целиком, чтобы его не прочитали наполовину записанным
+def set_sample_rate(rate):
+    path = _sample_rate_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    temporary.write_text(repr(float(rate)))
+    os.replace(temporary, path)
+    _sample_rate['expires'] = 0.0
+
+
+# Функция для выбора режимов профилирования запроса; возвращает режимы
+# и id сотрудника из подписанного флага (None для случайной выборки)
+def requested_modes(request):
+    token = request.GET.get(settings.PROFILING_QUERY_PARAM)
+    if token:
+        return unsign_modes(token, request.path) or (None, None)
+    rate = get_sample_rate()
+    if rate and random.random() < rate:
+        return settings.PROFILING_SAMPLE_MODES, None
+    return None, None
+
+
+# Функция для проверки, что запрос сделал сотрудник с данным id; вызывается
+# после представления, когда AuthenticationMiddleware уже задал request.user
+def _is_staff(request, user_id=None):
+    user = getattr(request, 'user', None)
+    return (
+        user is not None and user.is_staff
+        and (user_id is None or user.pk == user_id)
+    )
+
+
+def _output_path(request, suffix):
+    directory = Path(settings.PROFILING_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    label = (get_url_name(request) or 'unresolved').replace(':', '_')
+    return directory / (
+        f'{int(time.time() * 1000)}-{os.getpid()}-{label}{suffix}'
+    )
+
+
+def _write_allocations(path, request, before, after):
+    lines = [f'{request.method} {request.get_full_path()}']
+    for stat in after.compare_to(before, 'lineno')[:TOP_ALLOCATIONS]:
+        lines.append(str(stat))
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+
+# Функция для выполнения запроса под профилировщиками. Профиль по флагу
+# сохраняется, только если запрос сделал выдавший флаг сотрудник; имена
+# файлов в заголовке X-Profile видят только сотрудники
+def profile_request(get_response, request, modes, owner=None):
+    profiler = cProfile.Profile() if 'cprofile' in modes else None
+    trace_memory = (
+        'tracemalloc' in modes and _tracemalloc_lock.acquire(blocking=False)
+    )
+    files = []
+    try:
+        if trace_memory:
+            tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+        if profiler:
+            profiler.enable()
+        try:
+            response = get_response(request)
+        finally:
+            if profiler:
+                profiler.disable()
+        allowed = owner is None or _is_staff(request, owner)
+        if profiler and allowed:
+            path = _output_path(request, '.prof')
+            profiler.dump_stats(path)
+            files.append(path.name)
+        if trace_memory and allowed:
+            path = _output_path(request, '.alloc.txt')
+            _write_allocations(
+                path, request, before, tracemalloc.take_snapshot()
+            )
+            files.append(path.name)
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+            _tracemalloc_lock.release()
+    if files and _is_staff(request):
+        response['X-Profile'] = ', '.join(files)
+    return response
@@ -1,8 +1,13 @@
+from django.conf import settings
 from django.db.models import Count
 from django.core.paginator import Paginator
 from django.db.models.functions import Now
+from django.utils.functional import cached_property
 
-from .models import Post
+from . import cache, categories, geo, threads
+from .constants import BULK_CHUNK_SIZE, COUNT_CACHE_TIMEOUT
+from .models import Category, Comment, Location, Post
+from .signals import batched_invalidation, bulk_deletion, notify
 # from .constants import POSTS_LIMIT
 
 
@@ -13,9 +18,33 @@ def count_comment(queryset):
     )
 
 
+# Пагинатор, берущий общее число постов из кэша
+class CachedCountPaginator(Paginator):
+    def __init__(self, *args, cache_namespace=None, cache_key='count',
+                 **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_namespace = cache_namespace
+        self.cache_key = cache_key
+
+    @cached_property
+    def count(self):
+        # В кэше процесса сброс после изменения не виден другим процессам
+        if self.cache_namespace is None or not settings.SHARED_CACHE:
+            return super().count
+        return cache.get_or_set(
+            self.cache_namespace,
+            self.cache_key,
+            lambda: Paginator.count.func(self),
+            COUNT_CACHE_TIMEOUT
+        )
+
+
 # Функция для пагинации постов
-def paginate_posts(page_number, posts, limit):
-    paginator = Paginator(posts, limit)
+def paginate_posts(page_number, posts, limit, cache_namespace=None,
+                   cache_key='count'):
+    paginator = CachedCountPaginator(
+        posts, limit, cache_namespace=cache_namespace, cache_key=cache_key
+    )
     page_obj = paginator.get_page(page_number)
 
     return page_obj
@@ -27,8 +56,70 @@ def get_published_posts(manager=Post.objects):
         manager.filter(
             pub_date__lte=Now(),
             is_published=True,
-            category__is_published=True,
+            category__is_visible=True,
         )
         .select_related('category', 'author', 'location')
         .order_by('-pub_date')
+        .with_row_tracking()
     )
+
+
+# Функция для постов страницы по ключам (дата, id) в порядке ключей
+def get_page_posts(keys):
+    return count_comment(
+        get_published_posts().filter(pk__in=[pk for _, pk in keys])
+    ).order_by('-pub_date', '-pk')
+
+
+# Функция для перебора первичных ключей набора порциями по возрастанию
+def pk_chunks(queryset, size=BULK_CHUNK_SIZE):
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    last = None
+    while True:
+        page = pks if last is None else pks.filter(pk__gt=last)
+        chunk = list(page[:size])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1]
+
+
+# Функция для пакетной публикации или снятия с публикации
+def bulk_set_published(queryset, is_published):
+    model = queryset.model
+    updated = 0
+    with batched_invalidation():
+        for chunk in pk_chunks(queryset):
+            updated += model.objects.filter(pk__in=chunk).update(
+                is_published=is_published
+            )
+        if model is Category:
+            categories.refresh_visibility()
+        # Пакетное действие сбрасывает все карточки одним событием, а не
+        # версию каждого поста по отдельности
+        notify(model, namespaces=('cards',) if model is Post else ())
+    return updated
+
+
+# Функция для пакетного удаления порциями. Обработчики post_delete
+# внутри отключены, и производные данные чинятся запросами на порцию:
+# счётчики ответов предков, индекс мест, дерево категорий один раз
+# в конце. Кэши сбрасываются одним событием
+def bulk_delete(queryset):
+    model = queryset.model
+    deleted = 0
+    with bulk_deletion():
+        for chunk in pk_chunks(queryset):
+            if model is Comment:
+                ancestors = threads.surviving_ancestor_ids(chunk)
+            deleted += model.objects.filter(pk__in=chunk).delete()[1].get(
+                model._meta.label, 0
+            )
+            if model is Comment:
+                threads.recount_replies(ancestors)
+            elif model is Location:
+                geo.unindex_locations(chunk)
+        if model is Category:
+            categories.rebuild()
+        notify(model)
+    return deleted
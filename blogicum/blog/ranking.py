@@ -0,0 +1,176 @@
+import math
+import threading
+import time
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Exists, Max, OuterRef
+
+from . import cache, querysets
+from .constants import (
+    BULK_CHUNK_SIZE, EXPORT_CHUNK_SIZE, POSTS_LIMIT, SCORE_HALF_LIFE_HOURS,
+    SCORE_WEIGHTS, TRENDING_CACHE_TIMEOUT, TRENDING_LIMIT,
+    VIEW_FLUSH_INTERVAL
+)
+from .keyset import EPOCH
+from .models import Post, PostScore, ScoreEvent
+
+# Рост вклада события за секунду в логарифмической шкале: через период
+# полураспада новое событие весит вдвое больше такого же старого
+GROWTH_PER_SECOND = math.log(2) / (SCORE_HALF_LIFE_HOURS * 3600)
+# Наибольший вес одного события, ограничен типом поля weight
+MAX_EVENT_WEIGHT = 32767
+
+
+# Функция для записи события о посте; рейтинг пересчитывается позже
+def record(post_id, event):
+    ScoreEvent.objects.create(post_id=post_id, weight=SCORE_WEIGHTS[event])
+
+
+class ViewBuffer:
+    """Просмотры постов, накопленные в памяти процесса.
+
+    Просмотр — самое частое событие, и запись каждого заняла бы
+    блокировку SQLite на самом нагруженном пути чтения. Просмотры поста
+    суммируются и пишутся одним событием при сбросе: на первом
+    просмотре после VIEW_FLUSH_INTERVAL или при пересчёте рейтингов
+    в этом процессе.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.flushed_at = time.monotonic()
+
+    def add(self, post_id):
+        with self.lock:
+            self.counts[post_id] += 1
+            due = time.monotonic() - self.flushed_at >= VIEW_FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def drain(self):
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+            self.flushed_at = time.monotonic()
+        return counts
+
+    def flush(self):
+        counts = self.drain()
+        if not counts:
+            return 0
+        events = []
+        # Пост мог быть удалён, пока его просмотры копились
+        for post_id in Post.objects.filter(
+            pk__in=list(counts)
+        ).values_list('pk', flat=True):
+            weight = counts[post_id] * SCORE_WEIGHTS['view']
+            while weight > 0:
+                events.append(ScoreEvent(
+                    post_id=post_id, weight=min(weight, MAX_EVENT_WEIGHT)
+                ))
+                weight -= MAX_EVENT_WEIGHT
+        ScoreEvent.objects.bulk_create(events, batch_size=BULK_CHUNK_SIZE)
+        return len(events)
+
+
+view_buffer = ViewBuffer()
+
+
+# Функция для учёта просмотра поста без записи в базу
+def record_view(post_id):
+    view_buffer.add(post_id)
+
+
+# Функция для вклада события в рейтинг в логарифмической шкале
+def event_score(weight, created_at):
+    return math.log(weight) + GROWTH_PER_SECOND * (
+        created_at - EPOCH
+    ).total_seconds()
+
+
+# Функция для логарифма суммы по логарифмам слагаемых без переполнения
+def log_add(a, b):
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+# Функция для пересчёта рейтингов по накопившимся событиям: события
+# сворачиваются по постам за один проход, затем меняются только строки
+# постов с событиями; возвращает число обновлённых постов. Просмотры
+# из памяти других процессов попадают в базу при их собственном сбросе
+@transaction.atomic
+def update_scores():
+    view_buffer.flush()
+    last_pk = ScoreEvent.objects.aggregate(last=Max('pk'))['last']
+    if last_pk is None:
+        return 0
+    events = ScoreEvent.objects.filter(pk__lte=last_pk)
+    deltas = {}
+    for post_id, weight, created_at in events.values_list(
+        'post_id', 'weight', 'created_at'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        deltas[post_id] = log_add(
+            deltas.get(post_id), event_score(weight, created_at)
+        )
+    post_ids = list(deltas)
+    for start in range(0, len(post_ids), BULK_CHUNK_SIZE):
+        chunk = post_ids[start:start + BULK_CHUNK_SIZE]
+        scores = PostScore.objects.in_bulk(chunk)
+        for score in scores.values():
+            score.score = log_add(score.score, deltas[score.pk])
+        PostScore.objects.bulk_update(scores.values(), ('score',))
+        PostScore.objects.bulk_create([
+            PostScore(post_id=pk, category_id=category_id, score=deltas[pk])
+            for pk, category_id in Post.objects.filter(
+                pk__in=[pk for pk in chunk if pk not in scores]
+            ).values_list('pk', 'category_id')
+        ])
+    events.delete()
+    cache.invalidate('ranking')
+    return len(post_ids)
+
+
+# Функция для рейтингов опубликованных постов, самые популярные первыми;
+# видимость проверяется подзапросом по ключу, чтобы база шла по индексу
+# рейтинга и останавливалась на LIMIT
+def visible_scores():
+    published = querysets.get_published_posts().filter(
+        pk=OuterRef('post_id')
+    )
+    return PostScore.objects.filter(Exists(published)).order_by('-score')
+
+
+# Функция для страницы популярных постов: ключи страницы берутся
+# из таблицы рейтингов, посты с числом комментариев — одним запросом
+def popular_page(page_number, limit=POSTS_LIMIT):
+    page_obj = querysets.paginate_posts(
+        page_number,
+        visible_scores().values_list('post_id', flat=True),
+        limit,
+        cache_namespace='ranking',
+        cache_key='popular:count'
+    )
+    post_ids = list(page_obj.object_list)
+    posts = querysets.count_comment(
+        querysets.get_published_posts().filter(pk__in=post_ids)
+    ).in_bulk() if post_ids else {}
+    page_obj.object_list = [posts[pk] for pk in post_ids if pk in posts]
+    return page_obj
+
+
+# Функция для набирающих популярность постов категории и её подкатегорий
+# из кэша; список читается по индексу (категория, рейтинг)
+def trending_posts(category):
+    return cache.get_or_set(
+        'ranking',
+        f'trending:{category.pk}',
+        lambda: [
+            score.post for score in visible_scores().filter(
+                category_id__in=category.get_descendants().values('pk')
+            ).select_related('post')[:TRENDING_LIMIT]
+        ],
+        TRENDING_CACHE_TIMEOUT
+    )
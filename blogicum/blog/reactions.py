@@ -0,0 +1,145 @@
+import random
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+from . import ranking
+from .constants import REACTION_KINDS, REACTION_SHARDS
+from .models import Comment, Reaction, ReactionCounter
+
+
+# Функция для имени поля цели реакции: post или comment
+def target_field(target):
+    return 'comment' if isinstance(target, Comment) else 'post'
+
+
+# Функция для пары (post_id, comment_id), как в строках счётчиков
+def target_ids(target):
+    if isinstance(target, Comment):
+        return None, target.pk
+    return target.pk, None
+
+
+def _bump(target, kind, delta):
+    lookup = {target_field(target): target, 'kind': kind}
+    shard = random.randrange(REACTION_SHARDS)
+    counters = ReactionCounter.objects.filter(**lookup, shard=shard)
+    if counters.update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            ReactionCounter.objects.create(**lookup, shard=shard, count=delta)
+    except IntegrityError:
+        # Шард создан параллельным запросом
+        counters.update(count=F('count') + delta)
+
+
+# Функция для переключения реакции; возвращает, стоит ли она теперь
+@transaction.atomic
+def toggle_reaction(user, target, kind):
+    lookup = {'user': user, target_field(target): target, 'kind': kind}
+    if Reaction.objects.filter(**lookup).delete()[0]:
+        _bump(target, kind, -1)
+        return False
+    try:
+        with transaction.atomic():
+            Reaction.objects.create(**lookup)
+    except IntegrityError:
+        return True
+    _bump(target, kind, 1)
+    ranking.record(
+        target.post_id if isinstance(target, Comment) else target.pk,
+        'reaction'
+    )
+    return True
+
+
+# Функция для подстановки реакций в объекты страницы: одно чтение
+# счётчиков и одно чтение реакций текущего пользователя на всю страницу;
+# на странице могут быть вперемешку посты и комментарии
+def attach_reactions(objects, user):
+    objects = list(objects)
+    if not objects:
+        return
+    targets = Q()
+    for field in {target_field(obj) for obj in objects}:
+        targets |= Q(**{
+            f'{field}_id__in': [
+                obj.pk for obj in objects if target_field(obj) == field
+            ]
+        })
+    counts = defaultdict(int)
+    for post_id, comment_id, kind, total in (
+        ReactionCounter.objects.filter(targets)
+        .values_list('post_id', 'comment_id', 'kind')
+        .annotate(total=Sum('count'))
+        .order_by()
+    ):
+        counts[post_id, comment_id, kind] = total
+    active = set()
+    if user.is_authenticated:
+        active = set(
+            Reaction.objects.filter(targets, user=user)
+            .values_list('post_id', 'comment_id', 'kind')
+        )
+    for obj in objects:
+        post_id, comment_id = target_ids(obj)
+        obj.reaction_summary = [
+            (
+                kind, label, counts[post_id, comment_id, kind],
+                (post_id, comment_id, kind) in active
+            )
+            for kind, label in REACTION_KINDS
+        ]
+
+
+# Функция для сведения шардов каждого счётчика в одну строку;
+# возвращает число сжатых счётчиков
+def compact_counters():
+    groups = (
+        ReactionCounter.objects.values('post_id', 'comment_id', 'kind')
+        .annotate(rows=Count('id'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    compacted = 0
+    for group in groups.iterator():
+        lookup = {
+            'post_id': group['post_id'],
+            'comment_id': group['comment_id'],
+            'kind': group['kind'],
+        }
+        with transaction.atomic():
+            rows = list(
+                ReactionCounter.objects.select_for_update().filter(**lookup)
+            )
+            total = sum(row.count for row in rows)
+            ReactionCounter.objects.filter(
+                pk__in=[row.pk for row in rows[1:]]
+            ).delete()
+            ReactionCounter.objects.filter(pk=rows[0].pk).update(
+                count=total, shard=0
+            )
+        compacted += 1
+    ReactionCounter.objects.filter(count=0).delete()
+    return compacted
+
+
+# Функция для пересчёта счётчиков по таблице реакций
+@transaction.atomic
+def rebuild_counters():
+    ReactionCounter.objects.all().delete()
+    for field in ('post', 'comment'):
+        totals = (
+            Reaction.objects.filter(**{f'{field}__isnull': False})
+            .values_list(f'{field}_id', 'kind')
+            .annotate(total=Count('id'))
+            .order_by()
+        )
+        ReactionCounter.objects.bulk_create(
+            ReactionCounter(
+                **{f'{field}_id': pk}, kind=kind, shard=0, count=total
+            )
+            for pk, kind, total in totals.iterator()
+        )
@@ -0,0 +1,195 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from . import (
+    backends, cache, categories, geo, notifications, ranking, threads,
+    timeline
+)
+from .models import (
+    Category, Comment, Location, Post, PostScore, PostTag, TimelineEntry,
+    User
+)
+
+# Сигнал об изменении контента; namespaces — затронутые кэши
+content_changed = Signal()
+
+# Кэши, зависящие от каждой модели. Карточки поста и автора сбрасываются
+# по отдельности: cache.post_cards и cache.author_cards
+DEPENDENT_CACHES = {
+    Post: ('feed', 'category', 'ranking'),
+    Category: ('feed', 'cards', 'category', 'category_choices', 'ranking'),
+    Location: ('cards', 'location_choices'),
+}
+
+_pending = ContextVar('pending_invalidations', default=None)
+# Во время пакетного удаления обработчики удаления ничего не делают:
+# производные данные чинятся запросами по всей порции
+_bulk_deleting = ContextVar('bulk_deleting', default=False)
+
+
+# Функция для сообщения об изменении контента моделей и отдельных
+# пространств имён кэша
+def notify(*models, namespaces=()):
+    namespaces = set(namespaces)
+    for model in models:
+        namespaces.update(DEPENDENT_CACHES.get(model, ()))
+    pending = _pending.get()
+    if pending is not None:
+        pending.update(namespaces)
+    elif namespaces:
+        content_changed.send(sender=None, namespaces=namespaces)
+
+
+# Контекст, внутри которого изменения копятся и сообщаются одним событием
+@contextmanager
+def batched_invalidation():
+    pending = set()
+    token = _pending.set(pending)
+    try:
+        yield pending
+    finally:
+        _pending.reset(token)
+        if pending:
+            content_changed.send(sender=None, namespaces=pending)
+
+
+# Контекст пакетного удаления: сброс кэшей одним событием и обработчики
+# post_delete, отключённые для текущего потока. Глобальный disconnect
+# отключил бы их и для параллельных запросов других потоков
+@contextmanager
+def bulk_deletion():
+    token = _bulk_deleting.set(True)
+    try:
+        with batched_invalidation() as pending:
+            yield pending
+    finally:
+        _bulk_deleting.reset(token)
+
+
+@receiver(content_changed)
+def invalidate_caches(sender, namespaces, **kwargs):
+    cache.invalidate(*namespaces)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def object_changed(sender, **kwargs):
+    notify(sender)
+
+
+@receiver(post_save, sender=Post)
+def post_changed(sender, instance, **kwargs):
+    notify(sender, namespaces=(cache.post_cards(instance.pk),))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    cache.delete('users', instance.pk)
+    # Вход сохраняет только last_login, от него карточки не зависят
+    if update_fields is None or 'username' in update_fields:
+        notify(namespaces=(cache.author_cards(instance.pk),))
+
+
+@receiver(user_logged_in)
+def rehash_after_login(sender, request, user, **kwargs):
+    raw_password = user.__dict__.pop('rehash_password', None)
+    if raw_password is not None:
+        backends.schedule_rehash(user, raw_password, request.session)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+    else:
+        TimelineEntry.objects.filter(post=instance).update(
+            pub_date=instance.pub_date
+        )
+        PostTag.objects.filter(post=instance).update(
+            pub_date=instance.pub_date
+        )
+        PostScore.objects.filter(post=instance).update(
+            category_id=instance.category_id
+        )
+
+
+@receiver(pre_save, sender=Category)
+def category_saving(sender, instance, raw, **kwargs):
+    instance._tree_change = None
+    if raw:
+        return
+    if instance._state.adding:
+        categories.place(instance)
+        return
+    previous = (
+        Category.objects.filter(pk=instance.pk)
+        .values('parent_id', 'is_published', *categories.TREE_FIELDS)
+        .first()
+    )
+    if previous is None:
+        return
+    # Поля дерева меняет только этот модуль: загруженный ранее объект
+    # не должен затереть их устаревшими значениями
+    for field in categories.TREE_FIELDS:
+        setattr(instance, field, previous[field])
+    if previous['parent_id'] != instance.parent_id:
+        instance._tree_change = 'parent'
+    elif previous['is_published'] != instance.is_published:
+        instance._tree_change = 'visibility'
+        instance.is_visible = instance.is_published and (
+            instance.parent_id is None
+            or Category.objects.filter(
+                pk=instance.parent_id, is_visible=True
+            ).exists()
+        )
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, **kwargs):
+    change = getattr(instance, '_tree_change', None)
+    if change == 'parent':
+        categories.rebuild()
+        instance.refresh_from_db(fields=categories.TREE_FIELDS)
+    elif change == 'visibility':
+        categories.refresh_visibility(instance)
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    # Пакетное удаление перестраивает дерево один раз в конце, а не
+    # на каждую удалённую категорию
+    if not _bulk_deleting.get():
+        categories.rebuild()
+
+
+@receiver(post_save, sender=Location)
+def location_saved(sender, instance, **kwargs):
+    geo.index_location(instance)
+
+
+@receiver(post_delete, sender=Location)
+def location_deleted(sender, instance, **kwargs):
+    if not _bulk_deleting.get():
+        geo.unindex_location(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        threads.attach(instance)
+        notifications.record(instance)
+        ranking.record(instance.post_id, 'comment')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if not _bulk_deleting.get():
+        threads.detach(instance)
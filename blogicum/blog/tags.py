@@ -0,0 +1,130 @@
+import math
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import Now
+from django.utils.text import slugify
+
+from . import cache, querysets
+from .constants import (
+    MAX_TAG_LENGTH, POSTS_LIMIT, TAG_CLOUD_LEVELS, TAG_CLOUD_SIZE,
+    TAG_CLOUD_TIMEOUT
+)
+from .keyset import before, decode_cursor, split_page
+from .models import PostTag, Tag, TagStat
+
+
+# Функция для разбора строки тегов через запятую
+def parse_tag_names(text):
+    names = {}
+    for name in (text or '').split(','):
+        name = ' '.join(name.split()).lower()[:MAX_TAG_LENGTH]
+        slug = slugify(name, allow_unicode=True)
+        if slug:
+            names.setdefault(slug, name)
+    return names
+
+
+# Функция для поиска тегов по слагу или имени: оба поля уникальны, и
+# тег из админки может иметь слаг, отличный от slugify(имени). Возвращает
+# найденные теги и слаги, для которых тега нет
+def _match_tags(names):
+    existing = Tag.objects.filter(
+        Q(slug__in=names) | Q(name__in=names.values())
+    )
+    by_slug, by_name = {}, {}
+    for tag in existing:
+        by_slug[tag.slug] = by_name[tag.name] = tag
+    tags, missing = {}, []
+    for slug, name in names.items():
+        tag = by_slug.get(slug) or by_name.get(name)
+        if tag is None:
+            missing.append(slug)
+        else:
+            tags[tag.pk] = tag
+    return list(tags.values()), missing
+
+
+# Функция для замены тегов поста; недостающие теги создаются
+def set_post_tags(post, text):
+    names = parse_tag_names(text)
+    tags, missing = _match_tags(names)
+    if missing:
+        # Теги, созданные одновременно другим запросом, пропускаются
+        # вставкой и находятся повторным поиском
+        Tag.objects.bulk_create(
+            [Tag(name=names[slug], slug=slug) for slug in missing],
+            ignore_conflicts=True
+        )
+        tags, missing = _match_tags(names)
+    post.tags.set(tags, through_defaults={'pub_date': post.pub_date})
+
+
+# Функция для пересчёта таблицы облака тегов по опубликованным постам
+@transaction.atomic
+def refresh_tag_cloud():
+    counts = (
+        PostTag.objects.filter(
+            pub_date__lte=Now(),
+            post__is_published=True,
+            post__category__is_visible=True,
+        )
+        .values_list('tag_id')
+        .annotate(total=Count('post_id'))
+        .order_by()
+    )
+    TagStat.objects.all().delete()
+    TagStat.objects.bulk_create(
+        TagStat(tag_id=tag_id, post_count=total)
+        for tag_id, total in counts.iterator()
+    )
+    cache.invalidate('tags')
+
+
+def _build_cloud():
+    stats = list(
+        TagStat.objects.filter(post_count__gt=0)
+        .select_related('tag')
+        .order_by('-post_count')[:TAG_CLOUD_SIZE]
+    )
+    if not stats:
+        return []
+    low = math.log(stats[-1].post_count)
+    spread = math.log(stats[0].post_count) - low or 1
+    cloud = [
+        {
+            'name': stat.tag.name,
+            'slug': stat.tag.slug,
+            'count': stat.post_count,
+            # 1 — самые популярные теги, TAG_CLOUD_LEVELS — самые редкие
+            'level': TAG_CLOUD_LEVELS - round(
+                (math.log(stat.post_count) - low) / spread
+                * (TAG_CLOUD_LEVELS - 1)
+            ),
+        }
+        for stat in stats
+    ]
+    return sorted(cloud, key=lambda item: item['name'])
+
+
+# Функция для облака тегов из кэша
+def tag_cloud():
+    return cache.get_or_set('tags', 'cloud', _build_cloud, TAG_CLOUD_TIMEOUT)
+
+
+# Функция для страницы тега по индексу (тег, дата) с курсором
+def tag_page(tag, cursor=None, limit=POSTS_LIMIT):
+    links = PostTag.objects.filter(
+        tag=tag,
+        pub_date__lte=Now(),
+        post__is_published=True,
+        post__category__is_visible=True,
+    )
+    after = decode_cursor(cursor)
+    if after:
+        links = links.filter(before(after, 'pub_date', 'post_id'))
+    keys = links.order_by('-pub_date', '-post_id').values_list(
+        'pub_date', 'post_id'
+    )[:limit + 1]
+    page, next_cursor = split_page(keys, limit)
+    return list(querysets.get_page_posts(page)), next_cursor
@@ -0,0 +1,205 @@
+import re
+
+from django.db import transaction
+from django.db.models import (
+    Case, Count, F, OuterRef, Subquery, Value, When
+)
+from django.db.models.functions import Coalesce, Concat
+
+from .constants import (
+    COMMENT_MAX_DEPTH, COMMENT_PATH_STEP, COMMENT_PREVIEW_REPLIES,
+    COMMENTS_PER_PAGE
+)
+from .models import Comment
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+# Все сегменты состоят из [0-9a-z], поэтому путь ветки + '~' ограничивает
+# сверху пути всех её потомков
+THREAD_END = '~'
+CURSOR_RE = re.compile(r'[0-9a-z]+~?')
+
+
+# Функция для сегмента пути: id в base36 фиксированной ширины,
+# чтобы строковый порядок совпадал с числовым
+def encode(pk):
+    segment = ''
+    while pk:
+        pk, digit = divmod(pk, 36)
+        segment = DIGITS[digit] + segment
+    return segment.rjust(COMMENT_PATH_STEP, '0')
+
+
+# Функция для id предков по пути, начиная с корня ветки
+def ancestor_ids(path):
+    return [
+        int(path[start:start + COMMENT_PATH_STEP], 36)
+        for start in range(0, len(path) - COMMENT_PATH_STEP,
+                           COMMENT_PATH_STEP)
+    ]
+
+
+# Функция для id корня ветки комментария
+def root_id(comment):
+    return int(comment.path[:COMMENT_PATH_STEP], 36)
+
+
+# Функция для выбора родителя ответа: на предельной глубине ответ
+# встаёт рядом с комментарием, на который отвечают
+def reply_parent(comment):
+    if comment.depth < COMMENT_MAX_DEPTH - 1:
+        return comment
+    return Comment.objects.get(pk=ancestor_ids(comment.path)[-1])
+
+
+# Функция для включения нового комментария в ветку: путь, позиция
+# из счётчика позиций корня и счётчики ответов у всех предков
+@transaction.atomic
+def attach(comment):
+    segment = encode(comment.pk)
+    if comment.parent_id is None:
+        path, position = segment, 0
+    else:
+        path = comment.parent.path + segment
+        ancestors = ancestor_ids(path)
+        Comment.objects.filter(pk__in=ancestors).update(
+            reply_count=F('reply_count') + 1,
+            reply_sequence=Case(
+                When(pk=ancestors[0], then=F('reply_sequence') + 1),
+                default=F('reply_sequence'),
+            ),
+        )
+        position = (
+            Comment.objects.filter(pk=ancestors[0])
+            .values_list('reply_sequence', flat=True)
+            .get()
+        )
+    Comment.objects.filter(pk=comment.pk).update(
+        path=path, position=position
+    )
+    comment.path, comment.position = path, position
+
+
+# Функция для уменьшения счётчиков предков удалённого комментария;
+# при каскадном удалении вызывается для каждого удалённого ответа.
+# Счётчик позиций корня не уменьшается: позиции не выдаются повторно
+def detach(comment):
+    Comment.objects.filter(pk__in=ancestor_ids(comment.path)).update(
+        reply_count=F('reply_count') - 1
+    )
+
+
+# Функция для заполнения путей, позиций и счётчиков ответов заново по
+# полю parent; нужна после loaddata и массовой загрузки, которые
+# обходят attach. Родитель всегда старше ответа, поэтому обход по id
+# встречает его раньше. Счётчики предков меняются до конца поста,
+# поэтому комментарии поста сохраняются после его обхода
+@transaction.atomic
+def rebuild_paths(batch_size=1000):
+    pending, updated = [], 0
+    nodes, post_id = {}, None
+
+    def flush():
+        Comment.objects.bulk_update(
+            pending, ('path', 'position', 'reply_count', 'reply_sequence'),
+            batch_size=batch_size
+        )
+        pending.clear()
+
+    for comment in (
+        Comment.objects.only('pk', 'post_id', 'parent_id')
+        .order_by('post_id', 'pk').iterator()
+    ):
+        if comment.post_id != post_id:
+            pending.extend(nodes.values())
+            if len(pending) >= batch_size:
+                flush()
+            nodes, post_id = {}, comment.post_id
+        comment.reply_count = comment.reply_sequence = 0
+        if comment.parent_id is None:
+            comment.path, comment.position = encode(comment.pk), 0
+        else:
+            comment.path = nodes[comment.parent_id].path + encode(comment.pk)
+            ancestors = [nodes[pk] for pk in ancestor_ids(comment.path)]
+            for ancestor in ancestors:
+                ancestor.reply_count += 1
+            ancestors[0].reply_sequence += 1
+            comment.position = ancestors[0].reply_sequence
+        nodes[comment.pk] = comment
+        updated += 1
+    pending.extend(nodes.values())
+    flush()
+    return updated
+
+
+# Функция для id сохранившихся предков порции комментариев
+def surviving_ancestor_ids(pks):
+    deleted = set(pks)
+    ancestors = set()
+    for path in Comment.objects.filter(pk__in=pks).values_list(
+        'path', flat=True
+    ):
+        ancestors.update(ancestor_ids(path))
+    return ancestors - deleted
+
+
+# Функция для пересчёта счётчиков ответов одним запросом: ответы
+# комментария — строки поста в диапазоне путей его ветки
+def recount_replies(pks):
+    if not pks:
+        return
+    descendants = (
+        Comment.objects.filter(
+            post_id=OuterRef('post_id'),
+            path__gt=OuterRef('path'),
+            path__lt=Concat(OuterRef('path'), Value(THREAD_END)),
+        )
+        .order_by()
+        .values('post_id')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Comment.objects.filter(pk__in=list(pks)).update(
+        reply_count=Coalesce(Subquery(descendants), 0)
+    )
+
+
+# Функция для всей ветки комментария одним запросом по диапазону путей
+def get_thread(comment):
+    return (
+        Comment.objects.filter(
+            post_id=comment.post_id,
+            path__gte=comment.path,
+            path__lt=comment.path + THREAD_END,
+        )
+        .select_related('author')
+        .order_by('path')
+    )
+
+
+# Функция для страницы веток поста: корни с первыми ответами одним
+# запросом по индексу (post, path, position) и курсор следующей страницы
+def comment_page(post, cursor=None, limit=COMMENTS_PER_PAGE,
+                 replies=COMMENT_PREVIEW_REPLIES):
+    if not cursor or not CURSOR_RE.fullmatch(cursor):
+        cursor = '0'
+    # Каждая ветка даёт не больше replies + 1 строк, так что лишняя
+    # строка сверх этого — корень следующей страницы
+    size = limit * (replies + 1)
+    rows = list(
+        post.comments.filter(path__gte=cursor, position__lte=replies)
+        .select_related('author')
+        .order_by('path')[:size + 1]
+    )
+    comments, roots = [], 0
+    for comment in rows:
+        if comment.parent_id is None:
+            if roots == limit:
+                return comments, comment.path
+            roots += 1
+        comments.append(comment)
+    if len(rows) > size:
+        # Позиции повторяются, только если комментарии загружены в обход
+        # attach и rebuild_paths ещё не запускался; тогда следующая
+        # страница начинается после последней ветки
+        return comments, comments[-1].path[:COMMENT_PATH_STEP] + THREAD_END
+    return comments, None
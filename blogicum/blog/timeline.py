@@ -0,0 +1,92 @@
+from django.db.models.functions import Now
+
+from .constants import (
+    BULK_CHUNK_SIZE, POSTS_LIMIT, TIMELINE_BACKFILL, TIMELINE_FANOUT_LIMIT
+)
+from . import querysets
+from .keyset import before, decode_cursor, split_page
+from .models import Follow, Post, TimelineEntry
+
+
+def _create_entries(entries):
+    for start in range(0, len(entries), BULK_CHUNK_SIZE):
+        TimelineEntry.objects.bulk_create(
+            entries[start:start + BULK_CHUNK_SIZE], ignore_conflicts=True
+        )
+
+
+# Функция для рассылки нового поста по лентам подписчиков автора;
+# при превышении лимита автор переводится на подмешивание при чтении
+def fan_out(post):
+    followers = list(
+        Follow.objects.filter(author_id=post.author_id, fan_out=True)
+        .values_list('follower_id', flat=True)[:TIMELINE_FANOUT_LIMIT + 1]
+    )
+    if len(followers) > TIMELINE_FANOUT_LIMIT:
+        Follow.objects.filter(author_id=post.author_id).update(fan_out=False)
+        return
+    _create_entries([
+        TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers
+    ])
+
+
+# Функция для подписки; в ленту сразу попадают последние посты автора
+def follow(user, author):
+    merged = Follow.objects.filter(author=author, fan_out=False).exists()
+    _, created = Follow.objects.get_or_create(
+        follower=user, author=author, defaults={'fan_out': not merged}
+    )
+    if not created or merged:
+        return
+    recent = (
+        Post.objects.filter(author=author)
+        .order_by('-pub_date')
+        .values_list('pk', 'pub_date')[:TIMELINE_BACKFILL]
+    )
+    _create_entries([
+        TimelineEntry(user=user, post_id=pk, pub_date=pub_date)
+        for pk, pub_date in recent
+    ])
+
+
+# Функция для отписки с удалением постов автора из ленты
+def unfollow(user, author):
+    Follow.objects.filter(follower=user, author=author).delete()
+    TimelineEntry.objects.filter(user=user, post__author=author).delete()
+
+
+# Функция для страницы ленты подписок: разосланные посты и посты
+# авторов с подмешиванием сливаются по (pub_date, id); возвращает
+# посты и курсор следующей страницы
+def timeline_page(user, cursor=None, limit=POSTS_LIMIT):
+    after = decode_cursor(cursor)
+    entries = TimelineEntry.objects.filter(
+        user=user,
+        pub_date__lte=Now(),
+        post__is_published=True,
+        post__category__is_visible=True,
+    )
+    if after:
+        entries = entries.filter(before(after, 'pub_date', 'post_id'))
+    keys = list(
+        entries.order_by('-pub_date', '-post_id')
+        .values_list('pub_date', 'post_id')[:limit + 1]
+    )
+    merged_authors = list(
+        Follow.objects.filter(follower=user, fan_out=False)
+        .values_list('author_id', flat=True)
+    )
+    if merged_authors:
+        posts = querysets.get_published_posts().filter(
+            author_id__in=merged_authors
+        )
+        if after:
+            posts = posts.filter(before(after, 'pub_date', 'pk'))
+        keys += posts.order_by('-pub_date', '-pk').values_list(
+            'pub_date', 'pk'
+        )[:limit + 1]
+    # Записи, разосланные до перевода автора на подмешивание, остаются
+    # в ленте и повторяют его посты
+    page, next_cursor = split_page(set(keys), limit)
+    return list(querysets.get_page_posts(page)), next_cursor
@@ -27,6 +27,9 @@ urlpatterns = [
         views.category_posts,
         name="category_posts"
     ),
+    path('popular/', views.popular_posts, name='popular'),
+    path('tag/<str:tag_slug>/', views.tag_posts, name='tag_posts'),
+    path('nearby/', views.nearby_posts, name='nearby_posts'),
     path(
         'posts/<int:post_id>/<int:comment/',
         views.CommentCreateView.as_view(),
@@ -42,7 +45,47 @@ urlpatterns = [
         views.CommentDeleteView.as_view(),
         name='delete_comment'
     ),
+    path(
+        'posts/<int:post_id>/comments/<int:comment_id>/reply/',
+        views.CommentCreateView.as_view(),
+        name='reply_comment'
+    ),
+    path('posts/<int:post_id>/react/', views.react, name='react_post'),
+    path(
+        'posts/<int:post_id>/comments/<int:comment_id>/react/',
+        views.react,
+        name='react_comment'
+    ),
 
     path('profile/<str:username>/', views.user_profile, name='profile'),
-    path('edit_profile/', views.edit_profile, name='edit_profile')
+    path(
+        'profile/<str:username>/activity/',
+        views.profile_activity,
+        name='profile_activity'
+    ),
+    path(
+        'profile/<str:username>/follow/',
+        views.follow_author,
+        name='follow'
+    ),
+    path(
+        'comments/<int:comment_id>/',
+        views.comment_thread,
+        name='comment_thread'
+    ),
+    path('following/', views.following_feed, name='following'),
+    path(
+        'notifications/', views.notification_list, name='notifications'
+    ),
+    path(
+        'notifications/read/',
+        views.read_notifications,
+        name='read_notifications'
+    ),
+    path('edit_profile/', views.edit_profile, name='edit_profile'),
+    path(
+        'locations/autocomplete/',
+        views.location_autocomplete,
+        name='location_autocomplete'
+    ),
 ]
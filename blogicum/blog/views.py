@@ -1,4 +1,7 @@
+from urllib.parse import urlsplit
+
 from django.shortcuts import render, get_object_or_404, redirect
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.urls import reverse, reverse_lazy
 from django.views.generic import (
@@ -8,13 +11,33 @@ from django.utils import timezone
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import LoginView
 from django.contrib.auth import login
-from django.http import Http404
+from django.conf import settings
+from django.http import (
+    Http404, HttpResponse, HttpResponseForbidden, JsonResponse
+)
+from django.utils.crypto import constant_time_compare
+from django.utils.http import url_has_allowed_host_and_scheme, urlencode
 
 
-from .models import Post, Category, Comment, User
-from .constants import POSTS_LIMIT
-from .forms import PostForm, CommentForm, UserProfileEditForm, UserCreationForm
-from .querysets import count_comment, get_published_posts, paginate_posts
+from .models import Post, Category, Comment, Follow, Location, Tag, User
+from .constants import (
+    AUTOCOMPLETE_LIMIT, COMMENT_PREVIEW_REPLIES, POSTS_LIMIT, REACTION_KINDS
+)
+from .forms import (
+    PostForm, CommentForm, UserProfileEditForm, UserCreationForm,
+    NearbyForm, NotificationSettingsForm, ProfilingForm
+)
+from . import geo, notifications, ranking
+from .activity import activity_page
+from .metrics import registry
+from .profiling import get_sample_rate, set_sample_rate, sign_modes
+from .reactions import attach_reactions, toggle_reaction
+from .tags import tag_cloud, tag_page
+from .threads import comment_page, get_thread, reply_parent, root_id
+from .timeline import follow, timeline_page, unfollow
+from .querysets import (
+    CachedCountPaginator, count_comment, get_published_posts, paginate_posts
+)
 
 
 # Класс для отображения списка постов
@@ -22,12 +45,22 @@ class PostListView(ListView):
     model = Post
     template_name = 'blog/index.html'
     paginate_by = POSTS_LIMIT
+    paginator_class = CachedCountPaginator
 
     def get_queryset(self):
         queryset = get_published_posts()
         queryset = count_comment(queryset)
         return queryset
 
+    def get_paginator(self, *args, **kwargs):
+        return super().get_paginator(*args, cache_namespace='feed', **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        attach_reactions(context['page_obj'], self.request.user)
+        context['tag_cloud'] = tag_cloud()
+        return context
+
 
 # Класс для отображения деталей поста
 class PostDetailView(DetailView):
@@ -38,25 +71,62 @@ class PostDetailView(DetailView):
 
     def get_object(self, queryset=None):
         post = get_object_or_404(
-            Post.objects.select_related('category'),
+            Post.objects.select_related('category', 'author', 'location'),
             pk=self.kwargs['post_id']
         )
-
-        if (
-            not post.is_published
-            or not post.category.is_published
-            or post.pub_date > timezone.now()
-        ) and post.author != self.request.user:
-            raise Http404("Page not published")
+        check_post_visible(post, self.request.user)
+        # Рейтинг учитывает только просмотры опубликованного поста
+        # читателями, а не автором
+        if post.author != self.request.user and is_post_public(post):
+            ranking.record_view(post.pk)
         return post
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['form'] = CommentForm()
-        context['comments'] = self.object.comments.select_related('author')
+        context['comments'], context['next_cursor'] = comment_page(
+            self.object, self.request.GET.get('after')
+        )
+        context['preview_replies'] = COMMENT_PREVIEW_REPLIES
+        context['tags'] = self.object.tags.all()
+        attach_reactions([self.object], self.request.user)
+        attach_reactions(context['comments'], self.request.user)
         return context
 
 
+# Функция для проверки, что пост виден всем посетителям
+def is_post_public(post):
+    return (
+        post.is_published
+        and post.category.is_visible
+        and post.pub_date <= timezone.now()
+    )
+
+
+# Функция для проверки, что пост виден пользователю
+def check_post_visible(post, user):
+    if not is_post_public(post) and post.author != user:
+        raise Http404("Page not published")
+
+
+# Функция для отображения всей ветки комментариев
+def comment_thread(request, comment_id):
+    comment = get_object_or_404(
+        Comment.objects.select_related('post__category'),
+        pk=comment_id
+    )
+    check_post_visible(comment.post, request.user)
+    comments = list(get_thread(comment))
+    attach_reactions(comments, request.user)
+    context = {
+        'post': comment.post,
+        'thread': comment,
+        'comments': comments,
+        'form': CommentForm(),
+    }
+    return render(request, 'blog/thread.html', context)
+
+
 # Миксин для проверки доступа при редактировании и удалении поста
 class DispatchMixin:
     def dispatch(self, request, *args, **kwargs):
@@ -71,7 +141,7 @@ class DispatchMixin:
 def post_update_view(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
 
-    if request.user != post.author:
+    if request.user.pk != post.author_id:
         return redirect('blog:post_detail', post_id=post_id)
 
     form = PostForm(request.POST or None, request.FILES or None, instance=post)
@@ -93,7 +163,7 @@ def post_update_view(request, post_id):
 def delete_post(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
 
-    if request.user != post.author:
+    if request.user.pk != post.author_id:
         return redirect('blog:post_detail', post_id=post_id)
 
     if request.method == 'POST':
@@ -127,20 +197,71 @@ def category_posts(request, category_slug):
     category = get_object_or_404(
         Category,
         slug=category_slug,
-        is_published=True
+        is_visible=True
     )
 
-    posts = get_published_posts(category.posts)
+    # Посты всех подкатегорий выбираются по диапазону границ дерева
+    posts = get_published_posts().filter(
+        category__lft__gte=category.lft,
+        category__rgt__lte=category.rgt,
+    )
     page_number = request.GET.get('page')
-    page_obj = paginate_posts(page_number, posts, POSTS_LIMIT)
+    page_obj = paginate_posts(
+        page_number, posts, POSTS_LIMIT,
+        cache_namespace='category', cache_key=f'{category.pk}:count'
+    )
+    attach_reactions(page_obj, request.user)
     context = {
         'category': category,
+        'subcategories': category.children.filter(is_visible=True),
+        'trending': ranking.trending_posts(category),
         'page_obj': page_obj,
     }
 
     return render(request, template_name, context)
 
 
+# Функция для ленты популярных публикаций
+def popular_posts(request):
+    page_obj = ranking.popular_page(request.GET.get('page'))
+    attach_reactions(page_obj, request.user)
+    return render(request, 'blog/popular.html', {'page_obj': page_obj})
+
+
+# Функция для публикаций с тегом с постраничным переходом по курсору
+def tag_posts(request, tag_slug):
+    tag = get_object_or_404(Tag, slug=tag_slug)
+    posts, next_cursor = tag_page(tag, request.GET.get('after'))
+    attach_reactions(posts, request.user)
+    context = {
+        'tag': tag,
+        'posts': posts,
+        'next_cursor': next_cursor,
+    }
+    return render(request, 'blog/tag.html', context)
+
+
+# Функция для публикаций из мест в радиусе от точки
+def nearby_posts(request):
+    form = NearbyForm(request.GET or None)
+    context = {'form': form}
+    if form.is_valid():
+        posts, distances = geo.nearby_posts(
+            form.cleaned_data['lat'],
+            form.cleaned_data['lon'],
+            form.cleaned_data['radius'],
+        )
+        page_obj = paginate_posts(
+            request.GET.get('page'), count_comment(posts), POSTS_LIMIT
+        )
+        attach_reactions(page_obj, request.user)
+        for post in page_obj:
+            post.distance = distances[post.location_id]
+        context['page_obj'] = page_obj
+        context['page_query'] = urlencode(form.cleaned_data) + '&'
+    return render(request, 'blog/nearby.html', context)
+
+
 # Класс для регистрации пользователя
 class UserRegistrationView(CreateView):
     template_name = 'registration/registration_form.html'
@@ -172,13 +293,91 @@ def user_profile(request, username):
     posts = count_comment(posts)
     page_number = request.GET.get('page')
     page_obj = paginate_posts(page_number, posts, POSTS_LIMIT)
-    context = {
-        'profile': user,
-        'page_obj': page_obj,
-    }
+    attach_reactions(page_obj, request.user)
+    context = profile_context(request, user)
+    context['page_obj'] = page_obj
     return render(request, 'blog/profile.html', context)
 
 
+# Функция для общего контекста вкладок страницы пользователя
+def profile_context(request, profile):
+    context = {'profile': profile}
+    if request.user.is_authenticated and profile != request.user:
+        context['is_following'] = Follow.objects.filter(
+            follower=request.user, author=profile
+        ).exists()
+    return context
+
+
+# Функция для ленты активности пользователя: посты и комментарии
+# по времени с постраничным переходом по курсору
+def profile_activity(request, username):
+    profile = get_object_or_404(User, username=username)
+    items, next_cursor = activity_page(
+        profile, request.user, request.GET.get('after')
+    )
+    attach_reactions([item for kind, item in items], request.user)
+    context = profile_context(request, profile)
+    context.update(
+        activity=items, next_cursor=next_cursor, activity_tab=True
+    )
+    return render(request, 'blog/activity.html', context)
+
+
+# Функция для подписки на автора и отписки от него
+@login_required
+def follow_author(request, username):
+    author = get_object_or_404(User, username=username)
+    if request.method == 'POST' and author != request.user:
+        if request.POST.get('action') == 'unfollow':
+            unfollow(request.user, author)
+        else:
+            follow(request.user, author)
+    return redirect('blog:profile', username=username)
+
+
+# Функция для ленты подписок с постраничным переходом по курсору
+@login_required
+def following_feed(request):
+    posts, next_cursor = timeline_page(
+        request.user, request.GET.get('after')
+    )
+    attach_reactions(posts, request.user)
+    return render(
+        request,
+        'blog/following.html',
+        {'posts': posts, 'next_cursor': next_cursor}
+    )
+
+
+# Функция для уведомлений пользователя и настроек дайджеста
+@login_required
+def notification_list(request):
+    form = NotificationSettingsForm(
+        request.POST or None,
+        instance=notifications.get_settings(request.user)
+    )
+    if form.is_valid():
+        form.save()
+        return redirect('blog:notifications')
+    page, next_cursor = notifications.notification_page(
+        request.user, request.GET.get('after')
+    )
+    return render(
+        request,
+        'blog/notifications.html',
+        {'notifications': page, 'next_cursor': next_cursor, 'form': form}
+    )
+
+
+# Функция для отметки всех уведомлений прочитанными
+@login_required
+def read_notifications(request):
+    if request.method == 'POST':
+        notifications.mark_read(request.user)
+    return redirect('blog:notifications')
+
+
 # Функция для изменения профиля пользователя
 @login_required
 def edit_profile(request):
@@ -190,6 +389,40 @@ def edit_profile(request):
     return render(request, 'blog/create.html', {'form': form})
 
 
+# Функция для подсказок мест по началу или части названия
+@login_required
+def location_autocomplete(request):
+    term = request.GET.get('q', '').strip()
+    locations = Location.objects.order_by('name')
+    if term:
+        locations = locations.filter(name__icontains=term)
+    results = [
+        {'id': pk, 'text': name}
+        for pk, name in locations.values_list('pk', 'name')[
+            :AUTOCOMPLETE_LIMIT
+        ]
+    ]
+    return JsonResponse({'results': results})
+
+
+# Функция для переключения реакции на пост или комментарий
+@login_required
+def react(request, post_id, comment_id=None):
+    post = get_object_or_404(get_published_posts(), pk=post_id)
+    target = post
+    if comment_id is not None:
+        target = get_object_or_404(post.comments, pk=comment_id)
+    kind = request.POST.get('kind')
+    if request.method == 'POST' and kind in dict(REACTION_KINDS):
+        toggle_reaction(request.user, target, kind)
+    next_url = request.POST.get('next')
+    if next_url and url_has_allowed_host_and_scheme(
+        next_url, allowed_hosts={request.get_host()}
+    ):
+        return redirect(next_url)
+    return redirect('blog:post_detail', post_id=post_id)
+
+
 # Класс для создания комментария
 class CommentCreateView(LoginRequiredMixin, CreateView):
     model = Comment
@@ -199,8 +432,18 @@ class CommentCreateView(LoginRequiredMixin, CreateView):
     def form_valid(self, form):
         form.instance.post = get_object_or_404(Post, pk=self.kwargs['post_id'])
         form.instance.author = self.request.user
+        if 'comment_id' not in self.kwargs:
+            form.save()
+            return redirect('blog:post_detail', post_id=self.kwargs['post_id'])
+        parent = get_object_or_404(
+            Comment, pk=self.kwargs['comment_id'], post=form.instance.post
+        )
+        form.instance.parent = reply_parent(parent)
         form.save()
-        return redirect('blog:post_detail', post_id=self.kwargs['post_id'])
+        return redirect(
+            reverse('blog:comment_thread', args=(root_id(parent),))
+            + f'#comment_{form.instance.pk}'
+        )
 
 
 # Миксин с общими полями
@@ -225,3 +468,42 @@ class CommentUpdateView(CommentMixin, UpdateView):
 # Класс для удаления комментария
 class CommentDeleteView(CommentMixin, DeleteView):
     pk_url_kwarg = "comment_id"
+
+
+# Функция для управления профилированием запросов
+@staff_member_required
+def profiling_settings(request):
+    form = ProfilingForm(
+        request.POST or None,
+        initial={'sample_rate': get_sample_rate()}
+    )
+    link = None
+    if form.is_valid():
+        set_sample_rate(form.cleaned_data['sample_rate'])
+        path = form.cleaned_data['path']
+        modes = form.cleaned_data['modes']
+        if path and modes:
+            separator = '&' if '?' in path else '?'
+            token = sign_modes(modes, urlsplit(path).path, request.user.pk)
+            link = path + separator + urlencode(
+                {settings.PROFILING_QUERY_PARAM: token}
+            )
+    return render(
+        request, 'blog/profiling.html', {'form': form, 'link': link}
+    )
+
+
+# Функция для выгрузки метрик в текстовом формате Prometheus
+def metrics(request):
+    token = settings.METRICS_TOKEN
+    if token is None:
+        # Без токена метрики доступны только при разработке
+        if not settings.DEBUG:
+            raise Http404
+    elif not constant_time_compare(
+        request.headers.get('Authorization', ''), f'Bearer {token}'
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.render(), content_type='text/plain; version=0.0.4'
+    )
@@ -49,13 +49,19 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'blog.middleware.RequestContextMiddleware',
+    'blog.middleware.MetricsMiddleware',
+    'blog.middleware.RequestTimingMiddleware',
+    'blog.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
+    'blog.middleware.PasswordRehashMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'blog.middleware.NPlusOneMiddleware',
 ]
 
 ROOT_URLCONF = 'blogicum.urls'
@@ -73,6 +79,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'blog.context_processors.cache_versions',
             ],
         },
     },
@@ -110,6 +117,52 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Первый хешер — политика для новых паролей; стоимость подбирается
+# командой calibrate_hashers под бюджет времени входа на этом хосте.
+# Для Argon2 (пакет argon2-cffi) или scrypt (hashlib, нужен OpenSSL 1.1+)
+# поставьте его хешер первым
+PASSWORD_HASHERS = [
+    'blog.hashers.CalibratedPBKDF2PasswordHasher',
+    'blog.hashers.CalibratedArgon2PasswordHasher',
+    'blog.hashers.CalibratedScryptPasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
+PASSWORD_PBKDF2_ITERATIONS = 260000
+
+PASSWORD_ARGON2_TIME_COST = 2
+
+PASSWORD_SCRYPT_WORK_FACTOR = 2 ** 14
+
+# Хеши со старой стоимостью обновляются после входа в фоновом пуле;
+# 0 — обновлять сразу в потоке запроса
+PASSWORD_REHASH_WORKERS = 2
+
+# Потоки, в которых команда send_digests собирает письма;
+# 0 — собирать в основном потоке
+DIGEST_WORKERS = 4
+
+AUTHENTICATION_BACKENDS = ['blog.backends.RehashInBackgroundBackend']
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Кэш общий для всех процессов (Memcached, Redis). Только тогда сессии,
+# пользователи, карточки постов и счётчики лент читаются из кэша: в кэше
+# процесса сброс после выхода, смены пароля или правки поста в одном
+# процессе не виден остальным. По умолчанию кэш процесса, и авторизованный
+# запрос читает из базы сессию и пользователя: по одному запросу. Для
+# нуля запросов подключите общий кэш в CACHES и включите SHARED_CACHE
+SHARED_CACHE = False
+
+SESSION_ENGINE = (
+    'django.contrib.sessions.backends.cached_db' if SHARED_CACHE
+    else 'django.contrib.sessions.backends.db'
+)
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
@@ -141,13 +194,102 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CSRF_FAILURE_VIEW = 'pages.views.csrf_failure'
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Письма ставятся в очередь в базе, отправляет их команда send_outbox
+EMAIL_BACKEND = 'blog.mail.OutboxEmailBackend'
 
 EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
 
+# Бэкенд, через который send_outbox отправляет письма; в продакшене SMTP
+OUTBOX_DELIVERY_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+
+OUTBOX_BATCH_SIZE = 100
+
+OUTBOX_MAX_ATTEMPTS = 8
+
+# Задержка повтора растёт вдвое с каждой попыткой, секунды
+OUTBOX_RETRY_BASE = 30
+
+OUTBOX_RETRY_MAX = 3600
+
+# На это время захваченная порция скрыта от других обработчиков, секунды
+OUTBOX_LEASE = 300
+
 LOGIN_REDIRECT_URL = 'blog:profile'
 
 LOGIN_URL = 'login'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Доля запросов, для которых замеряется время SQL, шаблонов и всего запроса
+REQUEST_TIMING_SAMPLE_RATE = 0.01
+
+# Заголовок Server-Timing в замеренных ответах; его видят только
+# сотрудники и все при DEBUG
+REQUEST_TIMING_HEADER = True
+
+PROFILING_DIR = BASE_DIR / 'profiles'
+
+PROFILING_QUERY_PARAM = '_profile'
+
+# Время жизни подписанной ссылки на профилирование, секунды; ссылка
+# действует только на своей странице и для выдавшего её сотрудника
+PROFILING_TOKEN_MAX_AGE = 5 * 60
+
+PROFILING_SAMPLE_RATE = 0
+
+PROFILING_SAMPLE_MODES = ['cprofile']
+
+# Каталог общих файлов метрик для нескольких процессов; None — только
+# память текущего процесса. Очищайте каталог при каждом развёртывании
+METRICS_DIR = None
+
+# /metrics/ требует заголовок Authorization: Bearer <токен>; без токена
+# эндпоинт открыт только при DEBUG
+METRICS_TOKEN = None
+
+# Запросы дольше порога пишутся в журнал медленных запросов с планом
+SLOW_QUERY_THRESHOLD_MS = 100
+
+SLOW_QUERY_LOG_FILE = BASE_DIR / 'slow_queries.log'
+
+# Поиск N+1: столько однотипных запросов из шаблона за запрос — проблема
+NPLUSONE_ENABLED = DEBUG
+
+NPLUSONE_THRESHOLD = 3
+
+# Превращать найденные N+1 в исключение, например в тестах
+NPLUSONE_RAISE = False
+
+# Для больших таблиц мест: поле места в форме поста подгружает варианты
+# с эндпоинта автодополнения вместо полного списка
+LOCATION_AUTOCOMPLETE = False
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG_FILE,
+            'maxBytes': 10 * 1024 ** 2,
+            'backupCount': 5,
+            'encoding': 'utf-8',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'blog': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+        'blog.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
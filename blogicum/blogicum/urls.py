@@ -18,9 +18,12 @@ from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
-from blog.views import UserRegistrationView, LoginView
+from blog.views import (
+    UserRegistrationView, LoginView, metrics, profiling_settings
+)
 
 urlpatterns = [
+    path('admin/profiling/', profiling_settings, name='profiling'),
     path('admin/', admin.site.urls),
     path('auth/', include('django.contrib.auth.urls')),
     path(
@@ -29,6 +32,7 @@ urlpatterns = [
         name='registration',
     ),
     path('login/', LoginView.as_view(), name='login'),
+    path('metrics/', metrics, name='metrics'),
     path('', include('blog.urls')),
     path('pages/', include('pages.urls')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
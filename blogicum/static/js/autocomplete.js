@@ -0,0 +1,40 @@
+// Подгрузка вариантов для списков с атрибутом data-autocomplete-url
+document.addEventListener('DOMContentLoaded', function () {
+  document.querySelectorAll('select[data-autocomplete-url]').forEach(function (select) {
+    var search = document.createElement('input');
+    var timer = null;
+    search.type = 'search';
+    search.className = 'form-control mb-1';
+    search.placeholder = 'Начните вводить название';
+    select.parentNode.insertBefore(search, select);
+
+    function load(term) {
+      var url = select.dataset.autocompleteUrl + '?q=' + encodeURIComponent(term);
+      fetch(url, {credentials: 'same-origin'})
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+          var selected = select.value;
+          Array.from(select.options).forEach(function (option) {
+            if (option.value && option.value !== selected) {
+              option.remove();
+            }
+          });
+          data.results.forEach(function (item) {
+            if (String(item.id) !== selected) {
+              select.add(new Option(item.text, item.id));
+            }
+          });
+        });
+    }
+
+    search.addEventListener('input', function () {
+      clearTimeout(timer);
+      timer = setTimeout(function () { load(search.value); }, 250);
+    });
+    select.addEventListener('focus', function () {
+      if (select.options.length <= 2) {
+        load(search.value);
+      }
+    }, {once: true});
+  });
+});
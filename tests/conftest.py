@@ -19,6 +19,7 @@ from typing import (
 import pytest
 from django.apps import apps
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.db.models import Model, Field
 from django.forms import BaseForm
 from django.http import HttpResponse
@@ -41,6 +42,41 @@ def enable_debug_false():
         yield
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_view_buffer():
+    from blog.ranking import view_buffer
+
+    view_buffer.drain()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def slow_query_log(tmp_path_factory):
+    """Keep the slow query log of the test run out of the project."""
+    import logging
+
+    logger = logging.getLogger("blog.slow_queries")
+    handlers = logger.handlers
+    handler = logging.FileHandler(
+        tmp_path_factory.mktemp("logs") / "slow_queries.log", delay=True
+    )
+    logger.handlers = [handler]
+    yield
+    logger.handlers = handlers
+    handler.close()
+
+
+@pytest.fixture
+def shared_cache(settings):
+    """Cache shared by all processes: sessions and users are cached."""
+    settings.SHARED_CACHE = True
+    settings.SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+
+
 class SafeImportFromContextManager:
     def __init__(
             self,
@@ -0,0 +1,30 @@
+from typing import NamedTuple
+
+from django.db import connection
+from django.test.client import Client
+from django.test.utils import CaptureQueriesContext
+
+QueryBudget = NamedTuple(
+    "QueryBudget", [("anonymous", int), ("authenticated", int)]
+)
+
+
+def count_queries(client: Client, url: str):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    return response, [query["sql"] for query in queries]
+
+
+def assert_query_budget(
+        client: Client, url: str, budget: int, viewer: str
+) -> int:
+    response, queries = count_queries(client, url)
+    assert response.status_code < 500, (
+        f"Убедитесь, что страница `{url}` отображается без ошибок."
+    )
+    assert len(queries) <= budget, (
+        f"Страница `{url}` для пользователя `{viewer}` выполняет"
+        f" {len(queries)} SQL-запросов при допустимых {budget}:\n"
+        + "\n".join(queries)
+    )
+    return len(queries)
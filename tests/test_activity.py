@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.models import Comment
+from conftest import N_PER_PAGE
+
+
+@pytest.fixture
+def activity(mixer, user, another_user, published_category):
+    now = timezone.now()
+    posts = mixer.cycle(N_PER_PAGE).blend(
+        "blog.Post", author=user, category=published_category,
+        is_published=True, location=None,
+        pub_date=(now - timedelta(hours=2 * n + 1) for n in range(100)),
+        title=(f"пост {n}" for n in range(100)),
+    )
+    hidden = mixer.blend(
+        "blog.Post", author=user, category=published_category,
+        is_published=False, location=None, title="скрытый пост",
+        pub_date=now - timedelta(minutes=30),
+    )
+    target = mixer.blend(
+        "blog.Post", author=another_user, category=published_category,
+        is_published=True, location=None,
+        pub_date=now - timedelta(days=30),
+    )
+    for n in range(N_PER_PAGE):
+        comment = mixer.blend(
+            "blog.Comment", post=target, author=user, text=f"комментарий {n}"
+        )
+        Comment.objects.filter(pk=comment.pk).update(
+            created_at=now - timedelta(hours=2 * n + 2)
+        )
+    mixer.blend(
+        "blog.Comment", post=hidden, author=user, text="комментарий к скрытому"
+    )
+    return posts
+
+
+def read_activity(client, username):
+    url = reverse("blog:profile_activity", args=[username])
+    titles, cursor = [], None
+    while True:
+        response = client.get(url, {"after": cursor} if cursor else {})
+        for kind, item in response.context["activity"]:
+            titles.append(item.title if kind == "post" else item.text)
+        cursor = response.context["next_cursor"]
+        if cursor is None:
+            return titles
+
+
+@pytest.mark.django_db
+def test_activity_merges_posts_and_comments(client, user, activity):
+    expected = []
+    for n in range(N_PER_PAGE):
+        expected += [f"пост {n}", f"комментарий {n}"]
+    assert read_activity(client, user.username) == expected, (
+        "Убедитесь, что лента активности показывает посты и комментарии"
+        " пользователя вперемешку по времени, без пропусков и повторов."
+    )
+
+
+@pytest.mark.django_db
+def test_owner_sees_own_hidden_activity(user_client, user, activity):
+    titles = read_activity(user_client, user.username)
+    assert titles[:2] == ["комментарий к скрытому", "скрытый пост"]
+    assert len(titles) == 2 * N_PER_PAGE + 2
+
+
+@pytest.mark.django_db
+def test_activity_page_cost_does_not_grow(
+        client, mixer, user, published_category, activity,
+        django_assert_max_num_queries
+):
+    url = reverse("blog:profile_activity", args=[user.username])
+    client.get(url)
+    mixer.cycle(50).blend(
+        "blog.Post", author=user, category=published_category,
+        is_published=True, location=None,
+        pub_date=timezone.now() - timedelta(days=60),
+    )
+    with django_assert_max_num_queries(5):
+        response = client.get(url)
+    assert len(response.context["activity"]) == N_PER_PAGE
@@ -0,0 +1,284 @@
+import csv
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+
+from blog.cache import author_cards, get_version
+from blog.models import Post
+from blog.signals import content_changed
+
+# Запросы на удаление 1000 комментариев: выборка порции, пути предков,
+# каскады связанных таблиц, удаление и пересчёт счётчиков
+QUERIES_PER_BULK_DELETE = 25
+
+
+@pytest.mark.django_db
+def test_bulk_unpublish_sends_one_event(
+        admin_client, many_posts_with_published_locations, monkeypatch
+):
+    monkeypatch.setattr("blog.querysets.BULK_CHUNK_SIZE", 3)
+    events = []
+
+    def on_change(sender, namespaces, **kwargs):
+        events.append(set(namespaces))
+
+    content_changed.connect(on_change)
+    try:
+        admin_client.get("/")
+        response = admin_client.post("/admin/blog/post/", {
+            "action": "unpublish",
+            "_selected_action": [
+                post.pk for post in many_posts_with_published_locations
+            ],
+        })
+    finally:
+        content_changed.disconnect(on_change)
+    assert response.status_code == 302
+    assert not Post.objects.filter(is_published=True).exists(), (
+        "Убедитесь, что действие снимает с публикации все выбранные посты."
+    )
+    assert events == [{"feed", "cards", "category", "ranking"}], (
+        "Убедитесь, что пакетное действие сбрасывает кэши одним событием."
+    )
+    response = admin_client.get("/")
+    assert response.context["paginator"].count == 0, (
+        "Убедитесь, что после пакетного действия лента не берёт число"
+        " постов из устаревшего кэша."
+    )
+
+
+@pytest.mark.django_db
+def test_bulk_delete_comments(admin_client, mixer, post_with_published_location):
+    comments = mixer.cycle(5).blend(
+        "blog.Comment", post=post_with_published_location
+    )
+    response = admin_client.post("/admin/blog/comment/", {
+        "action": "delete_in_chunks",
+        "_selected_action": [comment.pk for comment in comments[:3]],
+    })
+    assert response.status_code == 302
+    assert post_with_published_location.comments.count() == 2
+
+
+@pytest.mark.django_db
+def test_export_csv_streams_joined_rows(
+        admin_client, many_posts_with_published_locations
+):
+    response = admin_client.post("/admin/blog/post/", {
+        "action": "export_csv",
+        "_selected_action": [
+            post.pk for post in many_posts_with_published_locations
+        ],
+    })
+    assert response.status_code == 200
+    assert response.streaming, (
+        "Убедитесь, что выгрузка отдаётся потоковым ответом."
+    )
+    rows = list(csv.DictReader(
+        io.StringIO(b"".join(response.streaming_content).decode())
+    ))
+    assert len(rows) == len(many_posts_with_published_locations)
+    post = many_posts_with_published_locations[0]
+    assert rows[0]["author"] == post.author.username
+    assert rows[0]["category"] == post.category.slug
+
+
+@pytest.mark.django_db
+def test_export_command_uses_single_query(
+        mixer, post_with_published_location, django_assert_num_queries
+):
+    mixer.cycle(7).blend("blog.Comment", post=post_with_published_location)
+    out = io.StringIO()
+    with django_assert_num_queries(1):
+        call_command("export_data", "comments", "--format", "jsonl",
+                     stdout=out)
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert len(rows) == 7
+    assert {row["post"] for row in rows} == {post_with_published_location.pk}
+    assert all(row["author"] for row in rows), (
+        "Убедитесь, что имя автора подставляется соединением в том же"
+        " запросе."
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("shared_cache")
+def test_username_change_refreshes_post_cards(
+        client, user, post_with_published_location
+):
+    client.get("/")
+    user.username = "renamed"
+    user.save()
+    content = client.get("/").content.decode()
+    assert "@renamed" in content and "/profile/renamed/" in content, (
+        "Убедитесь, что смена имени пользователя сбрасывает кэш карточек"
+        " постов."
+    )
+    author_version = get_version(author_cards(user.pk))
+    client.force_login(user)
+    assert get_version(author_cards(user.pk)) == author_version, (
+        "Убедитесь, что вход пользователя не сбрасывает кэш карточек."
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("shared_cache")
+def test_post_save_refreshes_only_its_card(
+        client, many_posts_with_published_locations
+):
+    edited, other = Post.objects.order_by("-pub_date")[:2]
+    client.get("/")
+    other_version = other.card_version
+    cards_version = get_version("cards")
+    edited.title = "Новый заголовок"
+    edited.save()
+    assert "Новый заголовок" in client.get("/").content.decode(), (
+        "Убедитесь, что сохранение поста сбрасывает кэш его карточки."
+    )
+    assert other.card_version == other_version, (
+        "Убедитесь, что сохранение поста не сбрасывает карточки других"
+        " постов."
+    )
+    assert get_version("cards") == cards_version, (
+        "Убедитесь, что сохранение поста не сбрасывает все карточки."
+    )
+
+
+@pytest.mark.django_db
+def test_cards_not_cached_in_process_cache(
+        client, post_with_published_location
+):
+    client.get("/")
+    # Изменение из другого процесса: сигналы этого процесса его не видят
+    Post.objects.filter(pk=post_with_published_location.pk).update(
+        title="Изменён в другом процессе"
+    )
+    assert "Изменён в другом процессе" in client.get("/").content.decode(), (
+        "Убедитесь, что без общего кэша карточки постов не кэшируются"
+        " в памяти процесса."
+    )
+
+
+@pytest.mark.django_db
+def test_bulk_delete_runs_set_based_queries(
+        mixer, user, post_with_published_location
+):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    from blog.models import Comment
+    from blog.querysets import bulk_delete
+    from blog.threads import encode
+
+    post = post_with_published_location
+    roots = mixer.cycle(10).blend("blog.Comment", post=post, author=user)
+    first_pk = Comment.objects.order_by("-pk").first().pk + 1
+    replies = []
+    for index in range(1000):
+        root, pk = roots[index % 10], first_pk + index
+        replies.append(Comment(
+            pk=pk, post=post, author=user, parent=root, text="ответ",
+            path=root.path + encode(pk), position=index // 10 + 1,
+        ))
+    Comment.objects.bulk_create(replies)
+    Comment.objects.filter(pk__in=[root.pk for root in roots]).update(
+        reply_count=100
+    )
+    keep = replies[0]
+    with CaptureQueriesContext(connection) as captured:
+        deleted = bulk_delete(Comment.objects.filter(pk__gt=keep.pk))
+    assert deleted == 999
+    assert len(captured) <= QUERIES_PER_BULK_DELETE, (
+        "Убедитесь, что пакетное удаление выполняет запросы на порцию,"
+        f" а не на строку: выполнено {len(captured)}."
+    )
+    assert sorted(
+        Comment.objects.filter(parent=None).values_list(
+            "reply_count", flat=True
+        )
+    ) == [0] * 9 + [1], (
+        "Убедитесь, что счётчики ответов пересчитаны после удаления."
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("model", ["post", "comment", "notification"])
+def test_changelist_queries_do_not_grow(
+        admin_client, mixer, user, published_category, model
+):
+    from query_budget import count_queries
+
+    def add_rows(count):
+        posts = mixer.cycle(count).blend(
+            "blog.Post", author=mixer.SELECT, category=published_category
+        )
+        for post in posts:
+            mixer.blend("blog.Comment", post=post, author=mixer.SELECT)
+
+    url = f"/admin/blog/{model}/"
+    add_rows(2)
+    admin_client.get(url)
+    _, few = count_queries(admin_client, url)
+    mixer.cycle(5).blend("auth.User")
+    add_rows(30)
+    response, many = count_queries(admin_client, url)
+    assert response.status_code == 200
+    assert len(few) == len(many), (
+        f"Убедитесь, что список `{model}` в админке загружает связанные"
+        " объекты в том же запросе (list_select_related):\n"
+        + "\n".join(many)
+    )
+
+
+@pytest.mark.django_db
+def test_estimated_count_paginator(mixer, user, monkeypatch):
+    from blog.admin import EstimatedCountPaginator
+
+    monkeypatch.setattr("blog.admin.EXACT_COUNT_LIMIT", 5)
+    posts = mixer.cycle(8).blend("blog.Post", author=user)
+    Post.objects.filter(pk__in=[post.pk for post in posts[1:4]]).delete()
+    paginator = EstimatedCountPaginator(Post.objects.order_by("pk"), 2)
+    assert paginator.count == max(post.pk for post in posts), (
+        "Убедитесь, что размер большого нефильтрованного списка"
+        " оценивается без COUNT(*)."
+    )
+    filtered = EstimatedCountPaginator(
+        Post.objects.filter(author=user).order_by("pk"), 2
+    )
+    assert filtered.count == 5, (
+        "Убедитесь, что отфильтрованный список считается точно."
+    )
+    monkeypatch.setattr("blog.admin.EXACT_COUNT_LIMIT", 100)
+    small = EstimatedCountPaginator(Post.objects.order_by("pk"), 2)
+    assert small.count == 5, (
+        "Убедитесь, что небольшая таблица считается точно."
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("model", ["post", "comment"])
+def test_change_form_does_not_list_related_rows(
+        admin_client, mixer, post_with_published_location, model
+):
+    from query_budget import count_queries
+
+    comment = mixer.blend(
+        "blog.Comment", post=post_with_published_location,
+        author=mixer.SELECT,
+    )
+    obj = post_with_published_location if model == "post" else comment
+    url = f"/admin/blog/{model}/{obj.pk}/change/"
+    admin_client.get(url)
+    response, few = count_queries(admin_client, url)
+    options = response.content.decode().count("<option")
+    mixer.cycle(20).blend("auth.User")
+    mixer.cycle(20).blend("blog.Post", author=mixer.SELECT)
+    response, many = count_queries(admin_client, url)
+    assert response.status_code == 200
+    assert response.content.decode().count("<option") == options, (
+        "Убедитесь, что связанные поля формы в админке — raw_id или"
+        " автодополнение, а не список всех строк."
+    )
+    assert len(few) == len(many), "\n".join(many)
@@ -0,0 +1,135 @@
+import pytest
+from django.contrib.auth.hashers import check_password, make_password
+from django.urls import reverse
+
+from blog.hashers import (
+    MIN_PBKDF2_ITERATIONS, MIN_SCRYPT_WORK_FACTOR, calibrate, needs_rehash
+)
+
+
+@pytest.fixture
+def weak_hash_user(django_user_model):
+    return django_user_model.objects.create(
+        username="weak",
+        password=make_password("weak-password-1", hasher="pbkdf2_sha1"),
+    )
+
+
+@pytest.mark.django_db
+def test_login_rehashes_outdated_password(
+        client, weak_hash_user, settings, monkeypatch
+):
+    settings.PASSWORD_REHASH_WORKERS = 0
+    settings.PASSWORD_PBKDF2_ITERATIONS = 1000
+    scheduled = []
+    monkeypatch.setattr(
+        "blog.backends.schedule_rehash",
+        lambda user, raw, session: scheduled.append(user.pk),
+    )
+    response = client.post(
+        reverse("login"),
+        {"username": "weak", "password": "weak-password-1"},
+    )
+    assert response.status_code == 302
+    assert scheduled == [weak_hash_user.pk], (
+        "Убедитесь, что устаревший хеш пароля передаётся на фоновое"
+        " перехеширование, а не обновляется в потоке входа."
+    )
+    weak_hash_user.refresh_from_db()
+    assert weak_hash_user.password.startswith("pbkdf2_sha1$")
+
+
+@pytest.mark.django_db
+def test_rehash_applies_current_policy(client, weak_hash_user, settings):
+    settings.PASSWORD_REHASH_WORKERS = 0
+    settings.PASSWORD_PBKDF2_ITERATIONS = 1000
+    assert not client.login(username="weak", password="wrong-password")
+    assert client.login(username="weak", password="weak-password-1")
+    weak_hash_user.refresh_from_db()
+    assert weak_hash_user.password.startswith("pbkdf2_sha256$1000$"), (
+        "Убедитесь, что после входа хеш обновляется по текущей политике."
+    )
+    response = client.get(reverse("blog:edit_profile"))
+    assert response.status_code == 200, (
+        "Убедитесь, что смена хеша не завершает сессию, в которой выполнен"
+        " вход."
+    )
+    assert client.login(username="weak", password="weak-password-1")
+
+
+def test_calibrate_pbkdf2_respects_minimum():
+    cost, measurements = calibrate("pbkdf2_sha256", target_ms=1, rounds=1)
+    assert cost == MIN_PBKDF2_ITERATIONS
+    assert measurements[-1][0] == cost
+
+
+def test_scrypt_hasher(settings):
+    encoded = make_password("scrypt-password-1", hasher="scrypt")
+    assert encoded.startswith(f"scrypt${MIN_SCRYPT_WORK_FACTOR}$")
+    assert check_password("scrypt-password-1", encoded)
+    assert not check_password("wrong-password", encoded)
+    assert needs_rehash(encoded), (
+        "Убедитесь, что хеш scrypt перехешируется, пока политика — PBKDF2."
+    )
+    settings.PASSWORD_HASHERS = [
+        "blog.hashers.CalibratedScryptPasswordHasher"
+    ]
+    assert not needs_rehash(encoded)
+    settings.PASSWORD_SCRYPT_WORK_FACTOR = 2 * MIN_SCRYPT_WORK_FACTOR
+    assert needs_rehash(encoded), (
+        "Убедитесь, что хеш scrypt со старым N перехешируется."
+    )
+
+
+def test_calibrate_scrypt_steps_powers_of_two():
+    cost, measurements = calibrate("scrypt", target_ms=1, rounds=1)
+    assert cost == MIN_SCRYPT_WORK_FACTOR
+    assert [measured for measured, _ in measurements] == [cost]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_background_rehash_keeps_login_session(
+        client, weak_hash_user, settings
+):
+    from blog import backends
+
+    settings.PASSWORD_REHASH_WORKERS = 2
+    settings.PASSWORD_PBKDF2_ITERATIONS = 1000
+    response = client.post(
+        reverse("login"),
+        {"username": "weak", "password": "weak-password-1"},
+    )
+    assert response.status_code == 302
+    backends.get_executor().shutdown(wait=True)
+    backends._executor = None
+    weak_hash_user.refresh_from_db()
+    assert weak_hash_user.password.startswith("pbkdf2_sha256$1000$")
+    response = client.get(reverse("blog:edit_profile"))
+    assert response.status_code == 200, (
+        "Убедитесь, что фоновая смена хеша не завершает сессию, в которой"
+        " выполнен вход."
+    )
+    assert backends.REHASH_SALT_SESSION_KEY not in client.session
+
+
+@pytest.mark.django_db
+def test_rehash_does_not_keep_changed_password_session(
+        client, weak_hash_user, settings, monkeypatch
+):
+    settings.PASSWORD_REHASH_WORKERS = 2
+    settings.PASSWORD_PBKDF2_ITERATIONS = 1000
+    monkeypatch.setattr(
+        "blog.backends.get_executor",
+        lambda: type("Executor", (), {"submit": lambda *args: None})(),
+    )
+    client.post(
+        reverse("login"),
+        {"username": "weak", "password": "weak-password-1"},
+    )
+    weak_hash_user.set_password("changed-password-2")
+    weak_hash_user.save()
+    response = client.get(reverse("blog:edit_profile"))
+    assert response.status_code == 302, (
+        "Убедитесь, что пароль, сменённый не перехешированием, завершает"
+        " сессию."
+    )
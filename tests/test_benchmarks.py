@@ -0,0 +1,28 @@
+from http import HTTPStatus
+
+import pytest
+
+from blog import benchmarks, datagen
+
+
+@pytest.mark.django_db
+def test_benchmark_report():
+    datagen.generate(profile='tiny', seed=1, scale=0.5)
+    report = benchmarks.run_scenarios(iterations=2, warmup=0)
+    assert set(report) == set(benchmarks.SCENARIOS), (
+        "Убедитесь, что бенчмарк прогоняет все сценарии."
+    )
+    for name, result in report.items():
+        assert result['status'] in (HTTPStatus.OK, HTTPStatus.FOUND), (
+            f"Убедитесь, что сценарий `{name}` выполняется без ошибок."
+        )
+        assert result['p50_ms'] <= result['p95_ms']
+        assert result['queries'] > 0
+
+
+def test_benchmark_compare():
+    baseline = {'tiny': {'index': {'p95_ms': 10.0, 'queries': 2}}}
+    report = {'tiny': {'index': {'p95_ms': 11.0, 'queries': 2}}}
+    assert not benchmarks.compare(report, baseline, tolerance=0.25)
+    report = {'tiny': {'index': {'p95_ms': 20.0, 'queries': 3}}}
+    assert len(benchmarks.compare(report, baseline, tolerance=0.25)) == 2
@@ -0,0 +1,155 @@
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.models import Category, Post
+from blog.querysets import (
+    bulk_delete, bulk_set_published, get_published_posts
+)
+
+
+def make_category(slug, parent=None, is_published=True):
+    return Category.objects.create(
+        title=slug, description=slug, slug=slug,
+        parent=parent, is_published=is_published,
+    )
+
+
+@pytest.fixture
+def tree():
+    travel = make_category("travel")
+    mountains = make_category("mountains", parent=travel)
+    alps = make_category("alps", parent=mountains)
+    food = make_category("food")
+    seas = make_category("seas", parent=travel)
+    return {
+        category.slug: category
+        for category in (travel, mountains, alps, food, seas)
+    }
+
+
+@pytest.fixture
+def tree_posts(mixer, user, tree):
+    return {
+        slug: mixer.blend(
+            "blog.Post", title=slug, author=user, category=category,
+            is_published=True, location=None,
+            pub_date=timezone.now() - timedelta(hours=1),
+        )
+        for slug, category in tree.items()
+    }
+
+
+def published_titles():
+    return set(get_published_posts().values_list("title", flat=True))
+
+
+def bounds():
+    return {
+        category.slug: (category.lft, category.rgt, category.depth)
+        for category in Category.objects.all()
+    }
+
+
+@pytest.mark.django_db
+def test_nested_set_bounds(tree):
+    assert bounds() == {
+        "travel": (1, 8, 0),
+        "mountains": (2, 5, 1),
+        "alps": (3, 4, 2),
+        "seas": (6, 7, 1),
+        "food": (9, 10, 0),
+    }
+    assert set(
+        Category.objects.get(slug="travel")
+        .get_descendants(include_self=False)
+        .values_list("slug", flat=True)
+    ) == {"mountains", "alps", "seas"}
+
+
+@pytest.mark.django_db
+def test_category_page_includes_descendants(client, tree_posts):
+    response = client.get(reverse("blog:category_posts", args=["travel"]))
+    titles = {post.title for post in response.context["page_obj"]}
+    assert titles == {"travel", "mountains", "alps", "seas"}, (
+        "Убедитесь, что страница категории показывает посты"
+        " всех её подкатегорий."
+    )
+    assert [
+        category.slug for category in response.context["subcategories"]
+    ] == ["mountains", "seas"]
+
+
+@pytest.mark.django_db
+def test_unpublished_parent_hides_descendants(client, tree, tree_posts):
+    travel = Category.objects.get(slug="travel")
+    travel.is_published = False
+    travel.save()
+    assert published_titles() == {"food"}, (
+        "Убедитесь, что снятая с публикации категория скрывает посты"
+        " всех своих подкатегорий."
+    )
+    url = reverse("blog:category_posts", args=["alps"])
+    assert client.get(url).status_code == 404
+    post_url = reverse("blog:post_detail", args=[tree_posts["alps"].id])
+    assert client.get(post_url).status_code == 404
+
+    mountains = Category.objects.get(slug="mountains")
+    mountains.is_published = False
+    mountains.save()
+    travel.is_published = True
+    travel.save()
+    assert published_titles() == {"food", "travel", "seas"}
+
+
+@pytest.mark.django_db
+def test_tree_kept_consistent_on_move_delete_and_bulk_update(
+        tree, tree_posts
+):
+    # Устаревший объект не должен затереть границы дерева
+    stale_travel = tree["travel"]
+    make_category("rivers", parent=tree["travel"])
+    stale_travel.title = "Путешествия"
+    stale_travel.save()
+    assert bounds()["travel"] == (1, 10, 0)
+
+    alps = Category.objects.get(slug="alps")
+    alps.parent = Category.objects.get(slug="food")
+    alps.save()
+    assert bounds()["alps"][2] == 1
+    assert set(
+        Category.objects.get(slug="food").get_descendants()
+        .values_list("slug", flat=True)
+    ) == {"food", "alps"}
+
+    bulk_set_published(Category.objects.filter(slug="food"), False)
+    assert published_titles() == {"travel", "mountains", "seas"}
+
+    Category.objects.get(slug="food").delete()
+    assert bounds()["alps"][2] == 0
+    assert "alps" in published_titles()
+    assert Post.objects.count() == 5
+
+
+@pytest.mark.django_db
+def test_bulk_delete_rebuilds_tree_once(tree, monkeypatch):
+    from blog import categories
+
+    calls = []
+    rebuild = categories.rebuild
+
+    def counting_rebuild():
+        calls.append(1)
+        rebuild()
+
+    monkeypatch.setattr(categories, "rebuild", counting_rebuild)
+    bulk_delete(Category.objects.filter(slug__in=["mountains", "food"]))
+    assert len(calls) == 1, (
+        "Убедитесь, что пакетное удаление категорий перестраивает дерево"
+        " один раз."
+    )
+    assert bounds() == {
+        "travel": (1, 4, 0), "seas": (2, 3, 1), "alps": (5, 6, 0)
+    }
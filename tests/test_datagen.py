@@ -0,0 +1,50 @@
+from collections import Counter
+from datetime import timedelta
+
+import pytest
+from django.db.models import F, Max, Min
+
+from blog import datagen
+from blog.models import Category, Comment, Location, Post, User
+
+
+@pytest.mark.django_db
+def test_generate_tiny_profile():
+    sizes = datagen.generate(profile="tiny", seed=1, scale=0.5)
+    assert {
+        "users": User.objects.count(),
+        "categories": Category.objects.count(),
+        "locations": Location.objects.count(),
+        "posts": Post.objects.count(),
+        "comments": Comment.objects.count(),
+    } == sizes, "Убедитесь, что генератор создаёт наборы заданных размеров."
+    authors = Counter(Post.objects.values_list("author_id", flat=True))
+    assert authors.most_common(1)[0][1] > 3 * sizes["posts"] / sizes["users"], (
+        "Убедитесь, что авторы постов распределены неравномерно."
+    )
+    for model in (Post, Comment):
+        dates = model.objects.aggregate(
+            first=Min("created_at"), last=Max("created_at")
+        )
+        assert dates["last"] - dates["first"] > timedelta(days=30), (
+            "Убедитесь, что даты создания постов и комментариев разнесены"
+            " по истории, а не совпадают с моментом вставки."
+        )
+    assert not Comment.objects.filter(
+        created_at__lt=F("post__created_at")
+    ).exists(), (
+        "Убедитесь, что комментарий не старше своего поста."
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_snapshot_restore_round_trip(tmp_path):
+    datagen.generate(profile="tiny", seed=1, scale=0.1)
+    posts = Post.objects.count()
+    path = tmp_path / "tiny.sqlite3"
+    datagen.snapshot(path)
+    Post.objects.all().delete()
+    datagen.restore(path)
+    assert Post.objects.count() == posts, (
+        "Убедитесь, что восстановление из снимка возвращает данные."
+    )
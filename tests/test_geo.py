@@ -0,0 +1,133 @@
+import math
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.geo import (
+    EARTH_RADIUS_KM, RTREE_TABLE, haversine, nearby_locations, rebuild_index
+)
+from blog.models import Location
+
+
+def indexed_ids():
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT id FROM {RTREE_TABLE} ORDER BY id")
+        return [row[0] for row in cursor.fetchall()]
+
+
+@pytest.fixture
+def places(mixer):
+    coordinates = {
+        "center": (55.7558, 37.6173),
+        "three_km": (55.7828, 37.6173),
+        "thirty_km": (56.0256, 37.6173),
+        "hidden": (55.7600, 37.6200),
+    }
+    return {
+        name: mixer.blend(
+            "blog.Location", name=name, latitude=lat, longitude=lon,
+            is_published=name != "hidden",
+        )
+        for name, (lat, lon) in coordinates.items()
+    }
+
+
+def test_haversine():
+    assert haversine(55.7558, 37.6173, 59.9386, 30.3141) == pytest.approx(
+        634, abs=2
+    )
+
+
+@pytest.mark.django_db
+def test_rtree_follows_location_saves(places):
+    center = places["center"]
+    assert indexed_ids() == sorted(place.pk for place in places.values())
+    center.latitude = center.longitude = None
+    center.save()
+    assert center.pk not in indexed_ids()
+    places["three_km"].delete()
+    assert len(indexed_ids()) == 2
+    Location.objects.filter(pk=center.pk).update(latitude=1, longitude=1)
+    assert rebuild_index() == 3
+    assert center.pk in indexed_ids()
+
+
+@pytest.mark.django_db
+def test_nearby_locations_refines_radius(places, mixer):
+    distances = nearby_locations(55.7558, 37.6173, 10)
+    assert set(distances) == {
+        places["center"].pk, places["three_km"].pk, places["hidden"].pk
+    }
+    assert distances[places["three_km"].pk] == pytest.approx(3, abs=0.1)
+    date_line = mixer.blend(
+        "blog.Location", latitude=0, longitude=179.95
+    )
+    assert list(nearby_locations(0, -179.95, 20)) == [date_line.pk], (
+        "Убедитесь, что поиск рядом работает через линию перемены дат."
+    )
+
+
+@pytest.mark.django_db
+def test_nearby_locations_includes_eastern_edge(mixer):
+    # Самая восточная точка круга радиусом почти 1000 км вокруг (60, 0):
+    # она севернее центра и восточнее, чем r / (R * cos(широты))
+    distance = 999.9 / EARTH_RADIUS_KM
+    edge = mixer.blend(
+        "blog.Location",
+        latitude=math.degrees(
+            math.asin(math.sin(math.radians(60)) / math.cos(distance))
+        ),
+        longitude=math.degrees(
+            math.asin(math.sin(distance) / math.cos(math.radians(60)))
+        ),
+    )
+    assert haversine(60, 0, edge.latitude, edge.longitude) < 1000
+    assert edge.pk in nearby_locations(60, 0, 1000), (
+        "Убедитесь, что прямоугольник поиска покрывает крайние по долготе"
+        " точки круга."
+    )
+
+
+@pytest.mark.django_db
+def test_nearby_page(client, mixer, user, published_category, places):
+    posts = {
+        name: mixer.blend(
+            "blog.Post", title=name, author=user, location=place,
+            category=published_category, is_published=True,
+            pub_date=timezone.now() - timedelta(hours=1),
+        )
+        for name, place in places.items()
+    }
+    posts["center"].is_published = False
+    posts["center"].save()
+    mixer.blend(
+        "blog.Post", title="center again", author=user,
+        location=places["center"], category=published_category,
+        is_published=True, pub_date=timezone.now() - timedelta(hours=2),
+    )
+    response = client.get(
+        reverse("blog:nearby_posts"),
+        {"lat": 55.7558, "lon": 37.6173, "radius": 10},
+    )
+    page = response.context["page_obj"]
+    assert [post.title for post in page] == ["three_km", "center again"], (
+        "Убедитесь, что на странице постов рядом показаны только"
+        " опубликованные посты из опубликованных мест в радиусе."
+    )
+    assert page[0].distance == pytest.approx(3, abs=0.1)
+    assert client.get(
+        reverse("blog:nearby_posts"), {"lat": 100, "lon": 0}
+    ).context.get("page_obj") is None
+
+
+@pytest.mark.django_db
+def test_bulk_delete_unindexes_locations(places):
+    from blog.querysets import bulk_delete
+
+    bulk_delete(Location.objects.filter(name__in=["center", "hidden"]))
+    assert indexed_ids() == sorted(
+        places[name].pk for name in ("three_km", "thirty_km")
+    ), "Убедитесь, что пакетное удаление убирает места из индекса."
@@ -0,0 +1,239 @@
+import io
+import json
+
+import pytest
+from django.test import override_settings
+
+
+@pytest.mark.django_db
+@override_settings(REQUEST_TIMING_SAMPLE_RATE=1)
+def test_server_timing_header(
+        client, user_client, user, post_with_published_location
+):
+    assert "Server-Timing" not in client.get("/"), (
+        "Убедитесь, что заголовок `Server-Timing` не виден посетителям."
+    )
+    user.is_staff = True
+    user.save()
+    response = user_client.get("/")
+    header = response.get("Server-Timing", "")
+    for metric in ("db;dur=", "tpl;dur=", "app;dur=", "total;dur="):
+        assert metric in header, (
+            "Убедитесь, что в заголовке `Server-Timing` есть метрика"
+            f" `{metric.split(';')[0]}`."
+        )
+
+
+def test_profiling_sample_rate_shared_through_file(tmp_path, monkeypatch):
+    from blog import profiling
+
+    with override_settings(PROFILING_DIR=tmp_path, PROFILING_SAMPLE_RATE=0):
+        profiling.set_sample_rate(0.25)
+        assert (tmp_path / profiling.SAMPLE_RATE_FILE).read_text() == "0.25"
+        # Другой процесс: своя копия доли ещё не прочитана
+        monkeypatch.setattr(
+            profiling, "_sample_rate", {"value": None, "expires": 0.0}
+        )
+        assert profiling.get_sample_rate() == 0.25, (
+            "Убедитесь, что доля профилируемых запросов доходит до всех"
+            " процессов."
+        )
+        profiling.set_sample_rate(0)
+
+
+@pytest.mark.django_db
+@override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+def test_server_timing_sampling(client):
+    response = client.get("/")
+    assert "Server-Timing" not in response, (
+        "Убедитесь, что запросы вне выборки не замеряются."
+    )
+
+
+@pytest.mark.django_db
+def test_signed_profiling_flag(client, admin_client, admin_user, tmp_path):
+    from blog.profiling import sign_modes
+
+    token = sign_modes(["cprofile", "tracemalloc"], "/", admin_user.pk)
+    with override_settings(PROFILING_DIR=tmp_path):
+        response = admin_client.get("/", {"_profile": token})
+        assert response.status_code == 200
+        suffixes = sorted(path.suffix for path in tmp_path.iterdir())
+        assert suffixes == [".prof", ".txt"], (
+            "Убедитесь, что подписанный флаг сохраняет профиль cProfile"
+            " и сводку tracemalloc."
+        )
+        assert response["X-Profile"]
+        admin_client.get("/", {"_profile": "forged"})
+        admin_client.get("/about/", {"_profile": token})
+        response = client.get("/", {"_profile": token})
+        assert "X-Profile" not in response, (
+            "Убедитесь, что имена файлов профиля не отдаются посторонним."
+        )
+        assert len(list(tmp_path.iterdir())) == 2, (
+            "Убедитесь, что флаг без верной подписи, для другой страницы"
+            " или чужого пользователя игнорируется."
+        )
+
+
+@pytest.mark.django_db
+def test_sampled_profile_header_only_for_staff(
+        client, admin_client, tmp_path, monkeypatch
+):
+    from blog import profiling
+
+    monkeypatch.setattr(
+        profiling, "_sample_rate", {"value": None, "expires": 0.0}
+    )
+    with override_settings(
+        PROFILING_DIR=tmp_path, PROFILING_SAMPLE_RATE=1
+    ):
+        assert "X-Profile" not in client.get("/"), (
+            "Убедитесь, что заголовок X-Profile не отдаётся анонимам."
+        )
+        assert admin_client.get("/")["X-Profile"]
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint(client, post_with_published_location, settings):
+    client.get("/")
+    assert client.get("/metrics/").status_code == 404, (
+        "Убедитесь, что без токена метрики закрыты вне режима отладки."
+    )
+    settings.METRICS_TOKEN = "secret"
+    assert client.get("/metrics/").status_code == 403
+    body = client.get(
+        "/metrics/", HTTP_AUTHORIZATION="Bearer secret"
+    ).content.decode()
+    for sample in (
+        'blog_requests_total{method="GET",status="200",'
+        'url_name="blog:index"}',
+        "blog_request_duration_seconds_bucket",
+        "blog_db_queries_total",
+        'blog_published_posts_rows_count{} ',
+    ):
+        assert sample.replace("{} ", " ") in body, (
+            f"Убедитесь, что страница метрик содержит `{sample}`."
+        )
+
+
+def test_metrics_shared_directory(tmp_path):
+    from blog.metrics import Registry
+
+    with override_settings(METRICS_DIR=tmp_path):
+        registry = Registry()
+        for _ in range(3):
+            registry.inc("blog_db_queries_total", url_name="blog:index")
+        registry.inc("blog_db_queries_total", url_name="x" * 70000)
+        assert "blog_db_queries_total" in Registry().render()
+        assert (
+            'blog_db_queries_total{url_name="blog:index"} 3'
+            in Registry().render()
+        ), (
+            "Убедитесь, что значения метрик читаются из общего каталога."
+        )
+
+
+def test_metrics_of_finished_threads_are_kept(tmp_path):
+    import threading
+
+    from blog.metrics import Registry
+
+    with override_settings(METRICS_DIR=None):
+        registry = Registry()
+        for _ in range(3):
+            thread = threading.Thread(
+                target=registry.inc, args=("blog_db_queries_total",)
+            )
+            thread.start()
+            thread.join()
+        registry.inc("blog_db_queries_total")
+        assert len(registry.threads) == 1, (
+            "Убедитесь, что значения завершившихся потоков не копятся"
+            " по отдельности."
+        )
+        assert "blog_db_queries_total 4" in registry.render()
+    with override_settings(METRICS_DIR=tmp_path):
+        registry = Registry()
+        thread = threading.Thread(
+            target=registry.inc, args=("blog_db_queries_total",)
+        )
+        thread.start()
+        thread.join()
+        store = registry.threads[0][2]
+        registry.inc("blog_db_queries_total")
+        assert store.map.closed, (
+            "Убедитесь, что файл значений завершившегося потока закрывается."
+        )
+        assert "blog_db_queries_total 2" in registry.render()
+
+
+@pytest.mark.django_db
+def test_slow_query_log(client, post_with_published_location, tmp_path):
+    import logging
+
+    from django.core.management import call_command
+
+    log = tmp_path / "slow_queries.log"
+    logger = logging.getLogger("blog.slow_queries")
+    handlers = logger.handlers
+    handler = logging.FileHandler(log, encoding="utf-8")
+    # Журнал пишется во временный каталог, а не в файл проекта
+    logger.handlers = [handler]
+    try:
+        with override_settings(SLOW_QUERY_THRESHOLD_MS=0):
+            client.get("/")
+    finally:
+        logger.handlers = handlers
+        handler.close()
+    records = [
+        json.loads(line)
+        for line in log.read_text(encoding="utf-8").splitlines()
+    ]
+    index_queries = [
+        record for record in records if record["url_name"] == "blog:index"
+    ]
+    assert index_queries, (
+        "Убедитесь, что медленные запросы записываются с именем маршрута."
+    )
+    assert any(record["plan"] for record in index_queries), (
+        "Убедитесь, что для медленных SELECT сохраняется план выполнения."
+    )
+    out = io.StringIO()
+    call_command("slow_queries", log=str(log), stdout=out)
+    assert "blog:index" in out.getvalue()
+
+
+@pytest.mark.django_db
+def test_nplusone_detector(mixer, post_with_published_location):
+    from django.template import Context, Template
+
+    from blog.instrumentation import NPlusOneDetector, NPlusOneError
+    from blog.models import Comment
+
+    mixer.cycle(3).blend("blog.Comment", post=post_with_published_location)
+    template = Template(
+        "{% for comment in comments %}"
+        "{{ comment.author.username }}"
+        "{% endfor %}"
+    )
+    with override_settings(NPLUSONE_RAISE=True):
+        with NPlusOneDetector(threshold=3) as detector:
+            template.render(Context({"comments": Comment.objects.all()}))
+        with pytest.raises(NPlusOneError, match=r":1: SELECT"):
+            detector.report()
+
+
+@pytest.mark.django_db
+@override_settings(NPLUSONE_ENABLED=True, NPLUSONE_RAISE=True)
+def test_no_nplusone_on_pages(
+        mixer, user, user_client, post_with_published_location,
+        many_posts_with_published_locations,
+):
+    post = post_with_published_location
+    mixer.cycle(5).blend("blog.Comment", post=post, author=user)
+    for url in (
+        "/", f"/posts/{post.id}/", f"/profile/{user.username}/",
+        f"/category/{post.category.slug}/",
+    ):
+        user_client.get(url)
@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from blog import loadtest
+from blog.loadtest import Sample, parse_mix, summarize
+
+
+def test_parse_mix():
+    assert parse_mix("feed=60,detail=30,comment=5,login=5") == (
+        loadtest.DEFAULT_MIX
+    )
+    assert parse_mix("detail=1") == {"detail": 1}
+    with pytest.raises(ValueError):
+        parse_mix("feed=60,unknown=1")
+    with pytest.raises(ValueError):
+        parse_mix("feed=много")
+
+
+def test_summarize_percentiles_and_errors():
+    samples = [
+        Sample("feed", 200, float(latency), (), 0, 0.0, None)
+        for latency in range(1, 101)
+    ] + [
+        Sample("detail", 599, 3.0, (2.0, 60.0), 1, 60.0, "OperationalError"),
+        Sample("detail", 404, 700.0, (), 0, 0.0, None),
+    ]
+    report = summarize(samples, elapsed=2.0)
+    feed = report["actions"]["feed"]
+    assert (feed["p50_ms"], feed["p95_ms"], feed["p99_ms"]) == (
+        51.0, 95.0, 99.0
+    )
+    assert feed["error_rate"] == 0
+    assert report["actions"]["detail"]["error_rate"] == 1
+    assert report["requests"] == 102
+    assert report["throughput_rps"] == 51
+    assert report["error_rate"] == round(2 / 102, 4)
+    assert report["slow_writes"] == 1 and report["locked_errors"] == 1
+    assert report["writes"]["count"] == 2
+    assert report["writes"]["total_ms"] == 62.0
+    assert report["locked_wait_ms"] == 60.0, (
+        "Убедитесь, что отчёт суммирует время ожидания блокировки."
+    )
+    assert report["exceptions"] == {"OperationalError": 1}, (
+        "Убедитесь, что отчёт считает исключения по типам."
+    )
+    assert sum(report["histogram"].values()) == 102
+    assert report["histogram"]["<=1000ms"] == 1
+
+
+def test_summarize_empty():
+    report = summarize([], elapsed=0)
+    assert report["requests"] == 0 and report["error_rate"] == 0
+    assert report["writes"]["p95_ms"] == 0
+
+
+def test_write_stats_times_each_write_attempt():
+    from django.db import OperationalError
+
+    counter = loadtest.WriteStatsCounter()
+
+    def execute(sql, params, many, context):
+        time.sleep(0.01)
+        if sql.startswith("INSERT"):
+            raise OperationalError("database is locked")
+
+    counter(execute, "SELECT 1", None, False, {})
+    counter(execute, "UPDATE blog_post SET title = 1", None, False, {})
+    with pytest.raises(OperationalError):
+        counter(execute, "INSERT INTO blog_post DEFAULT VALUES", None, False,
+                {})
+    assert len(counter.write_times) == 2, (
+        "Убедитесь, что замеряются только попытки записи."
+    )
+    assert all(elapsed >= 10 for elapsed in counter.write_times)
+    assert counter.locked == 1
+    assert counter.locked_ms == counter.write_times[-1], (
+        "Убедитесь, что время попытки, не дождавшейся блокировки,"
+        " учитывается как ожидание."
+    )
+
+
+def test_worker_records_exception_type(monkeypatch, caplog):
+    def fail(self):
+        raise RuntimeError("сбой")
+
+    monkeypatch.setattr(loadtest.VirtualUser, "feed", fail)
+    samples = loadtest.run_worker(
+        0, requests=3, mix={"feed": 1}, host="testserver",
+        targets={"post_ids": [], "usernames": []}, seed=0,
+    )
+    assert [sample.error for sample in samples] == ["RuntimeError"] * 3
+    assert all(sample.status == 599 for sample in samples)
+    logged = [
+        record for record in caplog.records if record.name == "blog.loadtest"
+    ]
+    assert len(logged) == 1 and logged[0].exc_info, (
+        "Убедитесь, что исключение в нагрузочном запросе попадает в лог."
+    )
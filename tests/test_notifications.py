@@ -0,0 +1,92 @@
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+from blog.models import Notification, NotificationSettings
+
+
+@pytest.fixture
+def commented_post(mixer, user, published_category):
+    return mixer.blend(
+        "blog.Post", author=user, category=published_category,
+        is_published=True,
+    )
+
+
+@pytest.mark.django_db
+def test_comment_records_notifications(
+        another_user_client, another_user, user, commented_post, mixer
+):
+    another_user_client.post(
+        reverse("blog:add_comment", args=[commented_post.id]),
+        {"text": "Первый"},
+    )
+    notification = Notification.objects.get()
+    assert (
+        notification.recipient, notification.actor, notification.reason
+    ) == (user, another_user, "comment"), (
+        "Убедитесь, что автор поста получает уведомление о комментарии."
+    )
+
+    own = mixer.blend("blog.Comment", post=commented_post, author=user)
+    assert Notification.objects.count() == 1, (
+        "Убедитесь, что о своих комментариях уведомления не создаются."
+    )
+    another_user_client.post(
+        reverse("blog:reply_comment", args=[commented_post.id, own.id]),
+        {"text": "Ответ"},
+    )
+    assert Notification.objects.filter(reason="reply").count() == 1, (
+        "Убедитесь, что автор комментария и поста получает одно"
+        " уведомление об ответе."
+    )
+
+
+@pytest.mark.django_db
+def test_notification_page_and_read(
+        user_client, user, another_user, commented_post, mixer
+):
+    mixer.cycle(3).blend(
+        "blog.Comment", post=commented_post, author=another_user
+    )
+    url = reverse("blog:notifications")
+    response = user_client.get(url)
+    assert len(response.context["notifications"]) == 3
+    user_client.post(reverse("blog:read_notifications"))
+    assert not user.notifications.filter(is_read=False).exists(), (
+        "Убедитесь, что уведомления можно отметить прочитанными."
+    )
+    user_client.post(url, {"digest": "weekly"})
+    assert NotificationSettings.objects.get(user=user).digest == "weekly"
+
+
+@pytest.mark.django_db
+def test_digest_groups_events_per_recipient(
+        mixer, user, another_user, commented_post, published_category,
+        mailoutbox
+):
+    user.email, another_user.email = "user@example.com", "other@example.com"
+    user.save()
+    another_user.save()
+    other_post = mixer.blend(
+        "blog.Post", author=another_user, category=published_category
+    )
+    mixer.cycle(5).blend(
+        "blog.Comment", post=commented_post, author=another_user
+    )
+    mixer.cycle(2).blend("blog.Comment", post=other_post, author=user)
+    NotificationSettings.objects.create(user=another_user, digest="weekly")
+
+    call_command("send_digests", "--frequency", "daily", "--workers", "2")
+    assert [message.to for message in mailoutbox] == [["user@example.com"]], (
+        "Убедитесь, что ежедневный дайджест получает одно письмо на"
+        " получателя и не затрагивает еженедельных получателей."
+    )
+    assert "5" in mailoutbox[0].subject
+    call_command("send_digests", "--frequency", "daily")
+    assert len(mailoutbox) == 1, (
+        "Убедитесь, что события попадают в дайджест один раз."
+    )
+    call_command("send_digests", "--frequency", "weekly", "--workers", "0")
+    assert mailoutbox[1].to == ["other@example.com"]
+    assert not Notification.objects.filter(digested_at__isnull=True).exists()
@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+import pytest
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives, send_mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.utils import timezone
+
+from blog.models import OutboxMessage
+
+
+@pytest.fixture
+def outbox_settings(settings):
+    settings.EMAIL_BACKEND = "blog.mail.OutboxEmailBackend"
+    settings.OUTBOX_DELIVERY_BACKEND = (
+        "django.core.mail.backends.locmem.EmailBackend"
+    )
+    return settings
+
+
+@pytest.mark.django_db
+def test_mail_is_queued_and_delivered(outbox_settings, monkeypatch):
+    opened = []
+    monkeypatch.setattr(
+        EmailBackend, "open", lambda self: opened.append(self)
+    )
+    message = EmailMultiAlternatives(
+        "Тема", "Текст", "from@example.com", ["to@example.com"]
+    )
+    message.attach_alternative("<p>Текст</p>", "text/html")
+    message.attach("notes.txt", "вложение", "text/plain")
+    message.send()
+    send_mail("Вторая", "Текст", "from@example.com", ["to@example.com"])
+    assert not mail.outbox, (
+        "Убедитесь, что письма не отправляются в потоке запроса."
+    )
+    assert OutboxMessage.objects.count() == 2
+
+    call_command("send_outbox")
+    assert [message.subject for message in mail.outbox] == [
+        "Тема", "Вторая"
+    ]
+    assert len(opened) == 1, (
+        "Убедитесь, что порция писем отправляется через одно соединение."
+    )
+    assert mail.outbox[0].alternatives == [("<p>Текст</p>", "text/html")]
+    assert mail.outbox[0].attachments[0][0] == "notes.txt"
+    assert not OutboxMessage.objects.filter(sent_at__isnull=True).exists()
+
+
+@pytest.mark.django_db
+def test_failed_delivery_is_retried_with_backoff(
+        outbox_settings, monkeypatch
+):
+    send_mail("Тема", "Текст", "from@example.com", ["to@example.com"])
+
+    def fail(self, messages):
+        raise ConnectionError("сервер недоступен")
+
+    monkeypatch.setattr(EmailBackend, "send_messages", fail)
+    call_command("send_outbox")
+    queued = OutboxMessage.objects.get()
+    assert queued.attempts == 1
+    assert queued.sent_at is None
+    assert "сервер недоступен" in queued.last_error
+    delay = queued.available_at - timezone.now()
+    assert timedelta(seconds=20) < delay <= timedelta(
+        seconds=outbox_settings.OUTBOX_RETRY_BASE
+    )
+
+    monkeypatch.undo()
+    call_command("send_outbox")
+    assert not mail.outbox, "Убедитесь, что повтор ждёт своей очереди."
+    OutboxMessage.objects.update(available_at=timezone.now())
+    call_command("send_outbox")
+    assert len(mail.outbox) == 1
@@ -0,0 +1,300 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.hashers import make_password
+from django.core.cache.backends.locmem import LocMemCache
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.ranking import record, update_scores
+from blog.tags import set_post_tags
+from conftest import N_PER_PAGE
+from query_budget import QueryBudget, assert_query_budget, count_queries
+
+QUERY_BUDGETS = {
+    "blog:index": QueryBudget(anonymous=2, authenticated=3),
+    "blog:post_detail": QueryBudget(anonymous=5, authenticated=7),
+    "blog:create_post": QueryBudget(anonymous=0, authenticated=0),
+    "blog:edit_post": QueryBudget(anonymous=0, authenticated=2),
+    "blog:delete_post": QueryBudget(anonymous=0, authenticated=1),
+    "blog:category_posts": QueryBudget(anonymous=4, authenticated=5),
+    "blog:popular": QueryBudget(anonymous=3, authenticated=4),
+    "blog:tag_posts": QueryBudget(anonymous=4, authenticated=5),
+    "blog:nearby_posts": QueryBudget(anonymous=4, authenticated=5),
+    "blog:add_comment": QueryBudget(anonymous=0, authenticated=0),
+    "blog:comment_thread": QueryBudget(anonymous=3, authenticated=5),
+    "blog:reply_comment": QueryBudget(anonymous=0, authenticated=0),
+    "blog:edit_comment": QueryBudget(anonymous=0, authenticated=1),
+    "blog:delete_comment": QueryBudget(anonymous=0, authenticated=1),
+    "blog:profile": QueryBudget(anonymous=4, authenticated=5),
+    "blog:profile_activity": QueryBudget(anonymous=5, authenticated=6),
+    "blog:react_post": QueryBudget(anonymous=0, authenticated=1),
+    "blog:react_comment": QueryBudget(anonymous=0, authenticated=2),
+    "blog:follow": QueryBudget(anonymous=0, authenticated=1),
+    "blog:following": QueryBudget(anonymous=0, authenticated=5),
+    "blog:notifications": QueryBudget(anonymous=0, authenticated=2),
+    "blog:read_notifications": QueryBudget(anonymous=0, authenticated=0),
+    "blog:edit_profile": QueryBudget(anonymous=0, authenticated=0),
+    "blog:location_autocomplete": QueryBudget(anonymous=0, authenticated=1),
+    "pages:about": QueryBudget(anonymous=0, authenticated=0),
+    "pages:rules": QueryBudget(anonymous=0, authenticated=0),
+}
+
+# Бюджеты для настроек по умолчанию, без общего кэша: сессия
+# и пользователь читаются из базы, списки выбора и счётчики лент
+# не кэшируются
+DEFAULT_QUERY_BUDGETS = {
+    "blog:index": QueryBudget(anonymous=3, authenticated=6),
+    "blog:post_detail": QueryBudget(anonymous=5, authenticated=9),
+    "blog:create_post": QueryBudget(anonymous=0, authenticated=4),
+    "blog:edit_post": QueryBudget(anonymous=0, authenticated=6),
+    "blog:delete_post": QueryBudget(anonymous=0, authenticated=3),
+    "blog:category_posts": QueryBudget(anonymous=5, authenticated=8),
+    "blog:popular": QueryBudget(anonymous=4, authenticated=7),
+    "blog:tag_posts": QueryBudget(anonymous=4, authenticated=7),
+    "blog:nearby_posts": QueryBudget(anonymous=4, authenticated=7),
+    "blog:add_comment": QueryBudget(anonymous=0, authenticated=2),
+    "blog:comment_thread": QueryBudget(anonymous=3, authenticated=7),
+    "blog:reply_comment": QueryBudget(anonymous=0, authenticated=2),
+    "blog:edit_comment": QueryBudget(anonymous=0, authenticated=3),
+    "blog:delete_comment": QueryBudget(anonymous=0, authenticated=3),
+    "blog:profile": QueryBudget(anonymous=4, authenticated=7),
+    "blog:profile_activity": QueryBudget(anonymous=5, authenticated=8),
+    "blog:react_post": QueryBudget(anonymous=0, authenticated=3),
+    "blog:react_comment": QueryBudget(anonymous=0, authenticated=4),
+    "blog:follow": QueryBudget(anonymous=0, authenticated=3),
+    "blog:following": QueryBudget(anonymous=0, authenticated=4),
+    "blog:notifications": QueryBudget(anonymous=0, authenticated=4),
+    "blog:read_notifications": QueryBudget(anonymous=0, authenticated=2),
+    "blog:edit_profile": QueryBudget(anonymous=0, authenticated=2),
+    "blog:location_autocomplete": QueryBudget(anonymous=0, authenticated=3),
+    "pages:about": QueryBudget(anonymous=0, authenticated=2),
+    "pages:rules": QueryBudget(anonymous=0, authenticated=2),
+}
+
+# Бюджеты QUERY_BUDGETS заданы для продакшен-настроек с общим кэшем
+pytestmark = pytest.mark.usefixtures("shared_cache")
+
+
+@pytest.fixture(params=["shared", "default"])
+def cache_mode(request, settings):
+    if request.param == "default":
+        settings.SHARED_CACHE = False
+        settings.SESSION_ENGINE = "django.contrib.sessions.backends.db"
+        return DEFAULT_QUERY_BUDGETS
+    return QUERY_BUDGETS
+
+
+@pytest.fixture
+def budget_urls(mixer, user, published_category, published_location):
+    # Пост виден всем, чтобы страницы с ним измерялись одинаково
+    post = mixer.blend(
+        "blog.Post", author=user, category=published_category,
+        location=published_location, is_published=True,
+        pub_date=timezone.now() - timedelta(days=1),
+    )
+    comment = mixer.blend("blog.Comment", post=post, author=user)
+    set_post_tags(post, "бюджет")
+    record(post.id, "view")
+    update_scores()
+    published_location.latitude = 55.75
+    published_location.longitude = 37.62
+    published_location.save()
+    return {
+        "blog:index": reverse("blog:index"),
+        "blog:post_detail": reverse("blog:post_detail", args=[post.id]),
+        "blog:create_post": reverse("blog:create_post"),
+        "blog:edit_post": reverse("blog:edit_post", args=[post.id]),
+        "blog:delete_post": reverse("blog:delete_post", args=[post.id]),
+        "blog:category_posts": reverse(
+            "blog:category_posts", args=[published_category.slug]
+        ),
+        "blog:popular": reverse("blog:popular"),
+        "blog:tag_posts": reverse("blog:tag_posts", args=["бюджет"]),
+        "blog:nearby_posts": (
+            reverse("blog:nearby_posts") + "?lat=55.75&lon=37.62&radius=5"
+        ),
+        "blog:add_comment": reverse("blog:add_comment", args=[post.id]),
+        "blog:comment_thread": reverse(
+            "blog:comment_thread", args=[comment.id]
+        ),
+        "blog:reply_comment": reverse(
+            "blog:reply_comment", args=[post.id, comment.id]
+        ),
+        "blog:edit_comment": reverse(
+            "blog:edit_comment", args=[post.id, comment.id]
+        ),
+        "blog:delete_comment": reverse(
+            "blog:delete_comment", args=[post.id, comment.id]
+        ),
+        "blog:profile": reverse("blog:profile", args=[user.username]),
+        "blog:profile_activity": reverse(
+            "blog:profile_activity", args=[user.username]
+        ),
+        "blog:react_post": reverse("blog:react_post", args=[post.id]),
+        "blog:react_comment": reverse(
+            "blog:react_comment", args=[post.id, comment.id]
+        ),
+        "blog:notifications": reverse("blog:notifications"),
+        "blog:read_notifications": reverse("blog:read_notifications"),
+        "blog:edit_profile": reverse("blog:edit_profile"),
+        "blog:follow": reverse("blog:follow", args=[user.username]),
+        "blog:following": reverse("blog:following"),
+        "blog:location_autocomplete": reverse("blog:location_autocomplete"),
+        "pages:about": reverse("pages:about"),
+        "pages:rules": reverse("pages:rules"),
+    }, post
+
+
+def test_every_route_has_budget():
+    from blog import urls as blog_urls
+    from pages import urls as pages_urls
+
+    for module in (blog_urls, pages_urls):
+        for pattern in module.urlpatterns:
+            url_name = f"{module.app_name}:{pattern.name}"
+            for budgets in (QUERY_BUDGETS, DEFAULT_QUERY_BUDGETS):
+                assert url_name in budgets, (
+                    "Задайте бюджеты SQL-запросов для маршрута"
+                    f" `{url_name}`."
+                )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("viewer", ["anonymous", "authenticated"])
+@pytest.mark.parametrize("url_name", sorted(QUERY_BUDGETS))
+def test_query_budget(
+        url_name, viewer, cache_mode, budget_urls, mixer, user,
+        published_category, unlogged_client, user_client,
+):
+    urls, post = budget_urls
+    client = user_client if viewer == "authenticated" else unlogged_client
+    budget = getattr(cache_mode[url_name], viewer)
+    url = urls[url_name]
+    # Бюджет задан для прогретого кэша: первый запрос заполняет кэш
+    client.get(url)
+    queries_on_few_rows = assert_query_budget(client, url, budget, viewer)
+
+    mixer.cycle(N_PER_PAGE * 2).blend(
+        "blog.Post", author=user, category=published_category
+    )
+    mixer.cycle(N_PER_PAGE).blend("blog.Comment", post=post, author=user)
+    mixer.cycle(N_PER_PAGE).blend("blog.Location")
+    client.get(url)
+    queries_on_many_rows = assert_query_budget(client, url, budget, viewer)
+    assert queries_on_few_rows == queries_on_many_rows, (
+        f"Убедитесь, что число SQL-запросов страницы `{url_name}` не растёт"
+        " вместе с числом записей на странице."
+    )
+
+
+@pytest.mark.django_db
+def test_post_form_choices_cached(user_client, mixer):
+    mixer.cycle(N_PER_PAGE).blend("blog.Location")
+    url = reverse("blog:create_post")
+    count_queries(user_client, url)
+    _, warm = count_queries(user_client, url)
+    assert not warm, (
+        "Убедитесь, что списки категорий и мест в форме поста берутся"
+        " из кэша."
+    )
+    location = mixer.blend("blog.Location", name="Новое место")
+    response, _ = count_queries(user_client, url)
+    assert location.name in response.content.decode(), (
+        "Убедитесь, что изменение мест сбрасывает закэшированный список."
+    )
+
+
+@pytest.mark.django_db
+def test_post_form_choices_read_from_db_without_shared_cache(
+        user_client, mixer, settings, monkeypatch
+):
+    settings.SHARED_CACHE = False
+    url = reverse("blog:create_post")
+    user_client.get(url)
+    # Категория создана в другом процессе: сброс версии ушёл в его кэш
+    monkeypatch.setattr(
+        "blog.cache.cache", LocMemCache("other-process", {})
+    )
+    mixer.blend("blog.Category", title="Новая категория")
+    monkeypatch.undo()
+    assert "Новая категория" in user_client.get(url).content.decode(), (
+        "Убедитесь, что без общего кэша списки выбора в форме поста"
+        " не берутся из кэша процесса."
+    )
+
+
+@pytest.mark.django_db
+def test_location_autocomplete(user_client, mixer, settings):
+    mixer.blend("blog.Location", name="Красная площадь")
+    mixer.cycle(3).blend("blog.Location", name="Парк")
+    response = user_client.get(
+        reverse("blog:location_autocomplete"), {"q": "Красн"}
+    )
+    assert [item["text"] for item in response.json()["results"]] == [
+        "Красная площадь"
+    ]
+    settings.LOCATION_AUTOCOMPLETE = True
+    content = user_client.get(reverse("blog:create_post")).content.decode()
+    assert "data-autocomplete-url" in content
+    assert "Парк" not in content, (
+        "Убедитесь, что виджет автодополнения не выводит весь список мест."
+    )
+
+
+@pytest.mark.django_db
+def test_session_user_cached_and_invalidated(user, user_client):
+    url = reverse("blog:edit_profile")
+    user_client.get(url)
+    _, queries = count_queries(user_client, url)
+    assert not queries, (
+        "Убедитесь, что сессия и пользователь берутся из кэша."
+    )
+    user.first_name = "Переименованный"
+    user.save()
+    response, queries = count_queries(user_client, url)
+    assert response.context["user"].first_name == "Переименованный", (
+        "Убедитесь, что сохранение пользователя сбрасывает его кэш."
+    )
+    assert len(queries) == 1
+
+
+@pytest.mark.django_db
+def test_logged_in_reader_without_shared_cache(
+        user_client, many_posts_with_published_locations, settings
+):
+    settings.SHARED_CACHE = False
+    settings.SESSION_ENGINE = "django.contrib.sessions.backends.db"
+    url = reverse("blog:index")
+    user_client.get(url)
+    _, queries = count_queries(user_client, url)
+    session_and_user = [
+        sql for sql in queries
+        if 'FROM "django_session"' in sql or 'FROM "auth_user"' in sql
+        or sql.startswith(('UPDATE "django_session"', 'INSERT'))
+    ]
+    assert len(session_and_user) == 2, (
+        "Убедитесь, что без общего кэша запрос читателя ленты читает"
+        " сессию и пользователя по одному запросу и не сохраняет"
+        " неизменённую сессию:\n" + "\n".join(session_and_user)
+    )
+    assert len(queries) <= DEFAULT_QUERY_BUDGETS["blog:index"].authenticated
+
+
+@pytest.mark.django_db
+def test_session_user_not_cached_in_process_cache(
+        user, user_client, settings
+):
+    settings.SHARED_CACHE = False
+    settings.SESSION_ENGINE = "django.contrib.sessions.backends.db"
+    url = reverse("blog:edit_profile")
+    user_client.get(url)
+    # Смена пароля в другом процессе: сигнал не сбрасывает кэш этого
+    user.__class__.objects.filter(pk=user.pk).update(
+        password=make_password("changed-password-2")
+    )
+    response, _ = count_queries(user_client, url)
+    assert response.status_code == 302, (
+        "Убедитесь, что без общего кэша пользователь сессии читается из"
+        " базы и смена пароля завершает сессию."
+    )
@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.models import PostScore, ScoreEvent
+from blog.ranking import record, update_scores
+
+
+@pytest.fixture
+def ranked_posts(mixer, user, published_category):
+    return mixer.cycle(3).blend(
+        "blog.Post", author=user, category=published_category,
+        is_published=True, pub_date=timezone.now() - timedelta(days=1),
+        title=(f"пост {n}" for n in range(3)),
+    )
+
+
+@pytest.mark.django_db
+def test_scores_update_incrementally(ranked_posts):
+    first, second, third = ranked_posts
+    record(first.id, "view")
+    record(second.id, "comment")
+    assert update_scores() == 2
+    assert not ScoreEvent.objects.exists(), (
+        "Убедитесь, что учтённые события удаляются."
+    )
+    before = PostScore.objects.get(post=first).score
+    record(first.id, "view")
+    ScoreEvent.objects.create(
+        post=third, weight=5,
+        created_at=timezone.now() - timedelta(days=3),
+    )
+    assert update_scores() == 2, (
+        "Убедитесь, что пересчёт затрагивает только посты с событиями."
+    )
+    assert PostScore.objects.get(post=first).score > before
+    ranking = list(
+        PostScore.objects.order_by("-score").values_list("post", flat=True)
+    )
+    assert ranking == [second.id, first.id, third.id], (
+        "Убедитесь, что вклад старых событий затухает со временем."
+    )
+
+
+@pytest.mark.django_db
+def test_popular_page_orders_by_score(client, ranked_posts):
+    first, second, third = ranked_posts
+    third.is_published = False
+    third.save()
+    for post, views in ((first, 1), (second, 3), (third, 5)):
+        for _ in range(views):
+            client.get(reverse("blog:post_detail", args=[post.id]))
+    record(third.id, "comment")
+    update_scores()
+    response = client.get(reverse("blog:popular"))
+    assert list(response.context["page_obj"]) == [second, first], (
+        "Убедитесь, что популярные посты идут по рейтингу и скрытые посты"
+        " в ленту не попадают."
+    )
+
+
+@pytest.mark.django_db
+def test_category_trending_includes_subcategories(
+        client, mixer, user, published_category, ranked_posts
+):
+    child = mixer.blend(
+        "blog.Category", parent=published_category, is_published=True
+    )
+    nested = mixer.blend(
+        "blog.Post", author=user, category=child, is_published=True,
+        pub_date=timezone.now() - timedelta(days=1),
+    )
+    url = reverse("blog:category_posts", args=[published_category.slug])
+    assert client.get(url).context["trending"] == []
+    record(nested.id, "reaction")
+    record(ranked_posts[0].id, "view")
+    update_scores()
+    assert client.get(url).context["trending"] == [nested, ranked_posts[0]], (
+        "Убедитесь, что список категории учитывает подкатегории и"
+        " обновляется после пересчёта рейтинга."
+    )
+
+
+@pytest.mark.django_db
+def test_views_are_buffered(client, user_client, ranked_posts, monkeypatch):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    from blog import ranking
+
+    first, second, third = ranked_posts
+    url = reverse("blog:post_detail", args=[first.id])
+    client.get(url)
+    with CaptureQueriesContext(connection) as captured:
+        client.get(url)
+    assert not any(
+        query["sql"].startswith("INSERT") for query in captured.captured_queries
+    ), "Убедитесь, что просмотр поста не пишет в базу."
+    user_client.get(url)
+    assert not ScoreEvent.objects.exists()
+    monkeypatch.setattr(ranking, "VIEW_FLUSH_INTERVAL", 0)
+    client.get(reverse("blog:post_detail", args=[second.id]))
+    assert sorted(
+        ScoreEvent.objects.values_list("post_id", "weight")
+    ) == [(first.id, 2), (second.id, 1)], (
+        "Убедитесь, что накопленные просмотры пишутся одним событием на"
+        " пост и просмотры автора не учитываются."
+    )
@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.models import Reaction, ReactionCounter
+from blog.reactions import toggle_reaction
+from conftest import N_PER_PAGE
+
+
+def summary(obj, kind="like"):
+    return next(item for item in obj.reaction_summary if item[0] == kind)
+
+
+@pytest.mark.django_db
+def test_reaction_toggles_and_counts_across_shards(
+        user_client, user, mixer, many_posts_with_published_locations
+):
+    post = many_posts_with_published_locations[0]
+    for reader in mixer.cycle(20).blend("auth.User"):
+        toggle_reaction(reader, post, "like")
+    url = reverse("blog:react_post", args=[post.id])
+    user_client.post(url, {"kind": "like"})
+    assert ReactionCounter.objects.filter(post=post).count() > 1, (
+        "Убедитесь, что реакции распределяются по нескольким шардам."
+    )
+
+    response = user_client.get(reverse("blog:post_detail", args=[post.id]))
+    assert summary(response.context["post"])[2:] == (21, True)
+
+    user_client.post(url, {"kind": "like"})
+    assert not Reaction.objects.filter(user=user, post=post).exists()
+    call_command("compact_reactions")
+    counters = ReactionCounter.objects.filter(post=post)
+    assert [(row.shard, row.count) for row in counters] == [(0, 20)], (
+        "Убедитесь, что сжатие сводит шарды в одну строку с суммой."
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("shared_cache")
+def test_page_membership_is_one_query(
+        user_client, user, mixer, published_category,
+        django_assert_num_queries
+):
+    posts = mixer.cycle(N_PER_PAGE).blend(
+        "blog.Post", category=published_category, is_published=True,
+        pub_date=timezone.now() - timedelta(days=1),
+    )
+    toggle_reaction(user, posts[0], "heart")
+    user_client.get(reverse("blog:index"))
+    # Прогретый кэш: выборка постов, счётчики и реакции пользователя
+    with django_assert_num_queries(3):
+        response = user_client.get(reverse("blog:index"))
+    reacted = {
+        post.pk for post in response.context["page_obj"]
+        if summary(post, "heart")[3]
+    }
+    assert reacted == {posts[0].pk}
+
+
+@pytest.mark.django_db
+def test_comment_reaction(
+        user_client, user, mixer, post_with_published_location
+):
+    comment = mixer.blend("blog.Comment", post=post_with_published_location)
+    user_client.post(
+        reverse("blog:react_comment", args=[comment.post_id, comment.id]),
+        {"kind": "fire"},
+    )
+    assert Reaction.objects.filter(
+        user=user, comment=comment, kind="fire"
+    ).exists()
+    call_command("compact_reactions", "--rebuild")
+    assert ReactionCounter.objects.get(comment=comment).count == 1
@@ -0,0 +1,101 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.models import Post, Tag
+from blog.tags import set_post_tags
+from conftest import N_PER_PAGE
+
+
+@pytest.fixture
+def tagged_posts(mixer, user, published_category):
+    dates = (
+        timezone.now() - timedelta(hours=hour)
+        for hour in range(1, N_PER_PAGE + 6)
+    )
+    posts = mixer.cycle(N_PER_PAGE + 5).blend(
+        "blog.Post", author=user, category=published_category,
+        is_published=True, pub_date=dates,
+    )
+    for post in posts:
+        set_post_tags(post, "Горы, путешествия")
+    set_post_tags(posts[0], "горы, путешествия, редкий тег")
+    return posts
+
+
+@pytest.mark.django_db
+def test_post_form_saves_tags(user_client, published_category):
+    response = user_client.post(reverse("blog:create_post"), {
+        "title": "Заголовок",
+        "text": "Текст",
+        "pub_date": "2020-01-01",
+        "category": published_category.pk,
+        "tags": "Горы,  горы , Новый  тег",
+    })
+    assert response.status_code == 302
+    post = Post.objects.get(title="Заголовок")
+    assert sorted(post.tags.values_list("name", flat=True)) == [
+        "горы", "новый тег"
+    ]
+    response = user_client.get(reverse("blog:edit_post", args=[post.id]))
+    assert response.context["form"].initial["tags"] in (
+        "горы, новый тег", "новый тег, горы"
+    )
+
+
+@pytest.mark.django_db
+def test_set_post_tags_reuses_tags_by_name_or_slug(
+        post_with_published_location
+):
+    by_name = Tag.objects.create(name="горы", slug="gory")
+    by_slug = Tag.objects.create(name="новый тег!", slug="новый-тег")
+    set_post_tags(post_with_published_location, "Горы, новый тег, свежий")
+    assert sorted(
+        post_with_published_location.tags.values_list("slug", flat=True)
+    ) == sorted([by_name.slug, by_slug.slug, "свежий"]), (
+        "Убедитесь, что теги с совпадающим именем или слагом берутся"
+        " существующие, а не пропускаются при вставке."
+    )
+    assert Tag.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_tag_page_keyset_pagination(client, tagged_posts):
+    Post.objects.filter(pk=tagged_posts[1].pk).update(is_published=False)
+    url = reverse("blog:tag_posts", args=["горы"])
+    first = client.get(url)
+    assert len(first.context["posts"]) == N_PER_PAGE
+    second = client.get(url, {"after": first.context["next_cursor"]})
+    assert second.context["next_cursor"] is None
+    titles = [
+        post.title
+        for post in first.context["posts"] + second.context["posts"]
+    ]
+    assert titles == [
+        post.title for post in tagged_posts if post != tagged_posts[1]
+    ], (
+        "Убедитесь, что страница тега показывает только опубликованные"
+        " посты, новые сверху, без пропусков и повторов между страницами."
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("shared_cache")
+def test_tag_cloud_refreshed_from_aggregate_table(
+        client, tagged_posts, django_assert_num_queries
+):
+    assert client.get(reverse("blog:index")).context["tag_cloud"] == []
+    call_command("refresh_tag_cloud")
+    client.get(reverse("blog:index"))
+    with django_assert_num_queries(2):
+        cloud = client.get(reverse("blog:index")).context["tag_cloud"]
+    levels = {tag["name"]: (tag["count"], tag["level"]) for tag in cloud}
+    assert levels == {
+        "горы": (N_PER_PAGE + 5, 1),
+        "путешествия": (N_PER_PAGE + 5, 1),
+        "редкий тег": (1, 5),
+    }
+    assert Tag.objects.count() == 3
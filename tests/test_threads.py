@@ -0,0 +1,125 @@
+import pytest
+from django.urls import reverse
+
+from blog.models import Comment, Post
+from blog.threads import comment_page, get_thread, rebuild_paths
+
+
+@pytest.fixture
+def threads(mixer, user, post_with_published_location):
+    post = post_with_published_location
+
+    def reply(parent=None, text=""):
+        return mixer.blend(
+            "blog.Comment", post=post, author=user, parent=parent, text=text
+        )
+
+    first = reply(text="первая ветка")
+    answers = [reply(first, text="ответ 0")]
+    nested = reply(answers[0], text="ответ на ответ")
+    answers += [reply(first, text=f"ответ {index}") for index in range(1, 4)]
+    second = reply(text="вторая ветка")
+    return post, first, answers, nested, second
+
+
+@pytest.mark.django_db
+def test_paths_and_reply_counts(threads):
+    post, first, answers, nested, second = threads
+    first.refresh_from_db()
+    assert first.reply_count == 5
+    assert [c.text for c in get_thread(first)] == [
+        "первая ветка", "ответ 0", "ответ на ответ",
+        "ответ 1", "ответ 2", "ответ 3",
+    ]
+    assert nested.depth == 2 and nested.position == 2
+    answers[0].delete()
+    first.refresh_from_db()
+    assert first.reply_count == 3
+    assert not Comment.objects.filter(pk=nested.pk).exists()
+
+
+@pytest.mark.django_db
+def test_reply_after_delete_gets_new_position(threads, mixer, user):
+    post, first, answers, nested, second = threads
+    answers[-1].delete()
+    reply = mixer.blend("blog.Comment", post=post, author=user, parent=first)
+    first.refresh_from_db()
+    assert first.reply_count == 5
+    assert reply.position == 6, (
+        "Убедитесь, что позиции ответов в ветке не выдаются повторно после"
+        " удаления."
+    )
+    positions = list(
+        Comment.objects.filter(path__startswith=first.path)
+        .exclude(pk=first.pk).values_list("position", flat=True)
+    )
+    assert len(positions) == len(set(positions))
+
+
+@pytest.mark.django_db
+def test_comment_page_previews_replies(
+        threads, django_assert_num_queries
+):
+    post, first, answers, nested, second = threads
+    with django_assert_num_queries(1):
+        comments, cursor = comment_page(post, replies=2)
+    assert [c.text for c in comments] == [
+        "первая ветка", "ответ 0", "ответ на ответ", "вторая ветка"
+    ]
+    assert cursor is None
+    comments, cursor = comment_page(post, limit=1, replies=2)
+    assert comments[-1].text == "ответ на ответ"
+    comments, cursor = comment_page(post, cursor, limit=1, replies=2)
+    assert [c.text for c in comments] == ["вторая ветка"]
+    assert cursor is None
+
+
+@pytest.mark.django_db
+def test_reply_through_thread_page(user_client, threads):
+    post, first, answers, nested, second = threads
+    response = user_client.post(
+        reverse("blog:reply_comment", args=[post.id, nested.id]),
+        {"text": "глубокий ответ"},
+    )
+    reply = Comment.objects.get(text="глубокий ответ")
+    assert response.status_code == 302
+    assert response["Location"].startswith(
+        reverse("blog:comment_thread", args=[first.id])
+    )
+    assert reply.parent == nested and reply.depth == 3
+    content = user_client.get(response["Location"]).content.decode()
+    assert "глубокий ответ" in content and "вторая ветка" not in content
+    detail = user_client.get(reverse("blog:post_detail", args=[post.id]))
+    assert "Вся ветка (6)" in detail.content.decode(), (
+        "Убедитесь, что на странице поста у ветки с длинным обсуждением"
+        " есть ссылка на всю ветку с числом ответов."
+    )
+
+
+@pytest.mark.django_db
+def test_rebuild_paths_restores_threads(threads):
+    post, first, answers, nested, second = threads
+    expected = list(
+        Comment.objects.order_by("pk")
+        .values_list("path", "position", "reply_count")
+    )
+    # Так комментарии выглядят после loaddata: attach не вызывался
+    Comment.objects.update(path="", position=0, reply_count=0)
+    assert rebuild_paths() == len(expected)
+    assert list(
+        Comment.objects.order_by("pk")
+        .values_list("path", "position", "reply_count")
+    ) == expected
+
+
+@pytest.mark.django_db
+def test_generated_comments_are_shown():
+    from blog import datagen
+
+    datagen.generate(profile="tiny", seed=1, scale=0.1)
+    post = Post.objects.filter(comments__isnull=False).first()
+    comments, _ = comment_page(post)
+    assert comments, (
+        "Убедитесь, что сгенерированные комментарии видны на странице"
+        " поста."
+    )
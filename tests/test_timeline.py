@@ -0,0 +1,124 @@
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from blog.models import Follow, TimelineEntry
+from conftest import N_PER_PAGE
+
+
+@pytest.fixture
+def following(user_client, another_user):
+    user_client.post(
+        reverse("blog:follow", args=[another_user.username]),
+        {"action": "follow"},
+    )
+    return another_user
+
+
+@pytest.fixture
+def blend_posts(mixer, published_category):
+    def blend(author, count, **kwargs):
+        dates = (
+            timezone.now() - timedelta(hours=hour)
+            for hour in range(1, count + 1)
+        )
+        kwargs.setdefault("pub_date", dates)
+        return mixer.cycle(count).blend(
+            "blog.Post", author=author, category=published_category,
+            is_published=True, **kwargs
+        )
+    return blend
+
+
+def feed_titles(client, after=None):
+    data = {"after": after} if after else {}
+    response = client.get(reverse("blog:following"), data)
+    return (
+        [post.title for post in response.context["posts"]],
+        response.context["next_cursor"],
+    )
+
+
+@pytest.mark.django_db
+def test_follow_backfills_and_fans_out(
+        user_client, user, another_user, blend_posts
+):
+    old_posts = blend_posts(another_user, 2)
+    user_client.post(reverse("blog:follow", args=[another_user.username]))
+    new_post = blend_posts(
+        another_user, 1, pub_date=timezone.now() - timedelta(minutes=1)
+    )[0]
+    blend_posts(another_user, 1, pub_date=timezone.now() + timedelta(days=1))
+    titles, cursor = feed_titles(user_client)
+    assert titles == [new_post.title] + [post.title for post in old_posts], (
+        "Убедитесь, что лента подписок содержит опубликованные посты"
+        " автора, новые сверху, без отложенных."
+    )
+    assert cursor is None
+    assert TimelineEntry.objects.filter(user=user).count() == 4
+
+    user_client.post(
+        reverse("blog:follow", args=[another_user.username]),
+        {"action": "unfollow"},
+    )
+    assert feed_titles(user_client) == ([], None)
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("shared_cache")
+def test_keyset_pages_merge_fan_out_and_read_time_authors(
+        user_client, user, following, mixer, blend_posts, monkeypatch,
+        django_assert_max_num_queries
+):
+    prolific = mixer.blend("auth.User")
+    monkeypatch.setattr("blog.timeline.TIMELINE_FANOUT_LIMIT", 0)
+    user_client.post(reverse("blog:follow", args=[prolific.username]))
+    posts = blend_posts(prolific, 1)
+    assert not Follow.objects.get(author=prolific).fan_out
+    monkeypatch.undo()
+    posts += blend_posts(prolific, N_PER_PAGE) + blend_posts(
+        following, N_PER_PAGE + 3
+    )
+    expected = [
+        post.title for post in sorted(
+            posts, key=lambda post: (post.pub_date, post.pk), reverse=True
+        )
+    ]
+    assert not TimelineEntry.objects.filter(post__author=prolific).exists()
+
+    titles, cursor = [], None
+    while True:
+        with django_assert_max_num_queries(6):
+            page, cursor = feed_titles(user_client, cursor)
+        assert len(page) <= N_PER_PAGE
+        titles += page
+        if cursor is None:
+            break
+    assert titles == expected, (
+        "Убедитесь, что лента листается курсором без пропусков и повторов"
+        " и подмешивает посты авторов без рассылки."
+    )
+
+
+@pytest.mark.django_db
+def test_switch_to_read_time_merge_keeps_pages_full(
+        user_client, following, blend_posts, monkeypatch
+):
+    posts = blend_posts(following, N_PER_PAGE + 2)
+    assert TimelineEntry.objects.filter(post__author=following).exists()
+    # Автор переходит на подмешивание, разосланные записи остаются
+    monkeypatch.setattr("blog.timeline.TIMELINE_FANOUT_LIMIT", 0)
+    oldest = blend_posts(
+        following, 1, pub_date=timezone.now() - timedelta(days=2)
+    )
+    assert not Follow.objects.get(author=following).fan_out
+    titles, cursor = feed_titles(user_client)
+    assert len(titles) == N_PER_PAGE and cursor, (
+        "Убедитесь, что посты автора не дублируются при слиянии записей"
+        " ленты и подмешивания."
+    )
+    rest, cursor = feed_titles(user_client, cursor)
+    assert titles + rest == [post.title for post in posts + oldest]
+    assert cursor is None